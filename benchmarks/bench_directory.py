@@ -0,0 +1,42 @@
+"""
+Benchmark of the lookups of sigaa.directory.UserDirectory.
+
+Usage: python benchmarks/bench_directory.py [number of users]
+"""
+import random
+import sys
+import time
+
+import os
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+sys.path.append(os.path.join(path, 'tests'))
+
+from sigaa.directory import UserDirectory
+from fake_sigaa import generate_directory
+
+
+def main(size=100000, lookups=100000):
+    users = generate_directory(size)
+
+    start = time.perf_counter()
+    directory = UserDirectory(users)
+    print('load: %d users in %.3fs' % (len(directory), time.perf_counter() - start))
+
+    queries = [random.choice(users).split(' ')[-1].strip('(').strip(')') for _ in range(lookups)]
+    start = time.perf_counter()
+    for query in queries:
+        directory.search(query)
+    elapsed = time.perf_counter() - start
+    print('search by username: %.0f lookups/s' % (lookups / elapsed))
+
+    names = [directory.get_name(query) for query in queries[:lookups // 10]]
+    start = time.perf_counter()
+    for name in names:
+        directory.get_username(name)
+    elapsed = time.perf_counter() - start
+    print('fullname to username: %.0f lookups/s' % (len(names) / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,64 @@
+"""
+Benchmark of the crawl of the users directory against the local fake SIGAA server (tests/fake_sigaa.py):
+the answers parsed by the threads of the searches (sigaa.crawler.DirectoryCrawler) against the answers
+parsed by a pool of processes (sigaa.engine.ProcessCrawler), with more and more processes.
+
+The wall time only goes down with the processes when there are free cores, the CPU time of this process
+shows the parsing taken out of it.
+
+Usage: python benchmarks/bench_engine.py [number of users] [cap] [latency in ms] [workers]
+"""
+import sys
+import time
+
+import os
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+sys.path.append(os.path.join(path, 'tests'))
+
+from sigaa.api import API
+from sigaa.crawler import DirectoryCrawler
+from sigaa.engine import ProcessCrawler, new_executor
+from sigaa.mailbox import MailBox
+from fake_sigaa import FakeSIGAA, generate_directory
+
+
+def measure(name, crawler, expected):
+    start = time.perf_counter()
+    cpu = time.process_time()
+    users = crawler.crawl()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    searches = sum(crawler.requests_per_depth.values())
+    assert users == expected, 'the crawl found %d of %d users' % (len(users), len(expected))
+    print('%-24s %6d searches %8.2f s %9.1f searches/s  cpu of this process %7.2f s' % (
+        name, searches, elapsed, searches / elapsed, cpu))
+
+
+def main(size=20000, cap=1000, latency=5, workers=8):
+    directory = generate_directory(size)
+    server = FakeSIGAA(directory, cap=cap, latency=latency / 1000.0, compress=True)
+    api = API(server.domain, session=server.session(), progress=False)
+    api.authenticate(directory[0].split(' ')[-1].strip('()'), server.password)
+
+    mail_boxes = []
+    for api in [api] + [api.spawn() for _ in range(workers - 1)]:
+        mail_box = MailBox(api.get_session(), api.get_domain())
+        mail_box.goto_mainbox_portal()
+        mail_box.goto_send_message()
+        mail_boxes.append(mail_box)
+
+    print('directory: %d users, cap %d, latency %d ms, %d workers, %d cores' % (
+        size, cap, latency, workers, os.cpu_count()))
+    measure('threads', DirectoryCrawler(mail_boxes, server.domain, cap=cap), directory)
+
+    for processes in sorted(set([1, 2, 4, os.cpu_count()])):
+        # the pool is started before the measure, like a pool reused by many crawls
+        with new_executor(processes) as executor:
+            list(executor.map(abs, range(processes)))
+            crawler = ProcessCrawler(mail_boxes, server.domain, cap=cap, executor=executor)
+            measure('processes (%d)' % processes, crawler, directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,66 @@
+"""
+Benchmark of sigaa.parsers: the throughput (MB/s) of each parser over the pages of tests/corpus, and the
+previous re.findall() of the users infos against the backwards matching of the names on long texts.
+
+Usage: python benchmarks/bench_parsers.py [repetitions] [words of the long text]
+"""
+import json
+import re
+import sys
+import time
+
+import os
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+import sigaa.parsers as parsers
+
+
+CORPUS = os.path.join(path, 'tests', 'corpus')
+
+
+def findall_users(html_page):
+    """ The implementation of util.extract_users() before sigaa.parsers. """
+    return sorted(set(re.findall(r"(?:\w+\s)+\(.+?\)", html_page)))
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS, 'expected.json'), 'r', encoding='utf-8') as f:
+        names = sorted(json.load(f))
+    pages = []
+    for name in names:
+        with open(os.path.join(CORPUS, name), 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def measure(name, function, pages, repetitions):
+    size = sum(len(page.encode('utf-8')) for page in pages)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        for page in pages:
+            function(page)
+    elapsed = time.perf_counter() - start
+    print('%-28s %9.1f MB/s  %9.1f us per page' % (
+        name, size * repetitions / elapsed / 1e6, elapsed / repetitions / len(pages) * 1e6))
+
+
+def main(repetitions=200, words=2000):
+    pages = load_corpus()
+    print('corpus: %d pages, %.0f KB' % (len(pages), sum(len(page) for page in pages) / 1024))
+    measure('findall users', findall_users, pages, repetitions)
+    measure('parsers.extract_users', parsers.extract_users, pages, repetitions)
+    measure('parsers.parse_view_state', parsers.parse_view_state, pages, repetitions)
+    measure('parsers.parse_flags', parsers.parse_flags, pages, repetitions)
+    measure('parsers.parse_search', parsers.parse_search, pages, repetitions)
+
+    # a long text without a user, like a message body, where the pattern tries the words again from each word
+    for count in (words // 4, words // 2, words):
+        text = ['palavra ' * count + '(']
+        print('long text: %d words' % count)
+        measure('  findall users', findall_users, text, 1)
+        measure('  parsers.extract_users', parsers.extract_users, text, 1)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
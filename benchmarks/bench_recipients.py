@@ -0,0 +1,51 @@
+"""
+Benchmark of the number of requests to add the recipients of a message,
+MailBox.add_user_recipient() one by one against MailBox.add_user_recipients().
+
+Usage: python benchmarks/bench_recipients.py [number of recipients]
+"""
+import sys
+import time
+
+import os
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+sys.path.append(os.path.join(path, 'tests'))
+
+from sigaa.api import API
+from sigaa.mailbox import MailBox
+from fake_sigaa import FakeSIGAA, generate_directory
+
+
+def compose(server):
+    api = API(server.domain, session=server.session())
+    api.authenticate(server.directory[0].split(' ')[-1].strip('(').strip(')'), server.password)
+    mail_box = MailBox(api.get_session(), api.get_domain())
+    mail_box.goto_mainbox_portal()
+    mail_box.goto_send_message()
+    return mail_box
+
+
+def measure(name, server, add):
+    mail_box = compose(server)
+    before = len(server.requests)
+    start = time.perf_counter()
+    results = add(mail_box)
+    elapsed = time.perf_counter() - start
+    requests = len(server.requests) - before
+    print('%-22s %6d requests  %5.2f per recipient  %.3fs  %d added' % (
+        name, requests, requests / len(results), elapsed, sum(results)))
+
+
+def main(size=500):
+    users = generate_directory(size)
+    server = FakeSIGAA(users)
+
+    measure('add_user_recipient', server,
+            lambda mail_box: [mail_box.add_user_recipient(user) for user in users])
+    measure('add_user_recipients', server,
+            lambda mail_box: list(mail_box.add_user_recipients(users).values()))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
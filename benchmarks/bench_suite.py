@@ -0,0 +1,66 @@
+"""
+Offline benchmark suite of sigaa.api.API against the local fake SIGAA server (tests/fake_sigaa.py).
+
+For each operation it reports the requests per second, the p50/p99 latency of the operation
+and the peak memory allocated by it.
+
+Usage: python benchmarks/bench_suite.py [directory size] [latency in ms]
+"""
+import sys
+import time
+import tracemalloc
+
+import os
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+sys.path.append(os.path.join(path, 'tests'))
+
+from sigaa.api import API
+from fake_sigaa import FakeSIGAA, generate_directory
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def measure(name, server, operation, repetitions):
+    """ Run the operation ``repetitions`` times and print its numbers. """
+    latencies = []
+    before = len(server.requests)
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        operation_start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - operation_start)
+    elapsed = time.perf_counter() - start
+    requests = len(server.requests) - before
+
+    # tracemalloc slows down the operation, the memory is measured in one more run
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%-28s %7d requests %9.1f req/s  p50 %8.1f ms  p99 %8.1f ms  peak %9.1f KB' % (
+        name, requests, requests / elapsed, percentile(latencies, 50) * 1000,
+        percentile(latencies, 99) * 1000, peak / 1024))
+
+
+def main(size=2000, latency=0):
+    directory = generate_directory(size)
+    server = FakeSIGAA(directory, cap=50, latency=latency / 1000.0)
+    # the progress bars of the crawl and of the send are not part of the numbers
+    api = API(server.domain, session=server.session(), progress=False)
+    api.authenticate(directory[0].split(' ')[-1].strip('(').strip(')'), server.password)
+    print('directory: %d users, cap 50, latency %d ms' % (size, latency))
+
+    usernames = iter([user.split(' ')[-1].strip('(').strip(')') for user in directory] * 10)
+    measure('search_user', server, lambda: api.search_user(next(usernames)), 50)
+
+    measure('get_all_users (1 worker)', server, lambda: api.get_all_users(), 1)
+    measure('get_all_users (4 workers)', server, lambda: api.get_all_users(workers=4), 1)
+    measure('send_message (100 users)', server, lambda: api.send_message(directory[:100], 'Subject', 'Message'), 3)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
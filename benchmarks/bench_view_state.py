@@ -0,0 +1,74 @@
+"""
+Benchmark of util.get_j_id_and_jsp(): the previous full page re.findall() against the
+incremental scan, over the whole text and over the chunks of a streamed response.
+
+Usage: python benchmarks/bench_view_state.py [page size in KB] [repetitions]
+"""
+import io
+import re
+import sys
+import time
+import tracemalloc
+
+import os
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+sys.path.append(os.path.join(path, 'tests'))
+
+import sigaa.util as util
+from fake_sigaa import PAGE
+
+
+def findall(html_page):
+    """ The implementation of util.get_j_id_and_jsp() before the incremental scan. """
+    j_id = list(re.findall(r"j_id\d{1,4}", html_page))[0]
+    j_id_jsp = list(re.findall(r"j_id_jsp_\d{4,}_\d+", html_page))[3]
+    return (j_id, j_id_jsp)
+
+
+def portal_page(size):
+    """ A page like the portal: the parameters at the top, followed by a lot of markup with more ids. """
+    row = '<tr><td id="j_id_jsp_1052251_%d">Turma</td><td><a id="j_id%d" href="#">Abrir</a></td></tr>\n'
+    rows = []
+    i = 0
+    while sum(len(r) for r in rows) < size * 1024:
+        rows.append(row % (i, i % 10000))
+        i += 1
+    return PAGE % {'j_id': 'j_id1', 'jsp': 1052251, 'content': ''.join(rows)}
+
+
+def chunks(data, chunk_size=8192):
+    """ Like r.iter_content(chunk_size, decode_unicode=True) of a streamed response. """
+    stream = io.BytesIO(data)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk.decode('utf-8')
+
+
+def measure(name, function, repetitions):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        result = function()
+    elapsed = (time.perf_counter() - start) / repetitions
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%-28s %9.1f us  peak %8.1f KB  %s' % (name, elapsed * 1e6, peak / 1024, result))
+
+
+def main(size=300, repetitions=200):
+    page = portal_page(size)
+    data = page.encode('utf-8')
+    print('page: %.0f KB' % (len(page) / 1024))
+    measure('findall (text)', lambda: findall(page), repetitions)
+    measure('scan (text)', lambda: util.get_j_id_and_jsp(page), repetitions)
+    measure('findall (stream, joined)', lambda: findall(''.join(chunks(data))), repetitions)
+    measure('scan (stream)', lambda: util.get_j_id_and_jsp(chunks(data)), repetitions)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
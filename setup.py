@@ -23,5 +23,11 @@ setup(
     install_requires=[
         "requests",
         "tqdm"
-    ]
+    ],
+    extras_require={
+        "async": ["aiohttp"]
+    },
+    entry_points={
+        "console_scripts": ["sigaa=sigaa.cli:main"]
+    }
 )
\ No newline at end of file
@@ -0,0 +1,513 @@
+import asyncio
+import sigaa.util as util
+from .user import User
+from .mailbox import (send_message_page_payload, search_payload, selection_payload,
+                      add_recipient_payload, send_payload)
+
+try:
+    import aiohttp
+except ImportError:  # optional dependency, see AsyncAPI.open()
+    aiohttp = None
+
+
+class AsyncAPI:
+    """
+    Class to instantiate the asyncio version of the :class:`sigaa.api.API` object, built on **aiohttp**.
+    The operations are the same, but they are coroutines.
+
+    The SIGAA server keeps the state of the page of a session in the backend, so the operations of an object
+    run one after another over its session, never overlapping. Like the :class:`sigaa.api.API`, the send message
+    page is opened once and reused by the next searches, it's opened again only when the server rejects it.
+    To overlap many searches use an :class:`AsyncSessionPool`, that spreads them over many sessions.
+
+    Requires the optional dependency **aiohttp**: ``pip install sigaa-cli[async]``
+
+    :param domain: The platform domain of the university server.
+    :type domain: String
+    :param session: An **aiohttp.ClientSession** to be used instead of a new one **(optional)**.
+    :type session: aiohttp.ClientSession
+
+    >>> import asyncio
+    >>> from sigaa.aio import AsyncAPI
+    >>> async def main():
+    ...     async with AsyncAPI("sigaa.ufpi.br") as api:
+    ...         await api.authenticate('macielti', 'PaSsWoRd')
+    ...         return await api.search_users(['macielti', 'maria'])
+    >>> asyncio.get_event_loop().run_until_complete(main())
+    [['BRUNO DO NASCIMENTO MACIEL (macielti)'], [...]]
+    """
+
+    def __init__(self, domain="sigaa.ufpi.br", session=None):
+        self.__domain = domain
+        self.__session = session
+        self.__lock = None
+        # the mail box in the send message page, reused by the next operations
+        self.__mail_box = None
+
+    async def __aenter__(self):
+        try:
+            return await self.open()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def open(self):
+        """
+        Create the session (if one wasn't supplied) and verify the domain, the same as
+        :func:`sigaa.util.generate_session` does.
+
+        :return: This object.
+        :rtype: :class:`AsyncAPI`
+
+        :raises NotValidDomain: If the domain isn't a valid sigaa platform.
+        """
+        # created inside the running event loop
+        self.__lock = asyncio.Lock()
+        if self.__session is None:
+            if aiohttp is None:
+                raise ImportError("The asyncio client requires aiohttp: pip install sigaa-cli[async]")
+            self.__session = aiohttp.ClientSession()
+
+        (text, _) = await fetch(self.__session, 'GET', "https://%s/sigaa/verTelaLogin.do" % self.__domain)
+        if 'SIGAA' not in text:
+            raise util.NotValidDomain("Not valid sigaa platform domain.")
+        return self
+
+    async def close(self):
+        """
+        Close the session.
+        """
+        if self.__session is not None:
+            await self.__session.close()
+
+    def get_session(self):
+        """
+        Method that returns the session.
+        """
+        return self.__session
+
+    def get_domain(self):
+        """
+        Method that returns the setted domain.
+        """
+        return self.__domain
+
+    async def authenticate(self, username, passwd):
+        """
+        Coroutine to authenticate the session, see :meth:`sigaa.api.API.authenticate`.
+
+        :return: **True** for success or **False** for failure.
+        :rtype: **Boolean**
+        """
+        url = 'https://%s/sigaa/logar.do?dispatch=logOn' % self.__domain
+        pyload = {
+            'user.login': username,
+            'user.senha': passwd
+        }
+        async with self.__lock:
+            # a new page of the session, the view state of the mail box isn't valid anymore
+            self.__mail_box = None
+            (text, _) = await fetch(self.__session, 'POST', url, pyload)
+        return not util.is_login_failed(text)
+
+    async def deauthenticate(self):
+        """
+        Coroutine to execute the logOff operation, see :meth:`sigaa.api.API.deauthenticate`.
+
+        :return: **True** if the session was deauthenticated with success or **False** if it fails.
+        :rtype: Boolean
+        """
+        async with self.__lock:
+            self.__mail_box = None
+            await fetch(self.__session, 'GET', "https://%s/sigaa/logar.do?dispatch=logOff" % self.__domain)
+        return not await self.is_authenticated()
+
+    async def is_authenticated(self):
+        """
+        Coroutine that returns the if the session is authenticated or not.
+
+        :return: True if you are authenticated or False if not.
+        :rtype: Boolean
+        """
+        async with self.__lock:
+            self.__mail_box = None
+            (text, _) = await fetch(self.__session, 'GET', "https://%s/sigaa/verPortalDiscente.do" % self.__domain)
+        return not util.is_session_expired(text)
+
+    async def search_user(self, query):
+        """
+        Coroutine to search for a username or fullname of a user, see :meth:`sigaa.api.API.search_user`.
+
+        :param query: Beginning of a username or fullname.
+        :type query: String
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+
+        :raises ViewExpired: If the server rejected the view state again after the page was opened again.
+        """
+        return await self.__run(lambda mail_box: mail_box.search(query))
+
+    async def search_users(self, queries):
+        """
+        Coroutine to run many searches over the send message page of the session, one after another
+        (the page of a session can't be shared by searches running at the same time),
+        see :meth:`AsyncSessionPool.search_users` to overlap them.
+
+        :param queries: List of beginnings of usernames or fullnames.
+        :type queries: list
+
+        :return: The list of users infos of each query, in the same order.
+        :rtype: list. Example: [['BRUNO DO NASCIMENTO MACIEL (macielti)'], ...]
+
+        :raises ViewExpired: If the server rejected the view state again after the page was opened again.
+        """
+        results = []
+
+        async def search(mail_box):
+            # after a rejected view state the searches go on from the one that failed
+            for query in queries[len(results):]:
+                results.append(await mail_box.search(query))
+            return results
+
+        return await self.__run(search)
+
+    async def send_message(self, users, subject, message, strict=True):
+        """
+        Coroutine to send message to a list of users, see :meth:`sigaa.api.API.send_message`.
+
+        :param users: A list of users. Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", ...]
+        :type users: list
+        :param subject: Subject of the message.
+        :type subject: String
+        :param message: Message text.
+        :type message: String
+        :param strict: If **True** the message isn't sent when a user was not added **(optional)**.
+        :type strict: Boolean
+
+        :return: **True** for success or **False** for failure.
+        :rtype: **Boolean**
+
+        :raises ViewExpired: If the server rejected the view state.
+        """
+        async def send(mail_box):
+            results = await mail_box.add_user_recipients(users)
+            added = [user for user, result in results.items() if result]
+            if not added or (strict and len(added) < len(results)):
+                return False
+            return await mail_box.send_message(subject, message)
+
+        # the recipients stay in the page even when the message isn't sent, a new page is opened for the next one
+        return await self.__run(send, retry=False, consume=True)
+
+    async def __run(self, operation, retry=True, consume=False):
+        # the operations of the session go one at a time over the same page
+        async with self.__lock:
+            for attempt in range(2 if retry else 1):
+                mail_box = await self.__compose()
+                try:
+                    return await operation(mail_box)
+                except util.ViewExpired:
+                    # the server rejected the view state, the pages are opened again
+                    self.__mail_box = None
+                    if not retry or attempt:
+                        raise
+                finally:
+                    if consume:
+                        self.__mail_box = None
+
+    async def __compose(self):
+        if self.__mail_box is None:
+            mail_box = AsyncMailBox(self.__session, self.__domain)
+            await mail_box.goto_mainbox_portal()
+            # a failed navigation (like an expired session) isn't kept
+            if await mail_box.goto_send_message():
+                self.__mail_box = mail_box
+            return mail_box
+        return self.__mail_box
+
+
+class AsyncSessionPool:
+    """
+    Class that holds many authenticated :class:`AsyncAPI` objects of a domain, each one with its own session,
+    to overlap many operations: each session runs one operation at a time (the page of a session can't be
+    shared), so up to ``size`` operations, and requests, run at the same time.
+
+    :param domain: The platform domain of the university server.
+    :type domain: String
+    :param username: The username of the student.
+    :type username: String
+    :param passwd: The password of the student.
+    :type passwd: String
+    :param size: Number of sessions, the max number of requests running at the same time **(optional)**.
+    :type size: int
+    :param session_factory: Callable called as ``session_factory(domain)`` that returns a new
+        **aiohttp.ClientSession** **(optional)**.
+    :type session_factory: function
+
+    >>> import asyncio
+    >>> from sigaa.aio import AsyncSessionPool
+    >>> async def main():
+    ...     async with AsyncSessionPool("sigaa.ufpi.br", 'macielti', 'PaSsWoRd', size=8) as pool:
+    ...         return await pool.search_users(['macielti', 'maria', ...])
+    >>> asyncio.get_event_loop().run_until_complete(main())
+    [['BRUNO DO NASCIMENTO MACIEL (macielti)'], [...], ...]
+    """
+
+    def __init__(self, domain, username, passwd, size=4, session_factory=None):
+        self.__domain = domain
+        self.__username = username
+        self.__passwd = passwd
+        self.__size = size
+        self.__session_factory = session_factory
+        self.__apis = []
+        self.__logged = []
+        self.__idle = None
+
+    async def __aenter__(self):
+        try:
+            return await self.open()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def open(self):
+        """
+        Create and authenticate the sessions, all at the same time.
+
+        :return: This object.
+        :rtype: :class:`AsyncSessionPool`
+
+        :raises NotValidDomain: If the domain isn't a valid sigaa platform.
+        :raises NotAuthenticated: If the login data is wrong.
+        """
+        # created inside the running event loop
+        self.__idle = asyncio.Queue()
+        for _ in range(self.__size):
+            session = None if self.__session_factory is None else self.__session_factory(self.__domain)
+            self.__apis.append(AsyncAPI(self.__domain, session))
+
+        async def login(api):
+            await api.open()
+            if not await api.authenticate(self.__username, self.__passwd):
+                raise util.NotAuthenticated("Could not authenticate the pool session.")
+            self.__logged.append(api)
+
+        await asyncio.gather(*[login(api) for api in self.__apis])
+        for api in self.__apis:
+            self.__idle.put_nowait(api)
+        return self
+
+    async def close(self):
+        """
+        LogOff and close all the sessions of the pool.
+        """
+        (apis, logged) = (self.__apis, self.__logged)
+        (self.__apis, self.__logged) = ([], [])
+        try:
+            await asyncio.gather(*[api.deauthenticate() for api in logged])
+        finally:
+            for api in apis:
+                await api.close()
+
+    def get_size(self):
+        """
+        Method that returns the number of sessions.
+        """
+        return len(self.__apis)
+
+    async def run(self, operation):
+        """
+        Coroutine to run an operation with the first free session.
+
+        :param operation: Coroutine function called as ``operation(api)``.
+        :type operation: function
+
+        :return: The value returned by the operation.
+        """
+        api = await self.__idle.get()
+        try:
+            return await operation(api)
+        finally:
+            self.__idle.put_nowait(api)
+
+    async def search_user(self, query):
+        """
+        Coroutine to search for a username or fullname with the first free session, see :meth:`AsyncAPI.search_user`.
+        """
+        return await self.run(lambda api: api.search_user(query))
+
+    async def search_users(self, queries):
+        """
+        Coroutine to run many searches at the same time, spread over the sessions.
+
+        :param queries: List of beginnings of usernames or fullnames.
+        :type queries: list
+
+        :return: The list of users infos of each query, in the same order.
+        :rtype: list. Example: [['BRUNO DO NASCIMENTO MACIEL (macielti)'], ...]
+        """
+        return list(await asyncio.gather(*[self.search_user(query) for query in queries]))
+
+    async def send_message(self, users, subject, message, strict=True):
+        """
+        Coroutine to send message with the first free session, see :meth:`AsyncAPI.send_message`.
+        """
+        return await self.run(lambda api: api.send_message(users, subject, message, strict))
+
+
+class AsyncMailBox:
+    """
+    The asyncio version of the :class:`sigaa.mailbox.MailBox`.
+    Created to be used mainly by the **sigaa.aio.AsyncAPI**, use only if you know what you are doing.
+
+    The state of the page is kept in the backend, so the requests of a mail box are sent one after another,
+    even when its operations are awaited at the same time. The operations raise :class:`sigaa.util.ViewExpired`
+    when the server rejects the view state, like the ones of the :class:`sigaa.mailbox.MailBox`.
+
+    :param session: An autheticated aiohttp.ClientSession from sigaa.aio.AsyncAPI.
+    :type session: aiohttp.ClientSession
+    :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+    :type domain: String
+    :param semaphore: Semaphore that bounds the concurrent requests **(optional)**.
+    :type semaphore: asyncio.Semaphore
+    """
+
+    def __init__(self, session, domain, semaphore=None):
+        self.__session = session
+        self.__domain = domain
+        self.__semaphore = semaphore
+        self.__j_id = None
+        self.__j_id_jsp = None
+        self.__lock = asyncio.Lock()
+
+    async def goto_mainbox_portal(self):
+        """
+        Request the Mailbox portal, see :meth:`sigaa.mailbox.MailBox.goto_mainbox_portal`.
+        """
+        url = "https://www.%s/sigaa/abrirCaixaPostal.jsf?sistema=2" % self.__domain
+        (text, response_url) = await self.__fetch('GET', url)
+
+        # extract domain from response url
+        self.__domain = util.extract_domain(response_url)
+
+        if util.is_mailbox_page(text):
+            (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(text)
+            return True
+        return False
+
+    async def goto_send_message(self):
+        """
+        Request the page used to send messages, see :meth:`sigaa.mailbox.MailBox.goto_send_message`.
+        """
+        url = "https://www.%s/cxpostal/caixa_postal.jsf" % self.__domain
+        (text, _) = await self.__fetch('POST', url, send_message_page_payload(self.__j_id))
+
+        if util.is_send_message_page(text):
+            (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(text)
+            return True
+        return False
+
+    async def search(self, query, subject="", message=""):
+        """
+        Search the users using the AJAX requisition, see :meth:`sigaa.mailbox.MailBox.search`.
+        """
+        url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
+        payload = search_payload(self.__j_id, self.__j_id_jsp, query, subject, message)
+        (text, _) = await self.__fetch('POST', url, payload)
+
+        return util.extract_users(text)
+
+    async def simulate_user_selection(self, user, subject="", message="", index=0):
+        """
+        Simulate the select operation, see :meth:`sigaa.mailbox.MailBox.simulate_user_selection`.
+        """
+        url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
+        payload = selection_payload(self.__j_id, self.__j_id_jsp, user, subject, message, index)
+        (text, _) = await self.__fetch('POST', url, payload)
+
+        return util.is_ajax_update(text)
+
+    async def add_user_recipient(self, user, subject="", message=""):
+        """
+        Add user as recipient of the message, see :meth:`sigaa.mailbox.MailBox.add_user_recipient`.
+        """
+        return await self.__add_recipient(User.parse(user), subject, message)
+
+    async def add_user_recipients(self, users, subject="", message=""):
+        """
+        Add a list of users as recipients of the message, see :meth:`sigaa.mailbox.MailBox.add_user_recipients`.
+        """
+        results = {}
+        for user in users:
+            results[user] = await self.__add_recipient(User.parse(user), subject, message)
+
+        return results
+
+    async def __add_recipient(self, user, subject, message):
+        # the selection is a position in the last search of the page, see MailBox.add_user_recipients()
+        found = [User.parse(found_user) for found_user in await self.search(user.username)]
+        if user not in found:
+            return False
+        index = found.index(user)
+        user = found[index]
+
+        url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
+        payload = add_recipient_payload(self.__j_id, self.__j_id_jsp, user.label, subject, message)
+
+        if not await self.simulate_user_selection(user.label, subject, message, index):
+            return False
+
+        (text, _) = await self.__fetch('POST', url, payload)
+        return util.is_user_added(text, user.username)
+
+    async def send_message(self, subject, message):
+        """
+        Send message to previusly added users, see :meth:`sigaa.mailbox.MailBox.send_message`.
+        """
+        url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
+        (text, _) = await self.__fetch('POST', url, send_payload(self.__j_id, subject, message))
+
+        return util.is_message_sent(text)
+
+    async def __fetch(self, method, url, data=None):
+        async with self.__lock:
+            (text, response_url) = await fetch(self.__session, method, url, data, self.__semaphore)
+        if util.is_view_expired(text):
+            raise util.ViewExpired("The server rejected the view state %s." % self.__j_id)
+        return (text, response_url)
+
+
+async def fetch(session, method, url, data=None, semaphore=None):
+    """
+    Coroutine that executes a request and returns the text and the final url of the response.
+
+    :param session: The session.
+    :type session: aiohttp.ClientSession
+    :param method: 'GET' or 'POST'.
+    :type method: String
+    :param url: The url.
+    :type url: String
+    :param data: Form data **(optional)**.
+    :type data: dict
+    :param semaphore: Semaphore that bounds the concurrent requests **(optional)**.
+    :type semaphore: asyncio.Semaphore
+
+    :return: The text and the url of the response.
+    :rtype: tuple
+    """
+    if semaphore is None:
+        return await _request(session, method, url, data)
+    async with semaphore:
+        return await _request(session, method, url, data)
+
+
+async def _request(session, method, url, data):
+    async with session.request(method, url, data=data, allow_redirects=True) as r:
+        return (await r.text(), str(r.url))
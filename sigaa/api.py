@@ -1,8 +1,13 @@
 import requests
-import re
-from tqdm import tqdm
+import threading
 from .mailbox import MailBox
+from .crawler import DirectoryCrawler, CHARS, SEARCH_CAP
+from .bulk import BulkSender
+from .session import SessionState, SESSION_TIMEOUT
+from .directory import UserDirectory
+from .snapshot import diff, result_hash
 import sigaa.util as util
+import sigaa.instrument as instrument
 
 
 class API:
@@ -11,19 +16,57 @@ class API:
 
     :param domain: The platform domain of the university server.
     :type domain: String
+    :param session: A session to be used instead of a new one, useful to mount custom adapters **(optional)**.
+    :type session: requests.Session
+    :param session_timeout: Time, in seconds, that the platform keeps an idle session alive **(optional)**.
+    :type session_timeout: int
+    :param domain_cache: Keeps the result of the verification of the domain, see :class:`sigaa.bootstrap.DomainCache` **(optional)**.
+    :type domain_cache: :class:`sigaa.bootstrap.DomainCache`
+    :param lazy: If **True** the session is created, and the domain verified, only by the first operation
+        that needs it, so the object is built without requesting the server **(optional)**.
+    :type lazy: Boolean
+    :param progress: If **False** the progress bars (and the errors printed by :meth:`API.send_message`)
+        aren't shown and **tqdm** isn't imported **(optional)**.
+    :type progress: Boolean
 
     :attr session: Holds a :class:`requests.Session()` object.
 
+    The mail box used by :meth:`API.search_user`, :meth:`API.send_message` and :meth:`API.get_all_users`
+    is opened once and kept in the send message page, its view state (**j_id**) is reused by the next calls
+    and the pages are opened again only when the server rejects it. The calls from many threads
+    are done one at a time over it, :meth:`API.send_bulk_message` also holds it until the job ends.
+    :meth:`API.iter_users` searches only with spawned sessions, so it doesn't hold it.
+
     >>> from sigaa.api import API
     >>> api = API("sigaa.ufma.br") # already executes API.generate_session(domain)
+    >>> api = API("sigaa.ufma.br", lazy=True) # executed by the first operation
     """
 
-    def __init__(self, domain="sigaa.ufpi.br"):
+    def __init__(self, domain="sigaa.ufpi.br", session=None, session_timeout=SESSION_TIMEOUT, domain_cache=None,
+                 lazy=False, progress=True):
         self.__domain = domain
-        self.__session = util.generate_session(self.__domain)
+        self.__domain_cache = domain_cache
+        self.__progress = progress
+        self.__state = SessionState(session_timeout)
+        self.__session = None
+        self.__new_session = session
+        self.__session_lock = threading.Lock()
+        if not lazy:
+            self.get_session()
         self.__j_id = None
         self.__j_id_jsp = None
-
+        self.__username = None
+        self.__passwd = None
+        self.__crawl_report = {}
+        self.__store = None
+        self.__throttle = None
+        self.__cache = None
+        self.__send_report = {}
+        self.__mail_box = None
+        self.__composing = False
+        self.__compose_lock = threading.RLock()
+
+    @instrument.timed('api.authenticate')
     def authenticate(self, username, passwd):
         """
         Method to authenticate the :attr:`sigaacli.API.session`.
@@ -48,15 +91,53 @@ class API:
             'user.senha': passwd
         }
 
-        r = self.__session.post(url, data=pyload)
+        r = self.get_session().post(url, data=pyload)
 
-        if "rio e/ou senha inv" not in r.text:
+        if not util.is_login_failed(r.text):
             # extract j_id parameters
             (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(r.text)
+            self.__state.mark_authenticated()
+            self.__reset_compose()
+            # keep the login data to authenticate new sessions, see API.spawn()
+            self.__username = username
+            self.__passwd = passwd
             return True
 
         return False
 
+    @instrument.timed('api.spawn')
+    def spawn(self):
+        """
+        Method that returns a new :class:`API` object for the same domain, with its own session,
+        authenticated with the same login data used in :meth:`API.authenticate`.
+
+        :return: A new authenticated API object.
+        :rtype: :class:`API`
+
+        :raises NotAuthenticated: If this object was never authenticated with success.
+
+        >>> from sigaa.api import API
+        >>> api = API("sigaa.ufpi.br")
+        >>> api.authenticate("username", "password")
+        True
+        >>> other_api = api.spawn()
+        """
+        if self.__username is None:
+            raise util.NotAuthenticated("Authenticate before spawning new sessions.")
+
+        # the new session uses the same adapters, so custom transports are kept
+        session = requests.Session()
+        for prefix, adapter in self.get_session().adapters.items():
+            session.mount(prefix, adapter)
+
+        api = API(self.__domain, session, domain_cache=self.__domain_cache, progress=self.__progress)
+        api.use_throttle(self.__throttle)
+        api.use_cache(self.__cache)
+        if not api.authenticate(self.__username, self.__passwd):
+            raise util.NotAuthenticated("Could not authenticate the spawned session.")
+        return api
+
+    @instrument.timed('api.deauthenticate')
     def deauthenticate(self):
         """
         Method to execute the logOff operation on SIGAA platform. 
@@ -72,15 +153,29 @@ class API:
         >>> api.deauthenticate()
         True
         """
+        if self.__session is None:
+            # a lazy object that never requested the server
+            return True
+
         # logOff operation from 'discente' portal.
         r = self.__session.get("https://%s/sigaa/logar.do?dispatch=logOff" %
                                self.__domain, allow_redirects=True)
+        self.__state.mark_deauthenticated()
+        self.__reset_compose()
         return not self.is_authenticated()
 
     def get_session(self):
         """
-        Method that returns a requests.Session() object.
+        Method that returns a requests.Session() object, created by the first call when the object is lazy.
+
+        :raises NotValidDomain: If the domain isn't of a SIGAA platform.
         """
+        if self.__session is None:
+            with self.__session_lock:
+                if self.__session is None:
+                    session = util.generate_session(self.__domain, self.__new_session, self.__domain_cache)
+                    self.__state.attach(session)
+                    self.__session = session
         return self.__session
 
     def get_domain(self):
@@ -89,10 +184,17 @@ class API:
         """
         return self.__domain
 
-    def is_authenticated(self):
+    @instrument.timed('api.is_authenticated')
+    def is_authenticated(self, force=False):
         """
         Method that returns the if the session is authenticated or not.
 
+        The state of the session is tracked from the responses already received, the portal page
+        is requested only when that state is unknown or too old to be trusted (see :class:`sigaa.session.SessionState`).
+
+        :param force: Always request the portal page to verify the session **(optional)**.
+        :type force: Boolean
+
         :return: True if you are authenticated or False if not.
         :rtype: Boolean
 
@@ -101,14 +203,29 @@ class API:
         >>> api.is_authenticated()
         False
         """
+        if self.__session is None:
+            # a lazy object that never requested the server
+            return False
+        if not force and self.__state.is_fresh():
+            return self.__state.is_authenticated()
+
         r = self.__session.get("https://%s/sigaa/verPortalDiscente.do" %
                                self.__domain, allow_redirects=True)
-        if "o foi expirada. " not in r.text:
-            # extract j_id parameters
-            (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(r.text)
-            return True
-        return False
+        # redirected to the login page or the "session expired" message, the state was already updated by the response
+        if any(util.is_login_page(response.url) for response in r.history + [r]) or util.is_session_expired(r.text):
+            return False
+        # extract j_id parameters
+        (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(r.text)
+        self.__state.mark_authenticated()
+        return True
+
+    def get_session_state(self):
+        """
+        Method that returns the :class:`sigaa.session.SessionState` that tracks the session.
+        """
+        return self.__state
     
+    @instrument.timed('api.search_user')
     def search_user(self, query):
         """
         Search for a username or fullname of a user, it returns a list of users info match.
@@ -118,17 +235,85 @@ class API:
         :param query: Beginning of a username or fullname.
         :type query: String
 
+        When a store is in use (see :meth:`API.use_store`) the search is answered by the store
+        if it holds a fresh complete result for the query.
+
         :return: List of users infos. 
         :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
         """
 
-        mail_box = MailBox(self.__session, self.__domain)
-        mail_box.goto_mainbox_portal()
-        mail_box.goto_send_message()
+        if self.__store is not None and self.__store.covers(query):
+            return self.__store.search(query)
+
+        users = self.__run_composed(lambda mail_box: mail_box.search(query))
+        if self.__store is not None:
+            self.__store.add(query, users, complete=len(users) < SEARCH_CAP)
+        return users
+
+    def use_store(self, store):
+        """
+        Method to set a :class:`sigaa.store.UserStore` that keeps the results of the searches,
+        so the next searches can be answered without going back to the server.
+
+        :param store: The store of the users, **None** to stop using it.
+        :type store: :class:`sigaa.store.UserStore`
+        """
+        self.__store = store
+
+    def use_throttle(self, throttle):
+        """
+        Method to set a :class:`sigaa.ratelimit.Throttle` that paces the requests of the mail boxes
+        and tries the searches again when the server fails, the spawned sessions use the same one.
+        Use the same throttle for every session of a domain (see :func:`sigaa.ratelimit.get_throttle`).
+
+        :param throttle: The throttle, **None** to stop using it.
+        :type throttle: :class:`sigaa.ratelimit.Throttle`
 
-        return mail_box.search(query)
+        >>> from sigaa.api import API
+        >>> from sigaa.ratelimit import get_throttle
+        >>> api = API()
+        >>> api.use_throttle(get_throttle(api.get_domain(), rate=10, max_concurrency=8))
+        >>> api.authenticate('macielti', 'PaSsWoRd')
+        >>> users = api.get_all_users(workers=8)
+        """
+        self.__throttle = throttle
+        self.__reset_compose()
 
-    def get_all_users(self):
+    def get_throttle(self):
+        """
+        Method that returns the throttle in use, or **None**.
+        """
+        return self.__throttle
+
+    def use_cache(self, cache):
+        """
+        Method to set a :class:`sigaa.cache.SearchCache` that keeps the results of the searches of the mail boxes,
+        so the same query isn't sent again while its result is fresh. The spawned sessions use the same one.
+
+        :param cache: The cache of the searches, **None** to stop using it.
+        :type cache: :class:`sigaa.cache.SearchCache`
+        """
+        self.__cache = cache
+        self.__reset_compose()
+
+    def get_cache(self):
+        """
+        Method that returns the cache in use, or **None**.
+        """
+        return self.__cache
+
+    def get_crawl_report(self):
+        """
+        Method that returns the number of searches executed by the last :meth:`API.get_all_users`
+        grouped by the length of the prefix.
+
+        :return: Number of searches by depth of the prefix tree.
+        :rtype: dict. Example: {1: 36, 2: 117, 3: 39}
+        """
+        return dict(self.__crawl_report)
+
+    @instrument.timed('api.get_all_users')
+    def get_all_users(self, workers=1, max_per_host=None, cap=SEARCH_CAP, processes=None):
         """
         Method to scrap the fullname and username of all the users of the platform.
         
@@ -136,106 +321,397 @@ class API:
             This process can be a little slow, like up to 20 minutes, but this can be fast like 2 minutes. 
             This will depends on a number of factors like the total number of students, 
             the load of the server, your internet connection.
-            
-        
-        You can use Python Generators to iterate more efficientely combined with Threads,
-        just convert the returned list to a generator.
 
-        Example of how to convert a list in to a generator:
+        Using more than one worker the searches are spreaded over a pool of sessions, each one
+        authenticated with the same login data (see :meth:`API.spawn`) and with its own mail box.
+        The result is the same of the serial crawl.
+
+        The suggestion box of the platform returns a limited number of users for each search,
+        when a search hits the ``cap`` the prefix is expanded with one more char (``'a'`` -> ``'aa'``, ``'ab'``, ...)
+        until every branch is under the cap, so every user is found. See :meth:`API.get_crawl_report`.
+
+        For large directories the parsing of the answers can be done by a pool of ``processes``,
+        see :class:`sigaa.engine.ProcessCrawler`, the searches are still sent by the ``workers``.
+
+        The list is returned only at the end of the crawl, to start working on the users
+        as soon as they are found use :meth:`API.iter_users`.
 
         >>> from sigaa.api import API
         >>> api = API()
-        >>> api.authenticate('macielti', 'Si6Dqr1biY1a')
-        >>> users = api.get_all_users()
-        >>> ( user for user in users )
-        <generator object <genexpr> at 0x7f366e97a678>
+        >>> api.authenticate('macielti', 'PaSsWoRd')
+        >>> users = api.get_all_users(workers=4)
+
+        :param workers: Number of sessions searching at the same time **(optional)**.
+        :type workers: int
+        :param max_per_host: Max number of searches running at the same time against the domain **(optional)**.
+        :type max_per_host: int
+        :param cap: Size of a search result truncated by the server, **None** disables the expansion **(optional)**.
+        :type cap: int
+        :param processes: Number of processes parsing the answers, **None** parses them in this process **(optional)**.
+        :type processes: int
 
         :return: List of users infos. 
         :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
         """
 
-        chars = [
-            'a',
-            'b',
-            'c',
-            'd',
-            'e',
-            'f',
-            'g',
-            'h',
-            'i',
-            'j',
-            'k',
-            'l',
-            'm',
-            'n',
-            'o',
-            'p',
-            'q',
-            'r',
-            's',
-            't',
-            'u',
-            'v',
-            'w',
-            'x',
-            'y',
-            'z',
-
-            '1',
-            '2',
-            '3',
-            '4',
-            '5',
-            '6',
-            '7',
-            '8',
-            '9',
-            '0',
-
-        ]
-
-        mail_box = MailBox(self.__session, self.__domain)
-        mail_box.goto_mainbox_portal()
-        mail_box.goto_send_message()
-
-        users = []
-        for char in tqdm(chars):
-            users = users + mail_box.search(char)
-
-        return sorted(set(users))
-
-    def send_message(self, users, subject, message):
+        return self.__crawl(CHARS, workers, max_per_host, cap, processes=processes)
+
+    def iter_users(self, workers=1, max_per_host=None, cap=SEARCH_CAP, processes=None):
+        """
+        Generator version of :meth:`API.get_all_users`: each user is yielded as soon as the first search
+        that returns it comes back, the users already yielded are skipped.
+
+        The users aren't sorted. The searches are sent by ``workers`` spawned sessions (see :meth:`API.spawn`),
+        never by the session of this object, so it stays free for the other calls while the loop runs.
+        Leaving the loop (or closing the generator) stops the crawl and logOff the spawned sessions.
+        The searches are also kept in the store in use, see :meth:`API.use_store`.
+
+        :param workers: Number of sessions searching at the same time **(optional)**.
+        :type workers: int
+        :param max_per_host: Max number of searches running at the same time against the domain **(optional)**.
+        :type max_per_host: int
+        :param cap: Size of a search result truncated by the server, **None** disables the expansion **(optional)**.
+        :type cap: int
+        :param processes: Number of processes parsing the answers, **None** parses them in this process **(optional)**.
+        :type processes: int
+
+        :return: Generator of users infos.
+        :rtype: generator
+
+        >>> from sigaa.api import API
+        >>> api = API()
+        >>> api.authenticate('macielti', 'PaSsWoRd')
+        >>> for user in api.iter_users(workers=4):
+        ...     if user.endswith('(macielti)'):
+        ...         break
+        """
+
+        return self.__iter_crawl(CHARS, workers, max_per_host, cap, processes=processes)
+
+    @instrument.timed('api.refresh_users')
+    def refresh_users(self, workers=1, max_per_host=None, cap=SEARCH_CAP):
+        """
+        Method to update the store in use (see :meth:`API.use_store`) searching again
+        only the prefixes that are stale, instead of the whole directory.
+
+        :param workers: Number of sessions searching at the same time **(optional)**.
+        :type workers: int
+        :param max_per_host: Max number of searches running at the same time against the domain **(optional)**.
+        :type max_per_host: int
+        :param cap: Size of a search result truncated by the server, **None** disables the expansion **(optional)**.
+        :type cap: int
+
+        :return: List of all the stored users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+
+        :raises ValueError: If there is no store in use.
+
+        >>> from sigaa.api import API
+        >>> from sigaa.store import UserStore
+        >>> api = API()
+        >>> api.authenticate('macielti', 'PaSsWoRd')
+        >>> api.use_store(UserStore('users.db', api.get_domain()))
+        >>> users = api.refresh_users()
+        """
+        if self.__store is None:
+            raise ValueError("There is no store in use, see API.use_store().")
+
+        prefixes = self.__store.stale_prefixes(CHARS)
+        if prefixes:
+            self.__crawl(prefixes, workers, max_per_host, cap)
+        return self.__store.get_users()
+
+    @instrument.timed('api.update_snapshot')
+    def update_snapshot(self, snapshots, workers=1, max_per_host=None, cap=SEARCH_CAP, full=False):
+        """
+        Crawl the users directory, save it as a new snapshot and compare it with the previous one.
+
+        The hash of each truncated search result is kept in the snapshot. In the next crawl a truncated
+        prefix whose result has the same hash isn't expanded again: its users are taken from the previous
+        snapshot, so only the parts of the directory that changed are searched. A change hidden beyond
+        the truncated result of such prefix is found only when its result changes, use ``full`` to crawl
+        everything from time to time.
+
+        :param snapshots: The store of the snapshots.
+        :type snapshots: :class:`sigaa.snapshot.SnapshotStore`
+        :param workers: Number of sessions searching at the same time **(optional)**.
+        :type workers: int
+        :param max_per_host: Max number of searches running at the same time against the domain **(optional)**.
+        :type max_per_host: int
+        :param cap: Size of a search result truncated by the server **(optional)**.
+        :type cap: int
+        :param full: If **True** every prefix is expanded, ignoring the previous snapshot **(optional)**.
+        :type full: Boolean
+
+        :return: The new snapshot and the changes since the previous one (every user is added in the first one).
+        :rtype: tuple. Example: (Snapshot('sigaa.ufpi.br', 2, 41250 users), DirectoryDiff(3 added, 1 removed, 0 renamed))
+
+        >>> from sigaa.api import API
+        >>> from sigaa.snapshot import SnapshotStore
+        >>> api = API()
+        >>> api.authenticate('macielti', 'PaSsWoRd')
+        >>> (snapshot, changes) = api.update_snapshot(SnapshotStore('snapshots'))
+        >>> changes.added
+        ['MARIA DAS DORES (dores)']
+        """
+        previous = snapshots.latest(self.__domain)
+        old_hashes = {} if previous is None or full else previous.prefixes
+        hashes = {}
+        unchanged = []
+        lock = threading.Lock()
+
+        def expand(prefix, users):
+            digest = result_hash(users)
+            with lock:
+                hashes[prefix] = digest
+                if old_hashes.get(prefix) == digest:
+                    unchanged.append(prefix)
+                    return False
+            return True
+
+        crawled = self.__crawl(CHARS, workers, max_per_host, cap, expand)
+        users = dict((util.split_user(user)[1], user) for user in crawled)
+        if unchanged:
+            # the users found by the crawl win over the old infos of the same username
+            directory = UserDirectory(previous.users)
+            for prefix in unchanged:
+                for user in directory.search(prefix):
+                    users.setdefault(util.split_user(user)[1], user)
+            # the expansion of the unchanged prefixes is still valid for the next crawl
+            for prefix, digest in old_hashes.items():
+                if prefix not in hashes and any(prefix.startswith(parent) for parent in unchanged):
+                    hashes[prefix] = digest
+
+        snapshot = snapshots.save(self.__domain, users.values(), hashes)
+        return (snapshot, diff([] if previous is None else previous.users, snapshot.users))
+
+    def __crawl(self, prefixes, workers, max_per_host, cap, expand=None, processes=None):
+        with self.__progress_bar(len(prefixes)) as progress_bar:
+            def progress(prefix, users, children):
+                progress_bar.total += len(children)
+                progress_bar.set_postfix(depth=len(prefix))
+                progress_bar.update()
+
+            # the crawl holds the mail box of this session until it ends
+            with self.__compose_lock:
+                try:
+                    return sorted(self.__iter_crawl(prefixes, workers, max_per_host, cap, progress,
+                                                    self.__compose(), expand, processes))
+                except util.ViewExpired:
+                    self.__reset_compose()
+                    raise
+
+    def __iter_crawl(self, prefixes, workers, max_per_host, cap, progress=None, mail_box=None, expand=None,
+                     processes=None):
+        # without the mail box of this session (held under the compose lock) every worker is a spawned
+        # session, a page opened in this session would reject the view state of the other calls
+        apis = []
+        crawler = None
+        try:
+            mail_boxes = [] if mail_box is None else [mail_box]
+            for _ in range(workers - len(mail_boxes)):
+                apis.append(self.spawn())
+
+            for api in apis:
+                mail_box = MailBox(api.get_session(), api.get_domain(), api.get_throttle(), api.get_cache(),
+                                   minimal=True)
+                mail_box.goto_mainbox_portal()
+                mail_box.goto_send_message()
+                mail_boxes.append(mail_box)
+
+            def on_search(prefix, users, children):
+                if self.__store is not None:
+                    self.__store.add(prefix, users, complete=cap is None or len(users) < cap)
+                if progress is not None:
+                    progress(prefix, users, children)
+
+            if processes:
+                # the pool of processes is started only by the crawls that use it
+                from .engine import ProcessCrawler
+                crawler = ProcessCrawler(mail_boxes, self.__domain, processes, max_per_host, cap, expand=expand)
+            else:
+                crawler = DirectoryCrawler(mail_boxes, self.__domain, max_per_host, cap, expand=expand)
+            for user in crawler.iter_crawl(prefixes, on_search):
+                yield user
+        finally:
+            if crawler is not None:
+                self.__crawl_report = crawler.requests_per_depth
+            # logOff the spawned sessions
+            for api in apis:
+                api.deauthenticate()
+
+    def get_send_report(self):
+        """
+        Method that returns the result of each recipient of the last :meth:`API.send_message`.
+
+        :return: **True** for the users added as recipients or **False** for the ones that failed.
+        :rtype: dict. Example: {"BRUNO DO NASCIMENTO MACIEL (macielti)": True, ...}
+        """
+        return dict(self.__send_report)
+
+    @instrument.timed('api.send_message')
+    def send_message(self, users, subject, message, strict=True):
         """
         Send message to a list of users.
 
+        Every user is tried as recipient, even after a failure, the result of each one
+        is available in :meth:`API.get_send_report`.
+
         :param users: A list of users. Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", ...]
         :type users: list
         :param subject: Subject of the message.
         :type subject: String
         :param message: Message text.
         :type message: String
+        :param strict: If **True** the message isn't sent when a user was not added, if **False** 
+            it's sent to the users added with success **(optional)**.
+        :type strict: Boolean
 
         :return: **True** for success or **False** for failure.
         :rtype: **Boolean**
 
         >>> from sigaa.api import API
         >>> api = API()
-        >>> api.authenticate('macielti', '1aT6SwWMgWvP')
+        >>> api.authenticate('macielti', 'PaSsWoRd')
         True
         >>> api.send_message(["BRUNO DO NASCIMENTO MACIEL (macielti)"], "Subject", "Message Text")
         True
         """
 
-        mail_box = MailBox(self.__session, self.__domain)
-        mail_box.goto_mainbox_portal()
-        mail_box.goto_send_message()
+        def send(mail_box):
+            with self.__progress_bar(len(users)) as progress_bar:
+                def progress(user, result):
+                    if result == False and self.__progress:
+                        print("[Error] - User", user, "NOT ADDED.")
+                    progress_bar.update()
 
-        for user in tqdm(users):
-            result = mail_box.add_user_recipient(user)
-            if result == False:
-                print("[Error] - User", user, "NOT ADDED.")
-                # exit the method if a user was not added succesfuly.
+                self.__send_report = mail_box.add_user_recipients(users, progress=progress)
+
+            added = [user for user, result in self.__send_report.items() if result]
+            if not added or (strict and len(added) < len(self.__send_report)):
                 return False
 
-        return mail_box.send_message(subject, message)
+            return mail_box.send_message(subject, message)
+
+        # the recipients stay in the page even when the message isn't sent, a new page is opened for the next one
+        return self.__run_composed(send, consume=True)
+
+    def __run_composed(self, operation, consume=False):
+        """
+        Run ``operation(mail_box)`` over the mail box of this session, opening the pages again
+        and trying once more if the server rejects the view state.
+        """
+        with self.__compose_lock:
+            for attempt in range(2):
+                mail_box = self.__compose()
+                try:
+                    return operation(mail_box)
+                except util.ViewExpired:
+                    self.__reset_compose()
+                    if attempt:
+                        raise
+                finally:
+                    if consume:
+                        self.__composing = False
+
+    def __compose(self):
+        """ Return the mail box in the send message page, opening only the pages needed. """
+        mail_box = self.__mail_box
+        if mail_box is not None and not self.__composing:
+            # a message was sent from it, the mail box page is already open
+            try:
+                self.__composing = mail_box.goto_send_message()
+            except util.ViewExpired:
+                self.__composing = False
+            if not self.__composing:
+                mail_box = None
+
+        if mail_box is None:
+            mail_box = MailBox(self.get_session(), self.__domain, self.__throttle, self.__cache, minimal=True)
+            mail_box.goto_mainbox_portal()
+            self.__composing = mail_box.goto_send_message()
+            # a failed navigation (like an expired session) isn't kept
+            self.__mail_box = mail_box if self.__composing else None
+        return mail_box
+
+    def __reset_compose(self):
+        with self.__compose_lock:
+            self.__mail_box = None
+            self.__composing = False
+
+    @instrument.timed('api.send_bulk_message')
+    def send_bulk_message(self, users, subject, message, journal, shard_size=100, workers=1):
+        """
+        Send message to a large list of users, splitted in many messages of up to ``shard_size`` recipients
+        sent at the same time by ``workers`` sessions. The progress is written to the ``journal`` file, 
+        if the job stops calling it again with the same arguments resumes it where it stopped.
+        See :class:`sigaa.bulk.BulkSender`.
+
+        :param users: A list of users. Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", ...]
+        :type users: list
+        :param subject: Subject of the message.
+        :type subject: String
+        :param message: Message text.
+        :type message: String
+        :param journal: Path of the journal file. Example: 'announcement.journal'
+        :type journal: String
+        :param shard_size: Max number of recipients of each message **(optional)**.
+        :type shard_size: int
+        :param workers: Number of sessions sending at the same time **(optional)**.
+        :type workers: int
+
+        :return: **True** for the users that received the message or **False** for the ones that didn't.
+        :rtype: dict. Example: {"BRUNO DO NASCIMENTO MACIEL (macielti)": True, ...}
+
+        >>> from sigaa.api import API
+        >>> api = API()
+        >>> api.authenticate('macielti', 'PaSsWoRd')
+        True
+        >>> api.send_bulk_message(api.get_all_users(), "Subject", "Message Text", "announcement.journal", workers=4)
+        {'ANA MARIA SOUSA (anamaria)': True, ...}
+        """
+
+        users = list(users)
+        apis = [self]
+        # the shards sent by this session open their own pages, the other calls wait until the job ends
+        with self.__compose_lock:
+            try:
+                for _ in range(workers - 1):
+                    apis.append(self.spawn())
+
+                sender = BulkSender(apis, journal, shard_size)
+                with self.__progress_bar(len(users)) as progress_bar:
+                    return sender.send(users, subject, message,
+                                       lambda shard, results: progress_bar.update(len(shard)))
+            finally:
+                # the pages of the shards replaced the mail box of this session
+                self.__reset_compose()
+                # logOff the spawned sessions
+                for api in apis[1:]:
+                    api.deauthenticate()
+
+    def __progress_bar(self, total):
+        if not self.__progress:
+            return _NullProgressBar(total)
+        # imported only when a progress bar is shown, it's slow to import
+        from tqdm import tqdm
+        return tqdm(total=total)
+
+
+class _NullProgressBar:
+    """ The part of a **tqdm** progress bar used by :class:`API`, showing nothing. """
+
+    def __init__(self, total):
+        self.total = total
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def update(self, n=1):
+        pass
+
+    def set_postfix(self, **kwargs):
+        pass
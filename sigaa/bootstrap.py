@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .api import API
+import sigaa.util as util
+
+
+class DomainCache:
+    """
+    Class to keep in a JSON file the result of the verification of the domains (see :func:`sigaa.util.generate_session`),
+    so a new session of a domain already verified doesn't request the login page.
+
+    :param path: Path of the JSON file. Example: 'domains.json'
+    :type path: String
+    :param max_age: Seconds that a verification is trusted **(optional)**.
+    :type max_age: int
+
+    >>> from sigaa.api import API
+    >>> from sigaa.bootstrap import DomainCache
+    >>> cache = DomainCache('domains.json')
+    >>> api = API('sigaa.ufpi.br', domain_cache=cache) # verifies the domain
+    >>> api = API('sigaa.ufpi.br', domain_cache=cache) # no request
+    """
+
+    def __init__(self, path, max_age=7 * 24 * 60 * 60):
+        self.__path = path
+        self.__max_age = max_age
+        self.__lock = threading.Lock()
+        self.__domains = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as cache_file:
+                    self.__domains = json.load(cache_file)
+            except ValueError:
+                # a file partially written, the domains are verified again
+                self.__domains = {}
+
+    def get(self, domain):
+        """
+        Return the known result of the verification of a domain.
+
+        :param domain: The platform domain of the university server.
+        :type domain: String
+
+        :return: **True** or **False**, or **None** if the domain wasn't verified or the result is too old.
+        :rtype: **Boolean**
+        """
+        with self.__lock:
+            entry = self.__domains.get(domain)
+        if entry is None or entry['checked_at'] < time.time() - self.__max_age:
+            return None
+        return entry['valid']
+
+    def put(self, domain, valid):
+        """
+        Keep the result of the verification of a domain.
+
+        :param domain: The platform domain of the university server.
+        :type domain: String
+        :param valid: **True** if the domain is a valid sigaa platform.
+        :type valid: Boolean
+        """
+        with self.__lock:
+            self.__domains[domain] = {'valid': valid, 'checked_at': time.time()}
+            # write a new file and replace the old one, a crash never leaves it half written
+            temporary = '%s.%d.tmp' % (self.__path, os.getpid())
+            with open(temporary, 'w') as cache_file:
+                json.dump(self.__domains, cache_file)
+            os.replace(temporary, self.__path)
+
+
+def probe_domains(domains, domain_cache=None, session_factory=None):
+    """
+    Verify many domains at the same time.
+
+    :param domains: The platform domains. Example: ['sigaa.ufpi.br', 'sigaa.ufma.br']
+    :type domains: list
+    :param domain_cache: Keeps the results, the domains already known aren't requested **(optional)**.
+    :type domain_cache: :class:`DomainCache`
+    :param session_factory: Callable called as ``session_factory(domain)`` that returns a new requests.Session **(optional)**.
+    :type session_factory: function
+
+    :return: **True** for the valid sigaa platform domains, **False** for the others (or the ones that didn't answer).
+    :rtype: dict. Example: {'sigaa.ufpi.br': True, 'google.com': False}
+    """
+    results = {}
+
+    def probe(domain):
+        session = None if session_factory is None else session_factory(domain)
+        try:
+            util.generate_session(domain, session, domain_cache)
+            results[domain] = True
+        except (util.NotValidDomain, requests.RequestException):
+            results[domain] = False
+
+    threads = [threading.Thread(target=probe, args=(domain,), daemon=True) for domain in domains]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict((domain, results[domain]) for domain in domains)
+
+
+def prewarm(domain, count, username=None, passwd=None, domain_cache=None, session_factory=None):
+    """
+    Create many API objects of a domain at the same time, authenticated if the login data is supplied.
+
+    The sessions share the same pool of keep-alive connections (a single :class:`requests.adapters.HTTPAdapter`),
+    so the connections opened by one of them are reused by the others.
+
+    :param domain: The platform domain of the university server.
+    :type domain: String
+    :param count: Number of API objects.
+    :type count: int
+    :param username: The username of the student **(optional)**.
+    :type username: String
+    :param passwd: The password of the student **(optional)**.
+    :type passwd: String
+    :param domain_cache: Keeps the result of the verification of the domain **(optional)**.
+    :type domain_cache: :class:`DomainCache`
+    :param session_factory: Callable called as ``session_factory(domain)`` that returns a new requests.Session,
+        used instead of the shared pool **(optional)**.
+    :type session_factory: function
+
+    :return: List of API objects.
+    :rtype: list
+
+    :raises NotAuthenticated: If the login data is wrong.
+
+    >>> from sigaa.bootstrap import DomainCache, prewarm
+    >>> apis = prewarm('sigaa.ufpi.br', 8, 'macielti', 'PaSsWoRd', DomainCache('domains.json'))
+    """
+    adapter = HTTPAdapter(pool_maxsize=max(1, count))
+    apis = [None] * count
+    errors = []
+
+    def build(i):
+        if session_factory is None:
+            session = requests.Session()
+            session.mount('https://', adapter)
+        else:
+            session = session_factory(domain)
+        try:
+            api = API(domain, session, domain_cache=domain_cache)
+            if username is not None and not api.authenticate(username, passwd):
+                raise util.NotAuthenticated("Could not authenticate the session.")
+            apis[i] = api
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build, args=(i,), daemon=True) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return apis
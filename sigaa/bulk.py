@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from .mailbox import MailBox
+
+
+class BulkSender:
+    """
+    Class to send a message to a large list of users.
+    Created to be used mainly by the **sigaa.api.API**, use only if you know what you are doing.
+
+    The users are splitted in shards, each shard is sent as one message, and the shards are sent
+    at the same time over a pool of sessions (see :meth:`sigaa.api.API.spawn`). The progress is written
+    to a journal file, running the same job again with the same journal resumes it where it stopped:
+    the shards already sent are skipped and only the ones that failed or never ran are sent.
+
+    :param apis: Authenticated API objects, one for each worker. Example: [api, api.spawn()]
+    :type apis: list
+    :param journal: Path of the journal file. Example: 'announcement.journal'
+    :type journal: String
+    :param shard_size: Max number of recipients of each message **(optional)**.
+    :type shard_size: int
+
+    >>> from sigaa.api import API
+    >>> from sigaa.bulk import BulkSender
+    >>> api = API()
+    >>> api.authenticate('macielti', 'PaSsWoRd')
+    >>> sender = BulkSender([api, api.spawn()], 'announcement.journal')
+    >>> sender.send(api.get_all_users(), "Subject", "Message Text")
+    {'ANA MARIA SOUSA (anamaria)': True, ...}
+    """
+
+    def __init__(self, apis, journal, shard_size=100):
+        self.__apis = list(apis)
+        self.__journal = journal
+        self.__shard_size = shard_size
+        self.__lock = threading.Lock()
+
+    def get_shards(self, users):
+        """
+        Split the users in shards.
+
+        :param users: A list of users. Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", ...]
+        :type users: list
+
+        :return: List of shards, each one a list of users.
+        :rtype: list
+        """
+        users = list(users)
+        return [users[i:i + self.__shard_size] for i in range(0, len(users), self.__shard_size)]
+
+    def send(self, users, subject, message, progress=None):
+        """
+        Send the message to the users, resuming the job from the journal if it was already started.
+
+        :param users: A list of users or :class:`sigaa.user.User` records, any iterable is read once.
+            Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", ...]
+        :type users: list
+        :param subject: Subject of the message.
+        :type subject: String
+        :param message: Message text.
+        :type message: String
+        :param progress: Callable called as ``progress(shard, results)`` after each shard **(optional)**.
+        :type progress: function
+
+        :return: **True** for the users that received the message or **False** for the ones that didn't.
+        :rtype: dict. Example: {"BRUNO DO NASCIMENTO MACIEL (macielti)": True, ...}
+        """
+        # a generator would be consumed by the shards, the users are still needed for the results
+        users = list(users)
+        shards = self.get_shards(users)
+        job = self.__job_id(shards, subject, message)
+
+        results = {}
+        sent = self.__load(job)
+        pending = queue.Queue()
+        for i, shard in enumerate(shards):
+            if i in sent:
+                results.update(sent[i])
+            else:
+                pending.put(i)
+
+        errors = []
+
+        def work(api):
+            while True:
+                try:
+                    i = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    shard_results = self.__send_shard(api, job, i, shards[i], subject, message)
+                except Exception as e:
+                    errors.append(e)
+                    shard_results = dict((str(user), False) for user in shards[i])
+
+                with self.__lock:
+                    results.update(shard_results)
+                    if progress is not None:
+                        progress(shards[i], dict((user, shard_results[str(user)]) for user in shards[i]))
+
+        threads = [threading.Thread(target=work, args=(api,), daemon=True) for api in self.__apis]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        return dict((user, results.get(str(user), False)) for user in users)
+
+    def __send_shard(self, api, job, i, shard, subject, message):
+        mail_box = MailBox(api.get_session(), api.get_domain(), api.get_throttle(), api.get_cache(),
+                           minimal=True)
+        mail_box.goto_mainbox_portal()
+        mail_box.goto_send_message()
+
+        added = mail_box.add_user_recipients(shard)
+        is_sent = any(added.values()) and mail_box.send_message(subject, message)
+        # the journal keeps the users infos, the records aren't JSON serializable
+        results = dict((str(user), bool(is_sent and result)) for user, result in added.items())
+        self.__write(job, i, is_sent, results)
+        return results
+
+    def __job_id(self, shards, subject, message):
+        labels = [[str(user) for user in shard] for shard in shards]
+        digest = hashlib.sha1(json.dumps([labels, subject, message]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def __load(self, job):
+        """ Return the results of the shards of the job already sent, by the index of the shard. """
+        sent = {}
+        if os.path.exists(self.__journal):
+            with open(self.__journal, 'r') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line partially written before a crash
+                        continue
+                    if entry['job'] == job and entry['sent']:
+                        sent[entry['shard']] = entry['results']
+        return sent
+
+    def __write(self, job, i, is_sent, results):
+        entry = json.dumps({'job': job, 'shard': i, 'sent': is_sent, 'results': results})
+        with self.__lock:
+            with open(self.__journal, 'a') as journal:
+                journal.write(entry + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
@@ -0,0 +1,190 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    domain TEXT NOT NULL,
+    query TEXT NOT NULL,
+    users TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (domain, query)
+);
+CREATE INDEX IF NOT EXISTS searches_used_at ON searches (used_at);
+"""
+
+# number of uses answered by the memory kept before their time is written in the file.
+_USES_BATCH = 64
+
+
+class SearchCache:
+    """
+    Class to keep the results of the AJAX searches of users (see :meth:`sigaa.mailbox.MailBox.search`),
+    so the same query isn't sent again to the server while its result is fresh.
+
+    The results are kept by domain and query in a SQLite file, limited to ``max_entries`` results:
+    the least recently used ones are removed first. The last ``memory_entries`` results used
+    are also kept in memory, answered without reading the file. The time of the uses answered by the memory
+    is written in the file in batches, at the latest before the least recently used results are removed.
+
+    Unlike the :class:`sigaa.store.UserStore`, that rebuilds the directory from the prefixes, the cache
+    only answers a query already sent, but it also holds the truncated results.
+
+    :param path: Path of the SQLite file, ':memory:' keeps it only in memory **(optional)**.
+    :type path: String
+    :param ttl: Seconds that a result is considered fresh **(optional)**.
+    :type ttl: int
+    :param max_entries: Max number of results kept in the file **(optional)**.
+    :type max_entries: int
+    :param memory_entries: Max number of results kept in memory **(optional)**.
+    :type memory_entries: int
+
+    >>> from sigaa.api import API
+    >>> from sigaa.cache import SearchCache
+    >>> api = API()
+    >>> api.authenticate('macielti', 'PaSsWoRd')
+    >>> api.use_cache(SearchCache('searches.db', ttl=600))
+    >>> api.search_user('macielti')
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    >>> api.search_user('macielti') # answered by the cache
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    >>> api.get_cache().get_stats()
+    {'hits': 1, 'memory_hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0}
+    """
+
+    def __init__(self, path=':memory:', ttl=60 * 60, max_entries=10000, memory_entries=256):
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__memory_entries = memory_entries
+        self.__memory = OrderedDict()
+        self.__stats = {'hits': 0, 'memory_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self.__lock = threading.Lock()
+        # the cache is shared by the sessions of the crawler worker threads
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.executescript(_SCHEMA)
+        # the time of the last use of the results answered by the memory, not written in the file yet
+        self.__uses = {}
+        (self.__count,) = self.__connection.execute("SELECT COUNT(*) FROM searches").fetchone()
+
+    def get(self, domain, query):
+        """
+        Return the cached result of a search, if it's fresh.
+
+        :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+        :type domain: String
+        :param query: The searched query. Example: 'macielti'
+        :type query: String
+
+        :return: List of users infos, or **None** if there is no fresh result.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        key = (domain, query)
+        now = time.time()
+        with self.__lock:
+            if key in self.__memory:
+                (users, fetched_at) = self.__memory[key]
+                if fetched_at >= now - self.__ttl:
+                    self.__memory.move_to_end(key)
+                    self.__stats['hits'] += 1
+                    self.__stats['memory_hits'] += 1
+                    self.__uses[key] = now
+                    if len(self.__uses) >= _USES_BATCH:
+                        self.__write_uses()
+                    return list(users)
+                del self.__memory[key]
+
+            row = self.__connection.execute(
+                "SELECT users, fetched_at FROM searches WHERE domain = ? AND query = ? AND fetched_at >= ?",
+                (domain, query, now - self.__ttl)).fetchone()
+            if row is None:
+                self.__stats['misses'] += 1
+                return None
+
+            with self.__connection:
+                self.__connection.execute(
+                    "UPDATE searches SET used_at = ? WHERE domain = ? AND query = ?", (now, domain, query))
+            users = json.loads(row[0])
+            self.__remember(key, users, row[1])
+            self.__stats['hits'] += 1
+            return list(users)
+
+    def put(self, domain, query, users):
+        """
+        Keep the result of a search, removing the least recently used results over the limit.
+
+        :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+        :type domain: String
+        :param query: The searched query. Example: 'macielti'
+        :type query: String
+        :param users: List of users infos returned by the search. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+        :type users: list
+        """
+        users = list(users)
+        now = time.time()
+        with self.__lock, self.__connection:
+            exists = self.__connection.execute(
+                "SELECT 1 FROM searches WHERE domain = ? AND query = ?", (domain, query)).fetchone()
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO searches (domain, query, users, fetched_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (domain, query, json.dumps(users), now, now))
+            self.__uses.pop((domain, query), None)
+            self.__remember((domain, query), users, now)
+            self.__stats['stores'] += 1
+            if exists is None:
+                self.__count += 1
+
+            if self.__count > self.__max_entries:
+                # the recent uses count for the order of removal
+                self.__write_uses()
+                self.__connection.execute(
+                    "DELETE FROM searches WHERE rowid IN (SELECT rowid FROM searches ORDER BY used_at LIMIT ?)",
+                    (self.__count - self.__max_entries,))
+                self.__stats['evictions'] += self.__count - self.__max_entries
+                self.__count = self.__max_entries
+
+    def get_stats(self):
+        """
+        Method that returns the number of hits (and how many of them were answered by the memory),
+        of misses, of results kept and of results removed by the limit.
+
+        :return: The statistics of the cache.
+        :rtype: dict. Example: {'hits': 10, 'memory_hits': 8, 'misses': 2, 'stores': 2, 'evictions': 0}
+        """
+        with self.__lock:
+            return dict(self.__stats)
+
+    def clear(self):
+        """
+        Remove every result kept.
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute("DELETE FROM searches")
+            self.__memory.clear()
+            self.__uses.clear()
+            self.__count = 0
+
+    def close(self):
+        """
+        Write the pending uses and close the SQLite file.
+        """
+        with self.__lock, self.__connection:
+            self.__write_uses()
+        self.__connection.close()
+
+    def __write_uses(self):
+        if self.__uses:
+            with self.__connection:
+                self.__connection.executemany(
+                    "UPDATE searches SET used_at = ? WHERE domain = ? AND query = ?",
+                    [(used_at, domain, query) for (domain, query), used_at in self.__uses.items()])
+            self.__uses.clear()
+
+    def __remember(self, key, users, fetched_at):
+        self.__memory[key] = (tuple(users), fetched_at)
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.__memory_entries:
+            self.__memory.popitem(last=False)
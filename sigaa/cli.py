@@ -0,0 +1,383 @@
+"""
+The ``sigaa`` command, to use the platform from the shell.
+
+Every subcommand writes its results as JSON Lines (one JSON object per line) as soon as each one is done,
+so the output can be piped to other commands. The queries and the recipients are read from the files supplied,
+or from the standard input, one per line.
+
+The login data is taken from the options or from the ``SIGAA_DOMAIN``, ``SIGAA_USERNAME`` and ``SIGAA_PASSWORD``
+environment variables, the password is asked if it's missing.
+
+.. code-block:: sh
+
+    $ export SIGAA_USERNAME=macielti
+    $ printf 'macielti\\nmaria\\n' | sigaa search --workers 2
+    {"query": "macielti", "users": ["BRUNO DO NASCIMENTO MACIEL (macielti)"]}
+    {"query": "maria", "users": ["MARIA DAS DORES (dores)", ...]}
+    $ sigaa crawl-users --workers 4 > users.jsonl
+    $ sigaa send --subject "Subject" --message "Message Text" recipients.txt
+    {"recipient": "BRUNO DO NASCIMENTO MACIEL (macielti)", "sent": true}
+    $ sigaa status
+    {"domain": "sigaa.ufpi.br", "valid": true, "authenticated": true, "seconds": 0.84}
+
+A server that doesn't answer ends the ``crawl-users`` and ``status`` subcommands with a line with the ``error``
+and the exit status 1, the lines already written are kept.
+
+The modules of the package are imported only by the subcommand that uses them, so the command starts fast.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import queue
+
+
+DEFAULT_DOMAIN = 'sigaa.ufpi.br'
+
+
+def main():
+    """
+    Entry point of the ``sigaa`` command.
+    """
+    sys.exit(run(sys.argv[1:]))
+
+
+def run(argv, stdin=None, stdout=None, session_factory=None):
+    """
+    Run the command.
+
+    :param argv: The arguments. Example: ['search', '--workers', '4', 'queries.txt']
+    :type argv: list
+    :param stdin: File read when there is no input file, **sys.stdin** if not supplied **(optional)**.
+    :type stdin: file
+    :param stdout: File where the results are written, **sys.stdout** if not supplied **(optional)**.
+    :type stdout: file
+    :param session_factory: Callable called as ``session_factory(domain)`` that returns a new requests.Session,
+        useful to mount custom adapters **(optional)**.
+    :type session_factory: function
+
+    :return: The exit status, 0 if every operation succeeded or 1 if some failed.
+    :rtype: int
+    """
+    args = build_parser().parse_args(argv)
+    output = JSONLinesWriter(sys.stdout if stdout is None else stdout)
+    return args.command(args, sys.stdin if stdin is None else stdin, output, session_factory)
+
+
+def build_parser():
+    """
+    Return the parser of the arguments of the command.
+
+    :rtype: **argparse.ArgumentParser**
+    """
+    parser = argparse.ArgumentParser(prog='sigaa', description='Use the SIGAA platform from the shell.')
+    subparsers = parser.add_subparsers(dest='subcommand', metavar='subcommand')
+    subparsers.required = True
+
+    login = argparse.ArgumentParser(add_help=False)
+    login.add_argument('--domain', default=os.environ.get('SIGAA_DOMAIN', DEFAULT_DOMAIN),
+                       help='domain of the platform (default: $SIGAA_DOMAIN or %(default)s)')
+    login.add_argument('--username', default=os.environ.get('SIGAA_USERNAME'),
+                       help='username of the login (default: $SIGAA_USERNAME)')
+    login.add_argument('--password', default=os.environ.get('SIGAA_PASSWORD'),
+                       help='password of the login (default: $SIGAA_PASSWORD, asked if missing)')
+    login.add_argument('--workers', type=int, default=1, help='number of sessions working at the same time')
+
+    search = subparsers.add_parser('search', parents=[login], help='search users by the beginning of the name')
+    search.add_argument('files', nargs='*', help='files with one query per line (default: stdin)')
+    search.set_defaults(command=search_command)
+
+    crawl = subparsers.add_parser('crawl-users', parents=[login], help='list every user of the platform')
+    crawl.add_argument('--cap', type=int, default=None,
+                       help='size of a search result truncated by the server (default: the platform one)')
+    crawl.add_argument('--processes', type=int, default=None,
+                       help='number of processes parsing the answers (default: parsed by the command)')
+    crawl.set_defaults(command=crawl_command)
+
+    send = subparsers.add_parser('send', parents=[login], help='send a message to many users')
+    send.add_argument('files', nargs='*', help='files with one recipient per line (default: stdin)')
+    send.add_argument('--subject', required=True, help='subject of the message')
+    text = send.add_mutually_exclusive_group(required=True)
+    text.add_argument('--message', help='text of the message')
+    text.add_argument('--message-file', help='file with the text of the message')
+    send.add_argument('--shard-size', type=int, default=100, help='max number of recipients of each message')
+    send.add_argument('--journal', help='journal file, running the same job again resumes it')
+    send.set_defaults(command=send_command)
+
+    status = subparsers.add_parser('status', parents=[login], help='verify the domain and the login')
+    status.set_defaults(command=status_command)
+
+    return parser
+
+
+class JSONLinesWriter:
+    """
+    Write objects as JSON Lines, a line at a time even when called by many threads.
+
+    :param stream: The file written.
+    :type stream: file
+    """
+
+    def __init__(self, stream):
+        self.__stream = stream
+        self.__lock = threading.Lock()
+
+    def write(self, entry):
+        """
+        Write an object as a line, flushed at once.
+
+        :param entry: The object. Example: {'query': 'macielti', 'users': [...]}
+        :type entry: dict
+        """
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self.__lock:
+            self.__stream.write(line)
+            self.__stream.flush()
+
+
+def read_lines(paths, stdin):
+    """
+    Read the not empty lines of the files, '-' or no file reads the standard input.
+    The lines are read while they are used, so a long input is never kept whole in memory.
+
+    :param paths: Paths of the files. Example: ['queries.txt']
+    :type paths: list
+    :param stdin: The standard input.
+    :type stdin: file
+
+    :return: Generator of the lines, without the line break.
+    :rtype: generator
+    """
+    for path in paths or ['-']:
+        if path == '-':
+            lines = stdin
+        else:
+            lines = open(path, 'r', encoding='utf-8')
+        try:
+            for line in lines:
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            if lines is not stdin:
+                lines.close()
+
+
+def run_parallel(operation, items, workers):
+    """
+    Run an operation over the items in ``workers`` threads, the results come in the order they are done.
+    Only a few items are read ahead of the threads.
+
+    :param operation: Callable called as ``operation(item)``.
+    :type operation: function
+    :param items: The items, an iterable.
+    :type items: iterable
+    :param workers: Number of threads.
+    :type workers: int
+
+    :return: Generator of (item, result, error), the error is **None** if the operation succeeded.
+    :rtype: generator
+    """
+    tasks = queue.Queue(maxsize=2 * workers)
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def feed():
+        try:
+            for item in items:
+                while not stop.is_set():
+                    try:
+                        tasks.put((item,), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+        finally:
+            for _ in range(workers):
+                tasks.put(None)
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is None:
+                results.put(None)
+                return
+            if stop.is_set():
+                continue
+            try:
+                results.put((task[0], operation(task[0]), None))
+            except Exception as e:
+                results.put((task[0], None, e))
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    threads += [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    running = workers
+    try:
+        while running:
+            result = results.get()
+            if result is None:
+                running -= 1
+                continue
+            yield result
+    finally:
+        stop.set()
+
+
+def search_command(args, stdin, output, session_factory):
+    """ Search each query with a pool of sessions, see :meth:`sigaa.pool.SessionPool.search_user`. """
+    from .pool import SessionPool
+
+    (username, password) = _get_login(args)
+    pool = SessionPool(args.domain, username, password, size=args.workers, session_factory=session_factory)
+    status = 0
+    try:
+        for (query, users, error) in run_parallel(pool.search_user, read_lines(args.files, stdin), args.workers):
+            if error is not None:
+                output.write({'query': query, 'error': str(error)})
+                status = 1
+            else:
+                output.write({'query': query, 'users': users})
+    finally:
+        pool.close()
+    return status
+
+
+def crawl_command(args, stdin, output, session_factory):
+    """ List every user as soon as it's found, see :meth:`sigaa.api.API.iter_users`. """
+    import requests
+    from .crawler import SEARCH_CAP
+    import sigaa.util as util
+
+    try:
+        api = _authenticate(args, session_factory)
+    except (requests.RequestException, util.NotValidDomain) as e:
+        output.write({'domain': args.domain, 'error': str(e)})
+        return 1
+    if api is None:
+        output.write({'domain': args.domain, 'error': 'Could not authenticate.'})
+        return 1
+    status = 0
+    try:
+        cap = SEARCH_CAP if args.cap is None else args.cap
+        for user in api.iter_users(args.workers, cap=cap, processes=args.processes):
+            (name, username) = util.split_user(user)
+            output.write({'user': user, 'name': name, 'username': username})
+    except (requests.RequestException, util.NotValidDomain) as e:
+        output.write({'domain': args.domain, 'error': str(e)})
+        status = 1
+    finally:
+        _deauthenticate(api)
+    return status
+
+
+def send_command(args, stdin, output, session_factory):
+    """ Send the message to the recipients in shards, see :class:`sigaa.bulk.BulkSender`. """
+    import tempfile
+    import requests
+    from .bulk import BulkSender
+    import sigaa.util as util
+
+    if args.message_file is not None:
+        with open(args.message_file, 'r', encoding='utf-8') as f:
+            message = f.read()
+    else:
+        message = args.message
+    recipients = list(read_lines(args.files, stdin))
+
+    try:
+        api = _authenticate(args, session_factory)
+    except (requests.RequestException, util.NotValidDomain) as e:
+        output.write({'domain': args.domain, 'error': str(e)})
+        return 1
+    if api is None:
+        output.write({'domain': args.domain, 'error': 'Could not authenticate.'})
+        return 1
+
+    journal = args.journal
+    if journal is None:
+        (fd, journal) = tempfile.mkstemp(suffix='.journal')
+        os.close(fd)
+
+    apis = [api]
+    try:
+        for _ in range(args.workers - 1):
+            apis.append(api.spawn())
+
+        def progress(shard, results):
+            for recipient in shard:
+                output.write({'recipient': recipient, 'sent': results.get(recipient, False)})
+
+        results = BulkSender(apis, journal, args.shard_size).send(recipients, args.subject, message, progress)
+    except (requests.RequestException, util.NotValidDomain) as e:
+        # the journal of a supplied file keeps the shards already sent, the next run resumes from them
+        output.write({'domain': args.domain, 'error': str(e)})
+        return 1
+    finally:
+        for api in apis:
+            _deauthenticate(api)
+        if args.journal is None:
+            os.remove(journal)
+    return 0 if all(results.values()) else 1
+
+
+def status_command(args, stdin, output, session_factory):
+    """ Verify that the domain is a SIGAA platform and, if there is a username, the login. """
+    import time
+    import requests
+    from .api import API
+    import sigaa.util as util
+
+    start = time.monotonic()
+    entry = {'domain': args.domain, 'valid': True}
+    try:
+        try:
+            api = API(args.domain, None if session_factory is None else session_factory(args.domain))
+        except util.NotValidDomain:
+            entry['valid'] = False
+
+        if entry['valid'] and args.username is not None:
+            (username, password) = _get_login(args)
+            entry['authenticated'] = api.authenticate(username, password)
+            if entry['authenticated']:
+                _deauthenticate(api)
+    except requests.RequestException as e:
+        output.write({'domain': args.domain, 'error': str(e), 'seconds': round(time.monotonic() - start, 3)})
+        return 1
+    entry['seconds'] = round(time.monotonic() - start, 3)
+    output.write(entry)
+    return 0 if entry['valid'] and entry.get('authenticated', True) else 1
+
+
+def _get_login(args):
+    if args.username is None:
+        raise SystemExit("sigaa: error: the username is required, use --username or $SIGAA_USERNAME.")
+    password = args.password
+    if password is None:
+        import getpass
+        password = getpass.getpass('Password of %s: ' % args.username)
+    return (args.username, password)
+
+
+def _authenticate(args, session_factory):
+    from .api import API
+
+    (username, password) = _get_login(args)
+    api = API(args.domain, None if session_factory is None else session_factory(args.domain))
+    if not api.authenticate(username, password):
+        return None
+    return api
+
+
+def _deauthenticate(api):
+    import requests
+
+    try:
+        api.deauthenticate()
+    except requests.RequestException:
+        # the server is down, the session expires by itself
+        pass
@@ -0,0 +1,188 @@
+import queue
+import threading
+import sigaa.util as util
+
+
+# prefixes used to cover the whole directory of the platform.
+CHARS = list('abcdefghijklmnopqrstuvwxyz1234567890')
+
+# chars appended to a prefix when its search hits the cap of the suggestion box,
+# the space is required to go deeper on the fullnames. Example: 'ana' -> 'ana '
+EXPANSION_CHARS = CHARS + [' ', '.', '_']
+
+# max number of users returned by the suggestion box of the 'envia_mensagem.jsf' page.
+SEARCH_CAP = 50
+
+# max length of a prefix, avoid to expand forever a branch that never goes under the cap.
+MAX_DEPTH = 8
+
+
+class DirectoryCrawler:
+    """
+    Class to crawl the users directory of the platform spreading the prefix queries
+    over a pool of :class:`sigaa.mailbox.MailBox` objects, one worker thread per mail box.
+    Created to be used mainly by the **sigaa.api.API**, use only if you know what you are doing.
+
+    Every mail box need to be bound to its own authenticated session and be already in the
+    send message page (with its own **j_id** and **j_id_jsp**), the SIGAA server keeps the
+    state of the page in the backend so a session can't be shared between workers.
+
+    :param mail_boxes: List of mail boxes ready to search. Example: [MailBox(...), ...]
+    :type mail_boxes: list
+    :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+    :type domain: String
+    :param max_per_host: Max number of searches running at the same time against the domain **(optional)**.
+    :type max_per_host: int
+    :param cap: Size of a search result that means it was truncated by the server **(optional)**.
+        The prefixes are treated as a trie, a truncated prefix is expanded with one more char
+        (``'a'`` -> ``'aa'``, ``'ab'``, ...) until the branch is under the cap.
+        Use **None** to search only the given prefixes.
+    :type cap: int
+    :param max_depth: Max length of an expanded prefix **(optional)**.
+    :type max_depth: int
+    :param expand: Callable called as ``expand(prefix, users)`` when a search hits the cap,
+        the prefix is expanded only if it returns **True** **(optional)**.
+    :type expand: function
+
+    :attr requests_per_depth: Number of searches of the last crawl by prefix length. Example: {1: 36, 2: 78}
+
+    >>> from sigaa.crawler import DirectoryCrawler
+    >>> crawler = DirectoryCrawler([mail_box_1, mail_box_2], 'sigaa.ufpi.br')
+    >>> crawler.crawl()
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    >>> crawler.requests_per_depth
+    {1: 36, 2: 117, 3: 39}
+    """
+
+    def __init__(self, mail_boxes, domain, max_per_host=None, cap=SEARCH_CAP, max_depth=MAX_DEPTH, expand=None):
+        self.__mail_boxes = list(mail_boxes)
+        self.__domain = domain
+        self.__cap = cap
+        self.__max_depth = max_depth
+        self.__expand_filter = expand
+        self.requests_per_depth = {}
+        self.__host_limit = None
+        if max_per_host:
+            self.__host_limit = util.get_host_semaphore(domain, max_per_host)
+
+    def crawl(self, prefixes=CHARS, progress=None):
+        """
+        Search every prefix and merge the results.
+
+        :param prefixes: Prefixes to be searched **(optional)**.
+        :type prefixes: list
+        :param progress: Callable called as ``progress(prefix, users, children)`` after each search,
+            where ``children`` are the prefixes queued by the expansion **(optional)**.
+        :type progress: function
+
+        :return: Sorted list of users infos without duplicates.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        return sorted(self.iter_crawl(prefixes, progress))
+
+    def iter_crawl(self, prefixes=CHARS, progress=None):
+        """
+        Search every prefix, yielding each user the first time one of the searches returns it.
+
+        The users come in the order the searches finish, not sorted. Closing the generator
+        (or leaving a ``for`` loop over it) stops the crawl, the searches not started are dropped.
+
+        :param prefixes: Prefixes to be searched **(optional)**.
+        :type prefixes: list
+        :param progress: Callable called as ``progress(prefix, users, children)`` after each search,
+            where ``children`` are the prefixes queued by the expansion **(optional)**.
+        :type progress: function
+
+        :return: Generator of users infos without duplicates.
+        :rtype: generator
+
+        >>> for user in crawler.iter_crawl():
+        ...     print(user)
+        ANA MARIA SOUSA (anamaria)
+        ...
+        """
+        pending = queue.Queue()
+        results = queue.Queue()
+        stop = threading.Event()
+        outstanding = 0
+        for prefix in prefixes:
+            pending.put(prefix)
+            outstanding += 1
+
+        # the username identifies the user, it's a lot shorter than the user info
+        seen = set()
+        self.requests_per_depth = {}
+
+        def work(mail_box):
+            while True:
+                prefix = pending.get()
+                if prefix is None:
+                    return
+                if stop.is_set():
+                    continue
+                try:
+                    result = self.__search(mail_box, prefix)
+                    children = self.__expand(prefix, result)
+                    # the result goes first, so the children are counted before they finish
+                    results.put((prefix, result, children, None))
+                    for child in children:
+                        pending.put(child)
+                except Exception as e:
+                    results.put((prefix, None, [], e))
+
+        threads = [threading.Thread(target=work, args=(mail_box,), daemon=True)
+                   for mail_box in self.__mail_boxes]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while outstanding:
+                (prefix, result, children, error) = results.get()
+                if error is not None:
+                    raise error
+                outstanding += len(children) - 1
+
+                depth = len(prefix)
+                self.requests_per_depth[depth] = self.requests_per_depth.get(depth, 0) + 1
+                if progress is not None:
+                    progress(prefix, result, children)
+
+                for user in result:
+                    username = util.split_user(user)[1]
+                    if username not in seen:
+                        seen.add(username)
+                        yield user
+        finally:
+            stop.set()
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+
+    def __expand(self, prefix, result):
+        if self.__cap is None or len(result) < self.__cap or len(prefix) >= self.__max_depth:
+            return []
+        if self.__expand_filter is not None and not self.__expand_filter(prefix, result):
+            return []
+        return expand_prefix(prefix)
+
+    def __search(self, mail_box, prefix):
+        if self.__host_limit is None:
+            return mail_box.search(prefix)
+        with self.__host_limit:
+            return mail_box.search(prefix)
+
+
+def expand_prefix(prefix):
+    """
+    Return the prefixes searched when the search of a prefix hits the cap, the prefix with one more char.
+
+    :param prefix: The truncated prefix. Example: 'ana'
+    :type prefix: String
+
+    :return: List of prefixes.
+    :rtype: list. Example: ['anaa', 'anab', ..., 'ana ', 'ana.', 'ana_']
+    """
+    return [prefix + char for char in EXPANSION_CHARS
+            # two spaces in a row never match a fullname
+            if not (char == ' ' and prefix.endswith(' '))]
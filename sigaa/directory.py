@@ -0,0 +1,143 @@
+from array import array
+from bisect import bisect_left
+import sigaa.util as util
+
+
+class UserDirectory:
+    """
+    Class to hold a loaded users directory in memory and answer the searches without network access.
+
+    The users infos are kept in a tuple and two sorted keys (username and fullname, both lower case)
+    point to them by position, so a prefix search is a binary search, **O(log n)**, plus the matches.
+
+    :param users: List of users infos. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    :type users: list
+
+    >>> from sigaa.api import API
+    >>> from sigaa.directory import UserDirectory
+    >>> api = API()
+    >>> api.authenticate('macielti', 'PaSsWoRd')
+    >>> directory = UserDirectory(api.get_all_users())
+    >>> directory.search('macielti')
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    >>> directory.get_username('BRUNO DO NASCIMENTO MACIEL')
+    'macielti'
+    """
+
+    def __init__(self, users):
+        self.__users = tuple(sorted(set(users)))
+
+        splitted = [util.split_user(user) for user in self.__users]
+        usernames = sorted((username.lower(), i) for i, (_, username) in enumerate(splitted))
+        names = sorted((name.lower(), i) for i, (name, _) in enumerate(splitted))
+
+        self.__username_keys = [key for key, _ in usernames]
+        self.__username_index = array('I', (i for _, i in usernames))
+        self.__name_keys = [key for key, _ in names]
+        self.__name_index = array('I', (i for _, i in names))
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Load the users of a :class:`sigaa.store.UserStore`.
+
+        :param store: The store of the users.
+        :type store: :class:`sigaa.store.UserStore`
+
+        :return: A directory with all the stored users.
+        :rtype: :class:`UserDirectory`
+        """
+        return cls(store.get_users())
+
+    def __len__(self):
+        return len(self.__users)
+
+    def __iter__(self):
+        return iter(self.__users)
+
+    def __contains__(self, user):
+        i = bisect_left(self.__users, user)
+        return i < len(self.__users) and self.__users[i] == user
+
+    def search(self, query, limit=None):
+        """
+        Search for a username or fullname of a user, from the start of it, the same way that the platform does.
+
+        :param query: Beginning of a username or fullname.
+        :type query: String
+        :param limit: Max number of users returned **(optional)**.
+        :type limit: int
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        query = query.lower()
+        found = set(self.__match(self.__username_keys, self.__username_index, query))
+        found.update(self.__match(self.__name_keys, self.__name_index, query))
+        return [self.__users[i] for i in sorted(found)][:limit]
+
+    def search_username(self, query):
+        """
+        Search only by the beginning of the username.
+
+        :param query: Beginning of a username.
+        :type query: String
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        found = self.__match(self.__username_keys, self.__username_index, query.lower())
+        return [self.__users[i] for i in sorted(found)]
+
+    def search_name(self, query):
+        """
+        Search only by the beginning of the fullname.
+
+        :param query: Beginning of a fullname.
+        :type query: String
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        found = self.__match(self.__name_keys, self.__name_index, query.lower())
+        return [self.__users[i] for i in sorted(found)]
+
+    def get_username(self, name):
+        """
+        Method that returns the username of a user by its fullname.
+
+        :param name: The fullname of the user. Example: 'BRUNO DO NASCIMENTO MACIEL'
+        :type name: String
+
+        :return: The username or **None** if the user isn't in the directory.
+        :rtype: String
+        """
+        for user in self.search_name(name):
+            (user_name, username) = util.split_user(user)
+            if user_name.lower() == name.lower():
+                return username
+        return None
+
+    def get_name(self, username):
+        """
+        Method that returns the fullname of a user by its username.
+
+        :param username: The username of the user. Example: 'macielti'
+        :type username: String
+
+        :return: The fullname or **None** if the user isn't in the directory.
+        :rtype: String
+        """
+        for user in self.search_username(username):
+            (name, user_username) = util.split_user(user)
+            if user_username.lower() == username.lower():
+                return name
+        return None
+
+    @staticmethod
+    def __match(keys, index, query):
+        i = bisect_left(keys, query)
+        while i < len(keys) and keys[i].startswith(query):
+            yield index[i]
+            i += 1
+
@@ -0,0 +1,243 @@
+import concurrent.futures
+import multiprocessing
+import queue
+import sys
+import threading
+import sigaa.parsers as parsers
+import sigaa.transport as transport
+import sigaa.util as util
+from .crawler import CHARS, SEARCH_CAP, MAX_DEPTH, expand_prefix
+
+
+# max number of answers parsed by a process at a time.
+BATCH_SIZE = 16
+
+# joins the users infos of a result sent back by the processes, a string is a lot cheaper to pickle than a list.
+SEPARATOR = '\0'
+
+
+class ProcessCrawler:
+    """
+    Class to crawl the users directory like the :class:`sigaa.crawler.DirectoryCrawler`, with the parsing of the
+    answers in a pool of processes. Created to be used mainly by the **sigaa.api.API**, use only if you know what you are doing.
+
+    The searches are still sent by one thread per mail box, that only read the answers (see :meth:`sigaa.mailbox.MailBox.fetch_search`).
+    The answers are sent to the processes in batches, each process parses them, sorts and splits the users infos
+    and sends back a compact result per prefix. This thread only expands the prefixes and skips the users already
+    found, so the parsing of large directories doesn't hold the GIL needed by the threads of the searches.
+
+    :param mail_boxes: List of mail boxes ready to search. Example: [MailBox(...), ...]
+    :type mail_boxes: list
+    :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+    :type domain: String
+    :param processes: Number of processes of the pool, the number of CPUs if not supplied **(optional)**.
+    :type processes: int
+    :param max_per_host: Max number of searches running at the same time against the domain **(optional)**.
+    :type max_per_host: int
+    :param cap: Size of a search result that means it was truncated by the server, **None** disables the expansion **(optional)**.
+    :type cap: int
+    :param max_depth: Max length of an expanded prefix **(optional)**.
+    :type max_depth: int
+    :param expand: Callable called as ``expand(prefix, users)`` when a search hits the cap,
+        the prefix is expanded only if it returns **True** **(optional)**.
+    :type expand: function
+    :param batch_size: Max number of answers sent to a process at a time **(optional)**.
+    :type batch_size: int
+    :param executor: A pool of processes to be used instead of a new one for each crawl, it isn't shut down,
+        see :func:`new_executor` **(optional)**.
+    :type executor: concurrent.futures.ProcessPoolExecutor
+
+    :attr requests_per_depth: Number of searches of the last crawl by prefix length. Example: {1: 36, 2: 78}
+
+    >>> from sigaa.engine import ProcessCrawler
+    >>> crawler = ProcessCrawler([mail_box_1, mail_box_2], 'sigaa.ufpi.br', processes=4)
+    >>> crawler.crawl()
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    """
+
+    def __init__(self, mail_boxes, domain, processes=None, max_per_host=None, cap=SEARCH_CAP, max_depth=MAX_DEPTH,
+                 expand=None, batch_size=BATCH_SIZE, executor=None):
+        self.__mail_boxes = list(mail_boxes)
+        self.__domain = domain
+        self.__processes = processes
+        self.__cap = cap
+        self.__max_depth = max_depth
+        self.__expand_filter = expand
+        self.__batch_size = batch_size
+        self.__executor = executor
+        self.requests_per_depth = {}
+        self.__host_limit = None
+        if max_per_host:
+            self.__host_limit = util.get_host_semaphore(domain, max_per_host)
+
+    def crawl(self, prefixes=CHARS, progress=None):
+        """
+        Search every prefix and merge the results, see :meth:`sigaa.crawler.DirectoryCrawler.crawl`.
+
+        :return: Sorted list of users infos without duplicates.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        return sorted(self.iter_crawl(prefixes, progress))
+
+    def iter_crawl(self, prefixes=CHARS, progress=None):
+        """
+        Search every prefix, yielding each user the first time one of the results returns it,
+        see :meth:`sigaa.crawler.DirectoryCrawler.iter_crawl`.
+
+        :param prefixes: Prefixes to be searched **(optional)**.
+        :type prefixes: list
+        :param progress: Callable called as ``progress(prefix, users, children)`` after each result,
+            where ``children`` are the prefixes queued by the expansion **(optional)**.
+        :type progress: function
+
+        :return: Generator of users infos without duplicates.
+        :rtype: generator
+
+        :raises ViewExpired: If the server rejected the view state of a search.
+        """
+        pending = queue.Queue()
+        # the answers read by the threads and the results parsed by the processes
+        events = queue.Queue()
+        stop = threading.Event()
+        outstanding = 0
+        fetching = 0
+        for prefix in prefixes:
+            pending.put(prefix)
+            outstanding += 1
+            fetching += 1
+
+        seen = set()
+        self.requests_per_depth = {}
+
+        def work(mail_box):
+            while True:
+                prefix = pending.get()
+                if prefix is None:
+                    return
+                if stop.is_set():
+                    continue
+                try:
+                    (body, encoding) = self.__fetch(mail_box, prefix)
+                    events.put(('answer', (prefix, body, encoding)))
+                except Exception as e:
+                    events.put(('error', e))
+
+        executor = self.__executor
+        if executor is None:
+            # started before the threads of the searches
+            executor = new_executor(self.__processes)
+
+        threads = [threading.Thread(target=work, args=(mail_box,), daemon=True)
+                   for mail_box in self.__mail_boxes]
+        for thread in threads:
+            thread.start()
+
+        batch = []
+        # the batches not parsed yet, cancelled if the crawl stops
+        futures = set()
+        try:
+            while outstanding:
+                (kind, value) = events.get()
+                if kind == 'error':
+                    raise value
+
+                if kind == 'answer':
+                    fetching -= 1
+                    batch.append(value)
+                    # without answers on the way the children wait for this batch, it goes at once
+                    if len(batch) >= self.__batch_size or fetching == 0:
+                        future = executor.submit(parse_batch, batch)
+                        futures.add(future)
+                        future.add_done_callback(lambda future: events.put(('parsed', future)))
+                        batch = []
+                    continue
+
+                futures.discard(value)
+                for (prefix, joined_users, joined_usernames, view_expired) in value.result():
+                    if view_expired:
+                        raise util.ViewExpired("The server rejected the view state of the search of %r." % prefix)
+                    users = joined_users.split(SEPARATOR) if joined_users else []
+                    children = self.__expand(prefix, users)
+                    for child in children:
+                        pending.put(child)
+                    outstanding += len(children) - 1
+                    fetching += len(children)
+
+                    depth = len(prefix)
+                    self.requests_per_depth[depth] = self.requests_per_depth.get(depth, 0) + 1
+                    if progress is not None:
+                        progress(prefix, users, children)
+
+                    if not users:
+                        continue
+                    for (user, username) in zip(users, joined_usernames.split(SEPARATOR)):
+                        if username not in seen:
+                            seen.add(username)
+                            yield user
+        finally:
+            stop.set()
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+            # shutdown(cancel_futures=True) needs Python 3.9, the package supports 3.6
+            for future in futures:
+                future.cancel()
+            if self.__executor is None:
+                executor.shutdown()
+
+    def __expand(self, prefix, users):
+        if self.__cap is None or len(users) < self.__cap or len(prefix) >= self.__max_depth:
+            return []
+        if self.__expand_filter is not None and not self.__expand_filter(prefix, users):
+            return []
+        return expand_prefix(prefix)
+
+    def __fetch(self, mail_box, prefix):
+        if self.__host_limit is None:
+            return mail_box.fetch_search(prefix)
+        with self.__host_limit:
+            return mail_box.fetch_search(prefix)
+
+
+def new_executor(processes=None):
+    """
+    Create the pool of processes of a :class:`ProcessCrawler`.
+
+    The processes are started from a clean interpreter (spawn), a fork would copy the running threads.
+    Python 3.6 can't choose how the processes of a pool are started: there they are forked at once,
+    by a first task run here, so call it before starting any thread.
+
+    :param processes: Number of processes, the number of CPUs if not supplied **(optional)**.
+    :type processes: int
+
+    :return: A pool of processes, shut it down when it isn't needed anymore.
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    if sys.version_info >= (3, 7):
+        return concurrent.futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'))
+    executor = concurrent.futures.ProcessPoolExecutor(processes)
+    executor.submit(len, ()).result()
+    return executor
+
+
+def parse_batch(batch):
+    """
+    Parse a batch of answers of the AJAX search of users, run by the processes of a :class:`ProcessCrawler`.
+
+    :param batch: List of (prefix, body, encoding), see :meth:`sigaa.mailbox.MailBox.fetch_search`.
+    :type batch: list
+
+    :return: List of (prefix, users infos, usernames, view expired), the sorted users infos and their usernames
+        joined by :data:`SEPARATOR`.
+    :rtype: list. Example: [('mac', 'BRUNO DO NASCIMENTO MACIEL (macielti)', 'macielti', False), ...]
+    """
+    results = []
+    for (prefix, body, encoding) in batch:
+        parser = transport.SuggestionParser(parsers.VIEW_EXPIRED, encoding)
+        parser.feed(body)
+        users = parser.close()
+        view_expired = any(parser.found(marker) for marker in parsers.VIEW_EXPIRED)
+        results.append((prefix, SEPARATOR.join(users), SEPARATOR.join(util.split_user(user)[1] for user in users),
+                        view_expired))
+    return results
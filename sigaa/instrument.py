@@ -0,0 +1,308 @@
+import functools
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# the instrumentation in use, None when it's disabled.
+_instrumentation = None
+
+# the operations running in each thread, the bytes of a request are counted in all of them.
+_running = threading.local()
+
+
+class Instrumentation:
+    """
+    Class that collects the numbers of the requests and of the operations of the package: the number of requests,
+    the bytes sent and received and the time of each endpoint, the time of each operation of :mod:`sigaa.api`,
+    :mod:`sigaa.mailbox` and :mod:`sigaa.util` (navigation, searches, parse of the pages...) and the number
+    of retries.
+
+    It's disabled by default, enable it with :func:`enable`. While it's disabled the instrumented
+    code only verifies that there is no instrumentation in use.
+
+    :param callback: Callable called with a dict of each event recorded **(optional)**.
+        Example: {'type': 'request', 'method': 'POST', 'path': '/cxpostal/envia_mensagem.jsf', 'status': 200,
+        'sent': 412, 'received': 1093, 'elapsed': 0.12}
+    :type callback: function
+
+    >>> import sigaa.instrument as instrument
+    >>> instrumentation = instrument.enable()
+    >>> api.search_user('macielti')
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    >>> print(instrumentation.to_prometheus())
+    # TYPE sigaa_requests_total counter
+    sigaa_requests_total{method="GET",path="/sigaa/abrirCaixaPostal.jsf"} 1
+    ...
+    >>> instrument.disable()
+    """
+
+    def __init__(self, callback=None):
+        self.__callback = callback
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard the numbers collected until now.
+        """
+        with self.__lock:
+            self.__requests = {}
+            self.__operations = {}
+            self.__retries = {}
+
+    def record_request(self, method, path, status, sent, received, elapsed, decoded=None, operations=()):
+        """
+        Record a request, called for each response received by an instrumented session (see :func:`observe`).
+
+        :param method: 'GET' or 'POST'.
+        :type method: String
+        :param path: Path of the url, without the query. Example: '/cxpostal/envia_mensagem.jsf'
+        :type path: String
+        :param status: Status code of the response.
+        :type status: int
+        :param sent: Number of bytes of the body of the request.
+        :type sent: int
+        :param received: Number of bytes of the body of the response, as they came over the wire (compressed).
+        :type received: int
+        :param elapsed: Time, in seconds, until the response arrived.
+        :type elapsed: float
+        :param decoded: Number of bytes of the body of the response after the decompression, the same as ``received``
+            if not supplied **(optional)**.
+        :type decoded: int
+        :param operations: Names of the operations that sent the request **(optional)**.
+        :type operations: tuple
+        """
+        if decoded is None:
+            decoded = received
+        with self.__lock:
+            numbers = self.__requests.setdefault((method, path), [0, 0, 0, 0.0, 0, 0])
+            numbers[0] += 1
+            numbers[1] += sent
+            numbers[2] += received
+            numbers[3] += elapsed
+            if status >= 400:
+                numbers[4] += 1
+            numbers[5] += decoded
+            for operation in operations:
+                numbers = self.__operations.setdefault(operation, [0, 0.0, 0.0, 0, 0])
+                numbers[3] += sent
+                numbers[4] += received
+        self.__emit({'type': 'request', 'method': method, 'path': path, 'status': status,
+                     'sent': sent, 'received': received, 'decoded': decoded, 'elapsed': elapsed})
+
+    def record_operation(self, operation, elapsed):
+        """
+        Record the time of an operation, see :func:`timed`.
+
+        :param operation: Name of the operation. Example: 'mailbox.search'
+        :type operation: String
+        :param elapsed: Time, in seconds, spent by the operation.
+        :type elapsed: float
+        """
+        with self.__lock:
+            numbers = self.__operations.setdefault(operation, [0, 0.0, 0.0, 0, 0])
+            numbers[0] += 1
+            numbers[1] += elapsed
+            numbers[2] = max(numbers[2], elapsed)
+        self.__emit({'type': 'operation', 'operation': operation, 'elapsed': elapsed})
+
+    def record_retry(self, operation):
+        """
+        Record a retry of an operation, see :func:`count_retry`.
+
+        :param operation: Name of the operation. Example: 'mailbox.add_recipient'
+        :type operation: String
+        """
+        with self.__lock:
+            self.__retries[operation] = self.__retries.get(operation, 0) + 1
+        self.__emit({'type': 'retry', 'operation': operation})
+
+    def get_summary(self):
+        """
+        Method that returns the numbers collected until now.
+
+        The bytes of an operation count the requests of the operations called by it.
+
+        :return: The numbers of the requests by endpoint, of the operations and of the retries.
+        :rtype: dict. Example: {'requests': [{'method': 'POST', 'path': '/sigaa/logar.do', 'count': 1, ...}, ...],
+            'operations': [{'operation': 'api.authenticate', 'count': 1, 'seconds': 0.3, 'max_seconds': 0.3,
+            'bytes_sent': 96, 'bytes_received': 2350}, ...], 'retries': {'mailbox.add_recipient': 2}}
+        """
+        with self.__lock:
+            requests = [{'method': method, 'path': path, 'count': numbers[0], 'bytes_sent': numbers[1],
+                         'bytes_received': numbers[2], 'bytes_decoded': numbers[5], 'seconds': numbers[3],
+                         'errors': numbers[4]}
+                        for (method, path), numbers in sorted(self.__requests.items())]
+            operations = [{'operation': operation, 'count': numbers[0], 'seconds': numbers[1],
+                           'max_seconds': numbers[2], 'bytes_sent': numbers[3], 'bytes_received': numbers[4]}
+                          for operation, numbers in sorted(self.__operations.items())]
+            retries = dict(self.__retries)
+        return {'requests': requests, 'operations': operations, 'retries': retries}
+
+    def to_json(self):
+        """
+        Method that returns the summary (see :meth:`Instrumentation.get_summary`) as a JSON string.
+        """
+        return json.dumps(self.get_summary(), sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Method that returns a snapshot of the numbers in the Prometheus text exposition format.
+
+        :return: The metrics, one sample per line.
+        :rtype: String
+        """
+        summary = self.get_summary()
+        lines = []
+
+        def family(name, kind, samples):
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in samples:
+                lines.append('%s{%s} %s' % (name, ','.join('%s="%s"' % label for label in labels), value))
+
+        endpoints = [(entry, (('method', entry['method']), ('path', entry['path']))) for entry in summary['requests']]
+        family('sigaa_requests_total', 'counter', [(labels, entry['count']) for entry, labels in endpoints])
+        family('sigaa_request_errors_total', 'counter', [(labels, entry['errors']) for entry, labels in endpoints])
+        family('sigaa_request_bytes_sent_total', 'counter',
+               [(labels, entry['bytes_sent']) for entry, labels in endpoints])
+        family('sigaa_request_bytes_received_total', 'counter',
+               [(labels, entry['bytes_received']) for entry, labels in endpoints])
+        family('sigaa_request_bytes_decoded_total', 'counter',
+               [(labels, entry['bytes_decoded']) for entry, labels in endpoints])
+        family('sigaa_request_seconds_total', 'counter', [(labels, entry['seconds']) for entry, labels in endpoints])
+
+        operations = [(entry, (('operation', entry['operation']),)) for entry in summary['operations']]
+        family('sigaa_operations_total', 'counter', [(labels, entry['count']) for entry, labels in operations])
+        family('sigaa_operation_seconds_total', 'counter',
+               [(labels, entry['seconds']) for entry, labels in operations])
+        family('sigaa_operation_max_seconds', 'gauge',
+               [(labels, entry['max_seconds']) for entry, labels in operations])
+        family('sigaa_operation_bytes_sent_total', 'counter',
+               [(labels, entry['bytes_sent']) for entry, labels in operations])
+        family('sigaa_operation_bytes_received_total', 'counter',
+               [(labels, entry['bytes_received']) for entry, labels in operations])
+
+        family('sigaa_retries_total', 'counter',
+               [((('operation', operation),), count) for operation, count in sorted(summary['retries'].items())])
+
+        return '\n'.join(lines) + '\n'
+
+    def __emit(self, event):
+        if self.__callback is not None:
+            self.__callback(event)
+
+
+def enable(instrumentation=None):
+    """
+    Start to instrument the package, the numbers of every session are collected by the same object.
+
+    :param instrumentation: The object that collects the numbers, a new one if not supplied **(optional)**.
+    :type instrumentation: :class:`Instrumentation`
+
+    :return: The instrumentation in use.
+    :rtype: :class:`Instrumentation`
+    """
+    global _instrumentation
+    _instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+    return _instrumentation
+
+
+def disable():
+    """
+    Stop to instrument the package.
+    """
+    global _instrumentation
+    _instrumentation = None
+
+
+def get_instrumentation():
+    """
+    Return the instrumentation in use, or **None** if it's disabled.
+    """
+    return _instrumentation
+
+
+def attach(session):
+    """
+    Observe every response received by a session (see :func:`observe`), done by :func:`sigaa.util.generate_session`.
+
+    :param session: The session.
+    :type session: requests.Session
+    """
+    if observe not in session.hooks['response']:
+        session.hooks['response'].append(observe)
+
+
+def observe(r, *args, **kwargs):
+    """
+    Record a response, used as a **requests** response hook.
+
+    The size received is the one of the compressed body, read from the connection, when the server compressed it.
+    The body of a streamed response isn't read, its size is taken from the Content-Length header.
+
+    :param r: A response received by the session.
+    :type r: requests.Response
+
+    :return: The same response.
+    :rtype: requests.Response
+    """
+    instrumentation = _instrumentation
+    if instrumentation is None:
+        return r
+
+    body = r.request.body or b''
+    if kwargs.get('stream'):
+        received = decoded = int(r.headers.get('Content-Length', 0))
+    else:
+        decoded = len(r.content)
+        # bytes pulled from the connection by urllib3, before the decompression
+        tell = getattr(r.raw, 'tell', None)
+        received = tell() if tell is not None else decoded
+    instrumentation.record_request(r.request.method, urlparse(r.url).path, r.status_code,
+                                   len(body.encode('utf-8') if isinstance(body, str) else body),
+                                   received, r.elapsed.total_seconds(), decoded,
+                                   tuple(set(getattr(_running, 'operations', ()))))
+    return r
+
+
+def timed(operation):
+    """
+    Decorator that records the time of each call of the decorated function as ``operation``.
+
+    :param operation: Name of the operation. Example: 'mailbox.search'
+    :type operation: String
+
+    >>> @timed('mailbox.search')
+    ... def search(self, query):
+    ...     ...
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            instrumentation = _instrumentation
+            if instrumentation is None:
+                return function(*args, **kwargs)
+            running = _running.__dict__.setdefault('operations', [])
+            running.append(operation)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                running.pop()
+                instrumentation.record_operation(operation, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count_retry(operation):
+    """
+    Record a retry of an operation, if the instrumentation is enabled.
+
+    :param operation: Name of the operation. Example: 'mailbox.add_recipient'
+    :type operation: String
+    """
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        instrumentation.record_retry(operation)
@@ -1,6 +1,9 @@
-import re
 import requests
 import sigaa.util as util
+import sigaa.instrument as instrument
+import sigaa.parsers as parsers
+import sigaa.transport as transport
+from .user import User
 
 
 class MailBox:
@@ -8,18 +11,34 @@ class MailBox:
     Class to viabilizate some operations on Mail Box of the SIGAA Portal.
     Created to be used mainly by the **sigaa.api.API**, use only if you know what you are doing.
 
+    The operations raise :class:`sigaa.util.ViewExpired` when the server rejects the view state,
+    the pages need to be opened again (:meth:`MailBox.goto_mainbox_portal` and :meth:`MailBox.goto_send_message`).
+
     :param session: An autheticated requests.Session from sigaa.api.API.
     :type session: requests.Session
     :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
     :type domain: String
+    :param throttle: Paces the requests and tries the searches again on server errors **(optional)**.
+    :type throttle: :class:`sigaa.ratelimit.Throttle`
+    :param cache: Keeps the results of the searches **(optional)**.
+    :type cache: :class:`sigaa.cache.SearchCache`
+    :param minimal: If **True** the form data is trimmed: the empty attachment fields aren't sent
+        (see :data:`sigaa.transport.OPTIONAL_FIELDS`), nor the ``subject`` and the ``message`` of the searches,
+        that only process the searched query **(optional)**. The mail boxes
+        created by the :class:`sigaa.api.API` are minimal, they never search with a subject or a message.
+    :type minimal: Boolean
     """
 
-    def __init__(self, session, domain):
+    def __init__(self, session, domain, throttle=None, cache=None, minimal=False):
         self.__session = session
         self.__domain = domain
+        self.__throttle = throttle
+        self.__cache = cache
+        self.__minimal = minimal
         self.__j_id = None
         self.__j_id_jsp = None
 
+    @instrument.timed('mailbox.goto_mainbox_portal')
     def goto_mainbox_portal(self):
         """
         Request the Mailbox portal.
@@ -30,23 +49,23 @@ class MailBox:
         >>> from sigaa.api import API
         >>> from sigaa.mailbox import MailBox
         >>> api = API()
-        >>> api.authenticate('macielti', '9pfP52ZpB5eE')
+        >>> api.authenticate('macielti', 'PaSsWoRd')
         >>> mail_box = MailBox(api.get_session(), api.get_domain())
         >>> mail_box.goto_mainbox_portal()
         """
         url = "https://www.%s/sigaa/abrirCaixaPostal.jsf?sistema=2" % self.__domain
-        r = self.__session.get(url, allow_redirects=True,)
+        r = self.__request('GET', url, allow_redirects=True)
 
         # extract domain from response url
-        self.__domain = re.findall(
-            r"^(?:https?:\/\/)?(?:[^@\/\n]+@)?(?:www\.)?([^:\/?\n]+)", r.url)[0]
+        self.__domain = util.extract_domain(r.url)
 
         # verify the success of the operation
-        if "Registro(s) Encontrado(s)" in r.text:
+        if util.is_mailbox_page(r.text):
             (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(r.text)
             return True
         return False
         
+    @instrument.timed('mailbox.goto_send_message')
     def goto_send_message(self):
         """
         This method acess the page used to send messages.
@@ -57,7 +76,7 @@ class MailBox:
         >>> from sigaa.api import API
         >>> from sigaa.mailbox import MailBox
         >>> api = API()
-        >>> api.authenticate('macielti', '9pfP52ZpB5eE')
+        >>> api.authenticate('macielti', 'PaSsWoRd')
         >>> mail_box = MailBox(api.get_session(), api.get_domain())
         >>> mail_box.goto_mainbox_portal()
         >>> mail_box.goto_send_message()
@@ -65,22 +84,17 @@ class MailBox:
         """
 
         url = "https://www.%s/cxpostal/caixa_postal.jsf" % self.__domain
-        payload = {
-            'form': 'form',
-            'form:selectOpMarcarMsg': '8',
-            'form:SelectOneMenuPaginacao': '0',
-            'javax.faces.ViewState': self.__j_id,
-            'form:cmdMsg': 'form:cmdMsg'
-        }
-        r = self.__session.post(url, data=payload, allow_redirects=True)
+        payload = send_message_page_payload(self.__j_id)
+        r = self.__request('POST', url, data=payload, allow_redirects=True)
 
         # verify the success of the operation
-        if "<caption>Anexar Arquivos</caption>" in r.text:
+        if util.is_send_message_page(r.text):
             (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(r.text)
             return True
         return False
 
 
+    @instrument.timed('mailbox.search')
     def search(self, query, subject="", message=""):
         """
         Search the users using the AJAX requisition.
@@ -92,44 +106,80 @@ class MailBox:
         :param message: Message text **(optional)**.
         :type message: String
 
+        When a cache is in use a fresh result of the same query is returned without requesting the server,
+        only the results of successful searches are kept. A minimal mail box doesn't send the ``subject``
+        and the ``message``.
+
         :return: List of users info provided by the platform.
         :rtype: list
 
+        :raises ServerUnavailable: If a throttle is in use and the server kept failing the search.
+
         >>> from sigaa.api import API
         >>> from sigaa.mailbox import MailBox
         >>> api = API()
-        >>> api.authenticate('macielti', '9pfP52ZpB5eE')
+        >>> api.authenticate('macielti', 'PaSsWoRd')
         >>> mail_box = MailBox(api.get_session(), api.get_domain())
         >>> mail_box.goto_mainbox_portal()
         >>> mail_box.goto_send_message()
         >>> mail_box.search('macielti')
         ['BRUNO DO NASCIMENTO MACIEL (macielti)']
         """
+        if self.__cache is not None:
+            users = self.__cache.get(self.__domain, query)
+            if users is not None:
+                return users
 
-        url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
+        return self.__search(query, subject, message)
+
+    @instrument.timed('mailbox.fetch_search')
+    def fetch_search(self, query, subject="", message=""):
+        """
+        Send the AJAX search of users and return the answer without parsing it, so it can be parsed
+        in another process (see :class:`sigaa.engine.ProcessCrawler`) with a :class:`sigaa.transport.SuggestionParser`.
+        The cache isn't used and the answer isn't verified, a rejected view state must be verified by the parser.
+
+        :param query: Search users by partial or full match on username. Example: "macielti"
+        :type query: String
+        :param subject: Subject of the message **(optional)**.
+        :type subject: String
+        :param message: Message text **(optional)**.
+        :type message: String
+
+        :return: The body of the answer, already decompressed, and its encoding.
+        :rtype: tuple. Example: (b'<?xml version="1.0"?>...', 'utf-8')
 
-        payload = {
-            'AJAXREQUEST': self.__j_id_jsp,
-            'form': 'form',
-            'form:usuarioAuto': query,
-            'form:suggestion_selection': '',
-            'form:assunto': subject,
-            'form:texto': message,
-            'form:nome': '',
-            'form:arquivo2': '',
-            'javax.faces.ViewState': self.__j_id,
-            'form:suggestion': 'form:suggestion',
-            'ajaxSingle': 'form:suggestion',
-            'inputvalue': query,
-            'AJAX:EVENTS_COUNT': '1'
-        }
-        r = self.__session.post(url, data=payload, allow_redirects=True)
-
-        users = re.findall(r"(?:\w+\s)+\(.+?\)", r.text)
-
-        return sorted(set(users))
+        :raises ServerUnavailable: If a throttle is in use and the server kept failing the search.
+        """
+        r = self.__post_search(query, subject, message)
+        return (r.content, r.encoding or 'utf-8')
+
+    def __post_search(self, query, subject, message):
+        url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
+        payload = search_payload(self.__j_id, self.__j_id_jsp, query, subject, message)
+        if self.__minimal:
+            # an ajaxSingle request, the server processes only the query
+            payload = transport.compact_payload(payload, drop=('form:assunto', 'form:texto'))
+        # the search doesn't change the state of the page, it can be sent again
+        return self.__send('POST', url, idempotent=True, data=payload, allow_redirects=True)
+
+    def __search(self, query, subject="", message=""):
+        r = self.__post_search(query, subject, message)
+
+        # the answer is parsed from the bytes, without decoding the whole text
+        parser = transport.SuggestionParser((parsers.AJAX_UPDATE,) + parsers.VIEW_EXPIRED, r.encoding or 'utf-8')
+        for chunk in r.iter_content(transport.CHUNK_SIZE):
+            parser.feed(chunk)
+        users = parser.close()
+        if any(parser.found(marker) for marker in parsers.VIEW_EXPIRED):
+            raise util.ViewExpired("The server rejected the view state %s." % self.__j_id)
+
+        if self.__cache is not None and parser.found(parsers.AJAX_UPDATE):
+            self.__cache.put(self.__domain, query, users)
+        return users
     
-    def simulate_user_selection(self, user, subject="", message=""):
+    @instrument.timed('mailbox.simulate_user_selection')
+    def simulate_user_selection(self, user, subject="", message="", index=0):
         """
         Simulate the select operation. It's required when adding an user as recipient
         of a message. Created to be used inside the `MailBox.add_user_recipient()` method.
@@ -140,29 +190,18 @@ class MailBox:
         :type subject: String
         :param message: Message text **(optional)**.
         :type message: String
+        :param index: Position of the user in the result of the last search sent to the server **(optional)**.
+        :type index: int
        
         :return: **True** for success or **False** for failure.
         :rtype: **Boolean**
         """
         url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
-        payload = {
-            'AJAXREQUEST' : self.__j_id_jsp,
-            'form' : 'form',
-            'form:usuarioAuto' : user, #user complete  data string
-            'form:suggestion_selection' : '0',
-            'form:assunto' : subject,
-            'form:texto' : message,
-            'form:nome'	: '',
-            'form:arquivo2'	: '',
-            'form:confLeitura' : 'on',
-            'form:enviarEmail' : 'on',
-            'javax.faces.ViewState' : self.__j_id,
-            'form:suggestion:%s12' % self.__j_id_jsp[:-1] : 'form:suggestion:%s12' % self.__j_id_jsp[:-1]
-        }
-
-        r = self.__session.post(url, data=payload)
-
-        if "Ajax-Update-Ids" in r.text:
+        payload = selection_payload(self.__j_id, self.__j_id_jsp, user, subject, message, index)
+
+        r = self.__request('POST', url, data=payload)
+
+        if util.is_ajax_update(r.text):
             return True
         return False
 
@@ -171,7 +210,7 @@ class MailBox:
         Add user as recipient of the message
 
         :param user: User to be added as recipient of the message. Example: "BRUNO DO NASCIMENTO MACIEL (macielti)"
-        :type user: String
+        :type user: String or :class:`sigaa.user.User`
         :param subject: Subject of the message **(optional)**.
         :type subject: String
         :param message: Message text **(optional)**.
@@ -180,31 +219,65 @@ class MailBox:
         :return: **True** for success or **False** for failure.
         :rtype: **Boolean**
         """
+        return self.__add_recipient(User.parse(user), subject, message)
+
+    def add_user_recipients(self, users, subject="", message="", progress=None):
+        """
+        Add a list of users as recipients of the message, a failure doesn't stop the others.
+
+        Each user is added like :meth:`MailBox.add_user_recipient` does: the username is searched, the user
+        is selected from that result and added. The selection points to a position in the last search of
+        the page, so the search is always sent to the server, even with a cache. A user not found costs only the search.
+
+        :param users: List of users, usernames or :class:`sigaa.user.User` records.
+            Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", "macielti", ...]
+        :type users: list
+        :param subject: Subject of the message **(optional)**.
+        :type subject: String
+        :param message: Message text **(optional)**.
+        :type message: String
+        :param progress: Callable called as ``progress(user, result)`` after each user **(optional)**.
+        :type progress: function
+
+        :return: The result of each user, **True** for success or **False** for failure.
+        :rtype: dict. Example: {"BRUNO DO NASCIMENTO MACIEL (macielti)": True, ...}
+
+        >>> mail_box.add_user_recipients(["BRUNO DO NASCIMENTO MACIEL (macielti)", "nobody"])
+        {'BRUNO DO NASCIMENTO MACIEL (macielti)': True, 'nobody': False}
+        """
+        results = {}
+        for user in users:
+            result = self.__add_recipient(User.parse(user), subject, message)
+            results[user] = result
+            if progress is not None:
+                progress(user, result)
+
+        return results
+
+    @instrument.timed('mailbox.add_recipient')
+    def __add_recipient(self, user, subject, message):
+        # the selection is a position in the last search of the page, a search left by another
+        # user (or answered by the cache) would select the wrong one
+        found = [User.parse(found_user) for found_user in self.__search(user.username)]
+        if user not in found:
+            return False
+        index = found.index(user)
+        # the complete user info given by the platform, also when only the username was supplied
+        user = found[index]
+
         url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
-        payload = {
-            'AJAXREQUEST' : self.__j_id_jsp,
-            'form' : 'form',
-            'form:usuarioAuto' : user,
-            'form:suggestion_selection' : '',
-            'form:assunto' : subject,
-            'form:texto' : message,
-            'form:nome' : '',
-            'form:arquivo2' : '',
-            'form:confLeitura' : 'on',
-            'form:enviarEmail' : 'on',
-            'javax.faces.ViewState' : self.__j_id,
-            'form:addDestinatario' : 'form:addDestinatario'
-        }
-
-        self.search(user.split(' ')[-1].strip('(').strip(')')) # only the username part
-        self.simulate_user_selection(user)
-
-        r = self.__session.post(url, data=payload)
-
-        if user.split(' ')[-1].strip('(').strip(')') in r.text:
+        payload = add_recipient_payload(self.__j_id, self.__j_id_jsp, user.label, subject, message)
+
+        if not self.simulate_user_selection(user.label, subject, message, index):
+            return False
+
+        r = self.__request('POST', url, data=payload)
+
+        if util.is_user_added(r.text, user.username):
             return True
         return False
     
+    @instrument.timed('mailbox.send_message')
     def send_message(self, subject, message):
         """
         Send message to previusly added users.
@@ -220,22 +293,123 @@ class MailBox:
         :rtype: **Boolean**
         """
         url = "https://www.%s/cxpostal/envia_mensagem.jsf" % self.__domain
-        payload = {
-            'form' : 'form',
-            'form:usuarioAuto' : '',
-            'form:suggestion_selection' : '',
-            'form:assunto' : subject,
-            'form:texto' : message,
-            'form:nome' : '',
-            'form:arquivo2' : '',
-            'form:confLeitura' : 'on',
-            'form:enviarEmail' : 'on',
-            'form:btnBotaoCancelar' : 'Enviar',
-            'javax.faces.ViewState' : self.__j_id,
-        }
-
-        r = self.__session.post(url, data=payload)
-
-        if 'Mensagem enviada com sucesso' in r.text:
+        payload = send_payload(self.__j_id, subject, message)
+
+        r = self.__request('POST', url, data=payload)
+
+        if util.is_message_sent(r.text):
+            try:
+                # the answer is a new page, a new message is started from it with :meth:`MailBox.goto_send_message`
+                (self.__j_id, self.__j_id_jsp) = util.get_j_id_and_jsp(r.text)
+            except util.ViewStateNotFound:
+                pass
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def __request(self, method, url, idempotent=False, **kwargs):
+        r = self.__send(method, url, idempotent, **kwargs)
+        if util.is_view_expired(r.text):
+            raise util.ViewExpired("The server rejected the view state %s." % self.__j_id)
+        return r
+
+    def __send(self, method, url, idempotent=False, **kwargs):
+        if self.__minimal and 'data' in kwargs:
+            kwargs['data'] = transport.compact_payload(kwargs['data'])
+
+        if self.__throttle is None:
+            return self.__session.request(method, url, **kwargs)
+        return self.__throttle.run(lambda: self.__session.request(method, url, **kwargs), idempotent)
+
+
+def send_message_page_payload(j_id):
+    """
+    Form data that opens the page used to send messages, see :meth:`MailBox.goto_send_message`.
+    """
+    return {
+        'form': 'form',
+        'form:selectOpMarcarMsg': '8',
+        'form:SelectOneMenuPaginacao': '0',
+        'javax.faces.ViewState': j_id,
+        'form:cmdMsg': 'form:cmdMsg'
+    }
+
+
+def search_payload(j_id, j_id_jsp, query, subject="", message=""):
+    """
+    Form data of the AJAX search of users, see :meth:`MailBox.search`.
+    """
+    return {
+        'AJAXREQUEST': j_id_jsp,
+        'form': 'form',
+        'form:usuarioAuto': query,
+        'form:suggestion_selection': '',
+        'form:assunto': subject,
+        'form:texto': message,
+        'form:nome': '',
+        'form:arquivo2': '',
+        'javax.faces.ViewState': j_id,
+        'form:suggestion': 'form:suggestion',
+        'ajaxSingle': 'form:suggestion',
+        'inputvalue': query,
+        'AJAX:EVENTS_COUNT': '1'
+    }
+
+
+def selection_payload(j_id, j_id_jsp, user, subject="", message="", index=0):
+    """
+    Form data of the selection of a user, the ``index`` is its position in the last search,
+    see :meth:`MailBox.simulate_user_selection`.
+    """
+    return {
+        'AJAXREQUEST' : j_id_jsp,
+        'form' : 'form',
+        'form:usuarioAuto' : user, #user complete  data string
+        'form:suggestion_selection' : str(index),
+        'form:assunto' : subject,
+        'form:texto' : message,
+        'form:nome'	: '',
+        'form:arquivo2'	: '',
+        'form:confLeitura' : 'on',
+        'form:enviarEmail' : 'on',
+        'javax.faces.ViewState' : j_id,
+        'form:suggestion:%s12' % j_id_jsp[:-1] : 'form:suggestion:%s12' % j_id_jsp[:-1]
+    }
+
+
+def add_recipient_payload(j_id, j_id_jsp, user, subject="", message=""):
+    """
+    Form data that adds the selected user as recipient, see :meth:`MailBox.add_user_recipient`.
+    """
+    return {
+        'AJAXREQUEST' : j_id_jsp,
+        'form' : 'form',
+        'form:usuarioAuto' : user,
+        'form:suggestion_selection' : '',
+        'form:assunto' : subject,
+        'form:texto' : message,
+        'form:nome' : '',
+        'form:arquivo2' : '',
+        'form:confLeitura' : 'on',
+        'form:enviarEmail' : 'on',
+        'javax.faces.ViewState' : j_id,
+        'form:addDestinatario' : 'form:addDestinatario'
+    }
+
+
+def send_payload(j_id, subject, message):
+    """
+    Form data that sends the message to the added users, see :meth:`MailBox.send_message`.
+    """
+    return {
+        'form' : 'form',
+        'form:usuarioAuto' : '',
+        'form:suggestion_selection' : '',
+        'form:assunto' : subject,
+        'form:texto' : message,
+        'form:nome' : '',
+        'form:arquivo2' : '',
+        'form:confLeitura' : 'on',
+        'form:enviarEmail' : 'on',
+        'form:btnBotaoCancelar' : 'Enviar',
+        'javax.faces.ViewState' : j_id,
+    }
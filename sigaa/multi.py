@@ -0,0 +1,228 @@
+import queue
+import threading
+import time
+from .api import API
+from .crawler import SEARCH_CAP
+import sigaa.util as util
+
+
+class MultiDomainClient:
+    """
+    Class to run the same operations over the SIGAA platforms of many universities at once.
+
+    Each domain has its own authenticated :class:`sigaa.api.API`, created on the first use, and its
+    operations run in its own thread, so a slow university doesn't delay the others. The results are
+    returned by domain, the domains that failed (or didn't answer in ``timeout`` seconds) are left out
+    of the results and their errors are available in :meth:`MultiDomainClient.get_errors`.
+
+    :param credentials: The login data of each domain. Example: {'sigaa.ufpi.br': ('macielti', 'PaSsWoRd'), ...}
+    :type credentials: dict
+    :param max_per_domain: Max number of searches running at the same time against each domain in a crawl **(optional)**.
+    :type max_per_domain: int
+    :param session_factory: Callable called as ``session_factory(domain)`` that returns a new requests.Session **(optional)**.
+    :type session_factory: function
+    :param progress: If **True** each domain shows its own progress bars, see :class:`sigaa.api.API` **(optional)**.
+    :type progress: Boolean
+
+    >>> from sigaa.multi import MultiDomainClient
+    >>> client = MultiDomainClient({'sigaa.ufpi.br': ('macielti', 'PaSsWoRd'),
+    ...                             'sigaa.ufma.br': ('bruno', 'PaSsWoRd')})
+    >>> client.search_user('maria', timeout=10)
+    {'sigaa.ufpi.br': ['MARIA DAS DORES (dores)', ...], 'sigaa.ufma.br': [...]}
+    >>> client.get_errors()
+    {}
+    """
+
+    def __init__(self, credentials, max_per_domain=2, session_factory=None, progress=False):
+        self.__credentials = dict(credentials)
+        self.__max_per_domain = max_per_domain
+        self.__session_factory = session_factory
+        self.__progress = progress
+        self.__apis = {}
+        self.__errors = {}
+        self.__lock = threading.Lock()
+        self.__locks = dict((domain, threading.Lock()) for domain in self.__credentials)
+
+    def get_domains(self):
+        """
+        Method that returns the list of domains.
+        """
+        return sorted(self.__credentials)
+
+    def get_api(self, domain):
+        """
+        Method that returns the authenticated API object of a domain, it's created and authenticated on the first call.
+
+        :param domain: One of the domains of the client.
+        :type domain: String
+
+        :return: The API object of the domain.
+        :rtype: :class:`sigaa.api.API`
+
+        :raises NotAuthenticated: If the login data of the domain is wrong.
+        """
+        with self.__locks[domain]:
+            if domain not in self.__apis:
+                session = None
+                if self.__session_factory is not None:
+                    session = self.__session_factory(domain)
+                # the bars of the domains running at the same time would be drawn over each other
+                api = API(domain, session, progress=self.__progress)
+                (username, passwd) = self.__credentials[domain]
+                if not api.authenticate(username, passwd):
+                    raise util.NotAuthenticated("Could not authenticate in %s." % domain)
+                self.__apis[domain] = api
+            return self.__apis[domain]
+
+    def get_errors(self):
+        """
+        Method that returns the errors of the domains that failed in the last operation.
+
+        :return: The error of each domain.
+        :rtype: dict. Example: {'sigaa.ufma.br': NotAuthenticated('Could not authenticate in sigaa.ufma.br.')}
+        """
+        with self.__lock:
+            return dict(self.__errors)
+
+    def authenticate(self, timeout=None):
+        """
+        Authenticate every domain.
+
+        :param timeout: Max time, in seconds, waiting for the domains **(optional)**.
+        :type timeout: float
+
+        :return: **True** for the domains authenticated with success.
+        :rtype: dict. Example: {'sigaa.ufpi.br': True, 'sigaa.ufma.br': False}
+        """
+        results = self.run(lambda api: True, timeout=timeout)
+        return dict((domain, domain in results) for domain in self.__credentials)
+
+    def run(self, operation, domains=None, timeout=None):
+        """
+        Run an operation over the API object of each domain at the same time.
+
+        :param operation: Callable called as ``operation(api)``.
+        :type operation: function
+        :param domains: The domains, all of them if not supplied **(optional)**.
+        :type domains: list
+        :param timeout: Max time, in seconds, waiting for the domains **(optional)**.
+        :type timeout: float
+
+        :return: The value returned by the operation for each domain that didn't fail.
+        :rtype: dict
+        """
+        return dict(self.iter_run(operation, domains, timeout))
+
+    def iter_run(self, operation, domains=None, timeout=None):
+        """
+        Generator version of :meth:`MultiDomainClient.run`, the result of each domain is yielded
+        as soon as it's done, the fast domains come first.
+
+        :return: Generator of (domain, result).
+        :rtype: generator
+        """
+        domains = self.get_domains() if domains is None else list(domains)
+        with self.__lock:
+            self.__errors = {}
+        results = queue.Queue()
+
+        def work(domain):
+            try:
+                results.put((domain, operation(self.get_api(domain)), None))
+            except Exception as e:
+                results.put((domain, None, e))
+
+        # a thread for each domain, a slow domain never holds a thread needed by another one
+        for domain in domains:
+            threading.Thread(target=work, args=(domain,), daemon=True).start()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pending = set(domains)
+        while pending:
+            try:
+                (domain, result, error) = results.get(timeout=None if deadline is None else
+                                                      max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                # the operations still running aren't stopped, their results are dropped
+                with self.__lock:
+                    for domain in pending:
+                        self.__errors[domain] = TimeoutError("%s didn't answer in %s seconds." % (domain, timeout))
+                return
+            pending.discard(domain)
+            if error is not None:
+                with self.__lock:
+                    self.__errors[domain] = error
+                continue
+            yield (domain, result)
+
+    def search_user(self, query, timeout=None):
+        """
+        Search for a username or fullname in every domain, see :meth:`sigaa.api.API.search_user`.
+
+        :param query: Beginning of a username or fullname.
+        :type query: String
+        :param timeout: Max time, in seconds, waiting for the domains **(optional)**.
+        :type timeout: float
+
+        :return: List of users infos of each domain.
+        :rtype: dict. Example: {'sigaa.ufpi.br': ['BRUNO DO NASCIMENTO MACIEL (macielti)'], ...}
+        """
+        return self.run(lambda api: api.search_user(query), timeout=timeout)
+
+    def get_all_users(self, workers=1, cap=SEARCH_CAP, timeout=None):
+        """
+        Crawl the users directory of every domain, see :meth:`sigaa.api.API.get_all_users`.
+
+        :param workers: Number of sessions searching at the same time in each domain **(optional)**.
+        :type workers: int
+        :param cap: Size of a search result truncated by the server **(optional)**.
+        :type cap: int
+        :param timeout: Max time, in seconds, waiting for the domains **(optional)**.
+        :type timeout: float
+
+        :return: List of users infos of each domain.
+        :rtype: dict. Example: {'sigaa.ufpi.br': ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...], ...}
+        """
+        return self.run(lambda api: sorted(api.iter_users(workers, self.__max_per_domain, cap)), timeout=timeout)
+
+    def send_message(self, recipients, subject, message, strict=True, timeout=None):
+        """
+        Send a message to users of many domains, see :meth:`sigaa.api.API.send_message`.
+
+        :param recipients: The users of each domain. Example: {'sigaa.ufpi.br': ["BRUNO DO NASCIMENTO MACIEL (macielti)"], ...}
+        :type recipients: dict
+        :param subject: Subject of the message.
+        :type subject: String
+        :param message: Message text.
+        :type message: String
+        :param strict: If **True** the message isn't sent in a domain where a user was not added **(optional)**.
+        :type strict: Boolean
+        :param timeout: Max time, in seconds, waiting for the domains **(optional)**.
+        :type timeout: float
+
+        :return: **True** for the domains where the message was sent.
+        :rtype: dict. Example: {'sigaa.ufpi.br': True, ...}
+        """
+        return self.run(lambda api: api.send_message(recipients[api.get_domain()], subject, message, strict),
+                        domains=recipients, timeout=timeout)
+
+    def close(self):
+        """
+        LogOff every domain.
+        """
+        for api in self.__apis.values():
+            api.deauthenticate()
+        self.__apis = {}
+
+
+def merge_results(results):
+    """
+    Merge the results of many domains in a single list tagged by the domain.
+
+    :param results: The users infos of each domain. Example: {'sigaa.ufpi.br': ['BRUNO DO NASCIMENTO MACIEL (macielti)'], ...}
+    :type results: dict
+
+    :return: Sorted list of (user, domain).
+    :rtype: list. Example: [('BRUNO DO NASCIMENTO MACIEL (macielti)', 'sigaa.ufpi.br'), ...]
+    """
+    return sorted((user, domain) for domain, users in results.items() for user in users)
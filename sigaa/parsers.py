@@ -0,0 +1,196 @@
+import itertools
+import re
+from collections import namedtuple
+
+
+# the strings that identify the pages and the AJAX answers of the platform.
+LOGIN_FAILED = "rio e/ou senha inv"
+SESSION_EXPIRED = "o foi expirada. "
+VIEW_EXPIRED = ("ViewExpiredException", "Comportamento Inesperado")
+MAILBOX = "Registro(s) Encontrado(s)"
+SEND_MESSAGE = "<caption>Anexar Arquivos</caption>"
+AJAX_UPDATE = "Ajax-Update-Ids"
+MESSAGE_SENT = "Mensagem enviada com sucesso"
+
+# "(username)" right after the last word of the name, the name is matched backwards from it.
+_USERNAME = re.compile(r"(?<=\w\s)\(.+?\)")
+# the words of the name, over the reversed text: each one preceded by a single space.
+_NAME_REVERSED = re.compile(r"(?:\s\w+)+")
+
+_J_ID = re.compile(r"j_id\d{1,4}")
+_J_ID_JSP = re.compile(r"j_id_jsp_\d{4,}_\d+")
+
+# the 'j_id_jsp' used is the fourth ocurrence in the page
+_J_ID_JSP_INDEX = 3
+
+# max length of a token, the part of the page kept between two chunks.
+_MAX_TOKEN_LENGTH = 64
+
+_DOMAIN = re.compile(r"^(?:https?:\/\/)?(?:[^@\/\n]+@)?(?:www\.)?([^:\/?\n]+)")
+
+
+ViewState = namedtuple('ViewState', ['j_id', 'j_id_jsp'])
+ViewState.__doc__ = """
+The view state parameters of a page, see :func:`parse_view_state`. A parameter not found is **None**.
+"""
+
+PageFlags = namedtuple('PageFlags', ['login_failed', 'session_expired', 'view_expired', 'mailbox',
+                                     'send_message', 'ajax_update', 'message_sent'])
+PageFlags.__doc__ = """
+What a page is, see :func:`parse_flags`.
+"""
+
+SearchResult = namedtuple('SearchResult', ['users', 'ajax_update', 'view_expired'])
+SearchResult.__doc__ = """
+The answer of the AJAX search of users, see :func:`parse_search`.
+"""
+
+
+def iter_users(html_page):
+    """
+    Find the users infos ("NAME (username)") of a page, in order, with duplicates.
+
+    The result is the same of ``re.finditer(r"(?:\\w+\\s)+\\(.+?\\)", html_page)``, but that pattern tries
+    the words again from each word of a long text without a "(", taking a time quadratic in the
+    number of words. Here each "(username)" is found first and the name is matched backwards from it,
+    so every char is read a constant number of times.
+
+    :param html_page: HTML response text.
+    :type html_page: String
+
+    :return: Generator of users infos.
+    :rtype: generator. Example: 'BRUNO DO NASCIMENTO MACIEL (macielti)', ...
+    """
+    end = 0
+    for match in _USERNAME.finditer(html_page):
+        start = match.start()
+        # the name ends before the "(" and doesn't go back over the previous user
+        name = _NAME_REVERSED.match(html_page[end:start][::-1])
+        yield html_page[start - len(name.group()):match.end()]
+        end = match.end()
+
+
+def extract_users(html_page):
+    """
+    Extract the users infos of the response of the AJAX search of users.
+
+    :param html_page: HTML response text.
+    :type html_page: String
+
+    :return: Sorted list of users infos without duplicates.
+    :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    """
+    return sorted(set(iter_users(html_page)))
+
+
+def parse_view_state(html_page):
+    """
+    Find the **j_id** and the **j_id_jsp** parameters of a page, the first **j_id** and the fourth **j_id_jsp**.
+
+    The page is scanned incrementally and the scan stops as soon as both are found, so the page can also
+    be supplied as the chunks of a streamed response.
+
+    :param html_page: HTML response text or an iterable of pieces of it. Example: r.iter_content(decode_unicode=True)
+    :type html_page: String
+
+    :return: The parameters, **None** for the ones not found.
+    :rtype: :class:`ViewState`. Example: ViewState(j_id='j_id1', j_id_jsp='j_id_jsp_1052251_1')
+    """
+    chunks = [html_page] if isinstance(html_page, str) else html_page
+
+    j_id = None
+    j_id_jsp = None
+    j_id_jsp_count = 0
+    buffer = ''
+    j_id_pos = 0
+    j_id_jsp_pos = 0
+
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        if not final:
+            buffer += chunk
+
+        if j_id is None:
+            # return the first ocurrence of the 'j_id'
+            (j_id, j_id_pos) = _next_token(_J_ID, buffer, j_id_pos, final)
+
+        while j_id_jsp is None:
+            (token, j_id_jsp_pos) = _next_token(_J_ID_JSP, buffer, j_id_jsp_pos, final)
+            if token is None:
+                break
+            if j_id_jsp_count == _J_ID_JSP_INDEX:
+                j_id_jsp = token
+            j_id_jsp_count += 1
+
+        if j_id is not None and j_id_jsp is not None:
+            break
+
+        # keep only the part of the page not scanned yet
+        cut = min(j_id_pos if j_id is None else len(buffer),
+                  j_id_jsp_pos if j_id_jsp is None else len(buffer))
+        buffer = buffer[cut:]
+        j_id_pos -= cut
+        j_id_jsp_pos -= cut
+
+    return ViewState(j_id, j_id_jsp)
+
+
+def _next_token(pattern, buffer, pos, final):
+    """
+    Search the next token from ``pos``, returns the token (or None) and the position to continue from.
+    A token at the end of a not final buffer may continue in the next chunk, so it's searched again later.
+    """
+    match = pattern.search(buffer, pos)
+    if match is None:
+        if final:
+            return (None, len(buffer))
+        return (None, max(pos, len(buffer) - _MAX_TOKEN_LENGTH))
+    if match.end() == len(buffer) and not final:
+        return (None, match.start())
+    return (match.group(), match.end())
+
+
+def parse_flags(html_page):
+    """
+    Verify what a page is, each flag is the same of the ``is_*`` function of :mod:`sigaa.util`.
+
+    :param html_page: HTML response text.
+    :type html_page: String
+
+    :return: The flags of the page.
+    :rtype: :class:`PageFlags`. Example: PageFlags(login_failed=False, ..., ajax_update=True, message_sent=False)
+    """
+    return PageFlags(LOGIN_FAILED in html_page,
+                     SESSION_EXPIRED in html_page,
+                     any(marker in html_page for marker in VIEW_EXPIRED),
+                     MAILBOX in html_page,
+                     SEND_MESSAGE in html_page,
+                     AJAX_UPDATE in html_page,
+                     MESSAGE_SENT in html_page)
+
+
+def parse_search(html_page):
+    """
+    Parse the answer of the AJAX search of users.
+
+    :param html_page: HTML response text.
+    :type html_page: String
+
+    :return: The users found and if the answer is an AJAX update or the error of a rejected view state.
+    :rtype: :class:`SearchResult`. Example: SearchResult(users=['MARIA DAS DORES (dores)'], ajax_update=True, view_expired=False)
+    """
+    return SearchResult(extract_users(html_page), AJAX_UPDATE in html_page,
+                        any(marker in html_page for marker in VIEW_EXPIRED))
+
+
+def extract_domain(url):
+    """
+    Extract the domain, without the 'www.' prefix, of an url.
+
+    :param url: An url. Example: 'https://www.sigaa.ufpi.br/sigaa/abrirCaixaPostal.jsf'
+    :type url: String
+
+    :return: The domain. Example: 'sigaa.ufpi.br'
+    :rtype: String
+    """
+    return _DOMAIN.match(url).group(1)
@@ -0,0 +1,246 @@
+import queue
+import threading
+from contextlib import contextmanager
+from .api import API
+from .mailbox import MailBox
+import sigaa.util as util
+import sigaa.instrument as instrument
+
+
+class PooledSession:
+    """
+    A session of a :class:`SessionPool`: an authenticated :class:`sigaa.api.API` and its
+    :class:`sigaa.mailbox.MailBox` already in the send message page.
+
+    :attr api: The authenticated API object.
+    :attr mail_box: The mail box, ready to search and add recipients.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.mail_box = None
+
+    def is_expired(self):
+        """
+        Verify if the session was seen expired by the :class:`sigaa.session.SessionState`.
+        """
+        return self.api.get_session_state().is_authenticated() is False
+
+    def invalidate(self):
+        """
+        Drop the mail box, it will be rebuilt in the next lease.
+        """
+        self.mail_box = None
+
+
+class SessionPool:
+    """
+    Class that holds many authenticated sessions of a domain and leases them to the callers.
+
+    The sessions expire after some time without use or when the server restarts, an expired session
+    is authenticated again with the stored login data and the navigation to the send message page
+    (:meth:`sigaa.mailbox.MailBox.goto_mainbox_portal` and :meth:`sigaa.mailbox.MailBox.goto_send_message`)
+    is replayed to rebuild the **j_id** and **j_id_jsp** before the operation is tried again.
+
+    The sessions are created on demand, up to ``size``.
+
+    :param domain: The platform domain of the university server.
+    :type domain: String
+    :param username: The username of the student.
+    :type username: String
+    :param passwd: The password of the student.
+    :type passwd: String
+    :param size: Max number of sessions **(optional)**.
+    :type size: int
+    :param retries: Number of times an operation is tried again after the session expires **(optional)**.
+    :type retries: int
+    :param session_factory: Callable called as ``session_factory(domain)`` that returns a new requests.Session,
+        useful to mount custom adapters **(optional)**.
+    :type session_factory: function
+    :param throttle: Paces the requests of every session of the pool **(optional)**.
+    :type throttle: :class:`sigaa.ratelimit.Throttle`
+    :param cache: Keeps the results of the searches of every session of the pool **(optional)**.
+    :type cache: :class:`sigaa.cache.SearchCache`
+
+    >>> from sigaa.pool import SessionPool
+    >>> pool = SessionPool('sigaa.ufpi.br', 'macielti', 'PaSsWoRd', size=4)
+    >>> pool.run(lambda mail_box: mail_box.search('macielti'))
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    >>> with pool.lease() as session:
+    ...     session.mail_box.add_user_recipient('BRUNO DO NASCIMENTO MACIEL (macielti)')
+    ...     session.mail_box.send_message('Subject', 'Message')
+    True
+    """
+
+    def __init__(self, domain, username, passwd, size=4, retries=1, session_factory=None, throttle=None, cache=None):
+        self.__domain = domain
+        self.__username = username
+        self.__passwd = passwd
+        self.__size = size
+        self.__retries = retries
+        self.__session_factory = session_factory
+        self.__throttle = throttle
+        self.__cache = cache
+        self.__idle = queue.LifoQueue()
+        self.__sessions = []
+        self.__lock = threading.Lock()
+
+    def get_domain(self):
+        """
+        Method that returns the setted domain.
+        """
+        return self.__domain
+
+    def get_size(self):
+        """
+        Method that returns the number of sessions created until now.
+        """
+        return len(self.__sessions)
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """
+        Lease a session, it's returned to the pool at the end of the ``with`` block.
+        The session is authenticated and its mail box is in the send message page.
+
+        :param timeout: Max time, in seconds, waiting for a free session, **None** waits forever **(optional)**.
+        :type timeout: float
+
+        :return: A context manager of the leased session.
+        :rtype: :class:`PooledSession`
+
+        :raises queue.Empty: If no session was free in ``timeout`` seconds.
+        """
+        session = self.__acquire(timeout)
+        try:
+            self.__prepare(session)
+            yield session
+        finally:
+            self.__idle.put(session)
+
+    def run(self, operation, timeout=None, consume=False):
+        """
+        Execute an operation with a leased mail box, trying it again in a renewed session if
+        the session expires or the server rejects the view state during the operation.
+
+        :param operation: Callable called as ``operation(mail_box)``.
+        :type operation: function
+        :param timeout: Max time, in seconds, waiting for a free session **(optional)**.
+        :type timeout: float
+        :param consume: **True** if the operation uses up the send message page, like a send,
+            so a new one is opened in the next lease **(optional)**.
+        :type consume: Boolean
+
+        :return: The value returned by the operation.
+
+        :raises NotAuthenticated: If the session was still expired after the last attempt.
+        """
+        for attempt in range(self.__retries + 1):
+            if attempt:
+                instrument.count_retry('pool.run')
+            with self.lease(timeout) as session:
+                try:
+                    result = operation(session.mail_box)
+                except util.ViewExpired:
+                    # the server rejected the view state, the pages are opened again in the next lease
+                    session.invalidate()
+                    if attempt == self.__retries:
+                        raise
+                    continue
+                finally:
+                    if consume:
+                        session.invalidate()
+                if not session.is_expired():
+                    return result
+                session.invalidate()
+        # the result is the answer of an expired session, like an empty search
+        raise util.NotAuthenticated("The session expired in each of the %d attempts." % (self.__retries + 1))
+
+    def search_user(self, query):
+        """
+        Search for a username or fullname of a user, see :meth:`sigaa.api.API.search_user`.
+
+        :param query: Beginning of a username or fullname.
+        :type query: String
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        return self.run(lambda mail_box: mail_box.search(query))
+
+    def send_message(self, users, subject, message):
+        """
+        Send message to a list of users, see :meth:`sigaa.api.API.send_message`.
+
+        :param users: A list of users. Example: ["BRUNO DO NASCIMENTO MACIEL (macielti)", ...]
+        :type users: list
+        :param subject: Subject of the message.
+        :type subject: String
+        :param message: Message text.
+        :type message: String
+
+        :return: **True** for success or **False** for failure.
+        :rtype: **Boolean**
+        """
+        def send(mail_box):
+            results = mail_box.add_user_recipients(users)
+            return all(results.values()) and mail_box.send_message(subject, message)
+
+        return self.run(send, consume=True)
+
+    def close(self):
+        """
+        LogOff all the sessions of the pool.
+        """
+        with self.__lock:
+            sessions = list(self.__sessions)
+            self.__sessions = []
+            self.__idle = queue.LifoQueue()
+        for session in sessions:
+            session.api.deauthenticate()
+
+    def __acquire(self, timeout):
+        try:
+            return self.__idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.__lock:
+            create = len(self.__sessions) < self.__size
+            if create:
+                session = PooledSession(None)
+                self.__sessions.append(session)
+
+        if not create:
+            return self.__idle.get(timeout=timeout)
+
+        try:
+            session.api = self.__new_api()
+        except Exception:
+            with self.__lock:
+                self.__sessions.remove(session)
+            raise
+        return session
+
+    def __prepare(self, session):
+        if session.mail_box is not None and not session.is_expired():
+            return
+
+        if not session.api.is_authenticated():
+            if not session.api.authenticate(self.__username, self.__passwd):
+                raise util.NotAuthenticated("Could not authenticate the pool session.")
+
+        mail_box = MailBox(session.api.get_session(), session.api.get_domain(), session.api.get_throttle(),
+                           session.api.get_cache(), minimal=True)
+        mail_box.goto_mainbox_portal()
+        mail_box.goto_send_message()
+        session.mail_box = mail_box
+
+    def __new_api(self):
+        session = None
+        if self.__session_factory is not None:
+            session = self.__session_factory(self.__domain)
+        api = API(self.__domain, session)
+        api.use_throttle(self.__throttle)
+        api.use_cache(self.__cache)
+        return api
@@ -0,0 +1,267 @@
+import random
+import threading
+import time
+import requests
+import sigaa.parsers as parsers
+import sigaa.util as util
+import sigaa.instrument as instrument
+
+
+# throttles shared by all the sessions of a same domain, with the keyword arguments they were created with.
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+# number of bytes of a response searched for the error messages, they are in the top of the page.
+_ERROR_PREFIX_LENGTH = 16 * 1024
+
+# the messages of the pages that the platform answers with the status 200 when a request failed:
+# the error page ("Comportamento Inesperado") and the expired view state or session, all ascii.
+_ERROR_MARKERS = tuple(marker.encode('ascii') for marker in parsers.VIEW_EXPIRED + (parsers.SESSION_EXPIRED,))
+
+
+class TokenBucket:
+    """
+    Token bucket that caps the rate of the requests, shared by many threads.
+
+    :param rate: Number of requests per second.
+    :type rate: float
+    :param burst: Max number of requests sent at once after an idle time, the same as the ``rate`` if not supplied **(optional)**.
+    :type burst: int
+
+    >>> from sigaa.ratelimit import TokenBucket
+    >>> bucket = TokenBucket(5)
+    >>> bucket.acquire() # blocks until there is a token
+    """
+
+    def __init__(self, rate, burst=None):
+        self.__rate = float(rate)
+        self.__burst = float(burst if burst is not None else max(1, rate))
+        self.__tokens = self.__burst
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def get_rate(self):
+        """
+        Method that returns the number of requests per second.
+        """
+        return self.__rate
+
+    def acquire(self):
+        """
+        Take a token, waiting until there is one.
+        """
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * self.__rate)
+                self.__updated = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                wait = (1 - self.__tokens) / self.__rate
+            time.sleep(wait)
+
+
+class AIMDController:
+    """
+    Concurrency limit that grows and shrinks with the health of the server (additive increase,
+    multiplicative decrease, like the TCP congestion control).
+
+    Each response faster than ``target_latency`` raises the limit by about one request per window
+    of ``limit`` responses, a slow or failed response multiplies it by ``decrease``. The limit is
+    decreased at most once per ``target_latency`` seconds, so a burst of failures of requests that
+    were already running counts as one.
+
+    :param initial: Initial limit **(optional)**.
+    :type initial: int
+    :param minimum: Min limit **(optional)**.
+    :type minimum: int
+    :param maximum: Max limit **(optional)**.
+    :type maximum: int
+    :param target_latency: Time, in seconds, of a response of a healthy server **(optional)**.
+    :type target_latency: float
+    :param decrease: Factor applied to the limit on a slow or failed response **(optional)**.
+    :type decrease: float
+
+    >>> from sigaa.ratelimit import AIMDController
+    >>> controller = AIMDController(initial=2)
+    >>> controller.acquire()
+    >>> controller.release(0.2, True)
+    >>> controller.get_limit()
+    2.5
+    """
+
+    def __init__(self, initial=1, minimum=1, maximum=16, target_latency=2.0, decrease=0.5):
+        self.__limit = float(initial)
+        self.__minimum = minimum
+        self.__maximum = maximum
+        self.__target_latency = target_latency
+        self.__decrease = decrease
+        self.__running = 0
+        self.__last_decrease = None
+        self.__condition = threading.Condition()
+
+    def get_limit(self):
+        """
+        Method that returns the current limit of requests running at the same time.
+        """
+        return self.__limit
+
+    def acquire(self):
+        """
+        Wait until the number of requests running is under the limit and count one more.
+        """
+        with self.__condition:
+            while self.__running >= int(self.__limit):
+                self.__condition.wait()
+            self.__running += 1
+
+    def release(self, latency, ok):
+        """
+        Count one request less and update the limit with its result.
+
+        :param latency: Time, in seconds, of the response.
+        :type latency: float
+        :param ok: **False** if the request failed.
+        :type ok: Boolean
+        """
+        with self.__condition:
+            self.__running -= 1
+            if ok and latency <= self.__target_latency:
+                self.__limit = min(self.__maximum, self.__limit + 1.0 / self.__limit)
+            else:
+                now = time.monotonic()
+                if self.__last_decrease is None or now - self.__last_decrease >= self.__target_latency:
+                    self.__limit = max(self.__minimum, self.__limit * self.__decrease)
+                    self.__last_decrease = now
+            self.__condition.notify_all()
+
+
+class Throttle:
+    """
+    Class that paces the requests sent to a domain, shared by every session of the domain (see :func:`get_throttle`).
+    Created to be used mainly by the **sigaa.mailbox.MailBox**, use only if you know what you are doing.
+
+    Every request waits for a token of the :class:`TokenBucket` (if there is a ``rate``) and for a slot of the
+    :class:`AIMDController`. A response with a 5xx or 429 status, or an error of **requests** (a timeout,
+    a connection error, a truncated body...) is a failure:
+    the idempotent requests (the searches) are tried again after a random wait (exponential backoff
+    with full jitter), the others are returned or raised as they are. The error pages of the platform
+    answered with the status 200 (unexpected behavior, view state or session expired) are also failures
+    for the :class:`AIMDController`, but they are returned as they are, the same request would fail again.
+
+    :param rate: Max number of requests per second, **None** for no cap **(optional)**.
+    :type rate: float
+    :param burst: Max number of requests sent at once after an idle time **(optional)**.
+    :type burst: int
+    :param max_concurrency: Max number of requests running at the same time **(optional)**.
+    :type max_concurrency: int
+    :param target_latency: Time, in seconds, of a response of a healthy server **(optional)**.
+    :type target_latency: float
+    :param retries: Number of times an idempotent request is tried again **(optional)**.
+    :type retries: int
+    :param backoff: Base time, in seconds, of the wait before a retry **(optional)**.
+    :type backoff: float
+    :param max_backoff: Max time, in seconds, of the wait before a retry **(optional)**.
+    :type max_backoff: float
+
+    >>> from sigaa.api import API
+    >>> from sigaa.ratelimit import get_throttle
+    >>> api = API()
+    >>> api.use_throttle(get_throttle(api.get_domain(), rate=10))
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=16, target_latency=2.0, retries=3,
+                 backoff=0.5, max_backoff=30.0):
+        self.__bucket = TokenBucket(rate, burst) if rate else None
+        self.__controller = AIMDController(maximum=max_concurrency, target_latency=target_latency)
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+
+    def get_controller(self):
+        """
+        Method that returns the :class:`AIMDController` of the throttle.
+        """
+        return self.__controller
+
+    def run(self, send, idempotent=False):
+        """
+        Send a request paced by the throttle.
+
+        :param send: Callable that sends the request and returns the response.
+        :type send: function
+        :param idempotent: **True** if the request can be sent again after a failure **(optional)**.
+        :type idempotent: Boolean
+
+        :return: The response.
+        :rtype: requests.Response
+
+        :raises ServerUnavailable: If an idempotent request failed in every try.
+        """
+        attempts = self.__retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if attempt:
+                instrument.count_retry('throttle.run')
+                time.sleep(random.uniform(0, min(self.__max_backoff, self.__backoff * 2 ** (attempt - 1))))
+
+            if self.__bucket is not None:
+                self.__bucket.acquire()
+            self.__controller.acquire()
+            start = time.monotonic()
+            ok = False
+            try:
+                r = send()
+                failed = r.status_code >= 500 or r.status_code == 429
+                ok = not failed and not is_error_page(r)
+            except requests.RequestException:
+                if attempt + 1 == attempts:
+                    if idempotent:
+                        raise util.ServerUnavailable("The server didn't answer after %d tries." % attempts)
+                    raise
+                continue
+            finally:
+                # the slot is given back whatever happened, a slot lost would block the domain
+                self.__controller.release(time.monotonic() - start, ok)
+
+            if not failed or not idempotent:
+                return r
+
+        raise util.ServerUnavailable("The server answered with status %d after %d tries." % (r.status_code, attempts))
+
+
+def is_error_page(r):
+    """
+    Verify if a response is an error page of the platform, searching the bytes of the top of the page
+    without decoding it.
+
+    :param r: The response.
+    :type r: requests.Response
+
+    :return: **True** if the response is an error page.
+    :rtype: Boolean
+    """
+    return any(r.content.find(marker, 0, _ERROR_PREFIX_LENGTH) != -1 for marker in _ERROR_MARKERS)
+
+
+def get_throttle(domain, **kwargs):
+    """
+    Return the throttle of a domain, created with the keyword arguments of :class:`Throttle` the first time.
+    The same throttle is shared by every caller that ask for the same domain, a later call may omit
+    the keyword arguments but can't supply different ones.
+
+    :param domain: The platform domain of the university server.
+    :type domain: String
+
+    :return: A throttle shared by the domain.
+    :rtype: :class:`Throttle`
+
+    :raises ValueError: If the throttle of the domain was created with other keyword arguments.
+    """
+    with _throttles_lock:
+        if domain not in _throttles:
+            _throttles[domain] = (Throttle(**kwargs), kwargs)
+        (throttle, settings) = _throttles[domain]
+        if kwargs and kwargs != settings:
+            raise ValueError("The throttle of %s was already created with %r." % (domain, settings))
+        return throttle
@@ -0,0 +1,123 @@
+import threading
+import time
+import sigaa.parsers as parsers
+import sigaa.util as util
+
+
+# time, in seconds, that the platform keeps an idle session alive.
+SESSION_TIMEOUT = 30 * 60
+
+# a session is validated again this time, in seconds, before it would expire.
+SAFETY_MARGIN = 60
+
+# number of bytes of a response searched for the "session expired" message, it's in the top of the page.
+_EXPIRED_PREFIX_LENGTH = 16 * 1024
+
+# the message is ascii, the same bytes in the encodings used by the platform.
+_EXPIRED_MARKER = parsers.SESSION_EXPIRED.encode('ascii')
+
+
+class SessionState:
+    """
+    Class to track the authentication state of a session without requesting pages only to verify it.
+    Created to be used mainly by the **sigaa.api.API**, use only if you know what you are doing.
+
+    Every response received by the session is observed (see :meth:`SessionState.observe`): the
+    "session expired" message or a redirect to the login page mark the session as not authenticated,
+    any other response of an authenticated session counts as activity and keeps it alive.
+    The state is trusted while the last activity is younger than the expiry window of the server.
+
+    :param timeout: Time, in seconds, that the platform keeps an idle session alive **(optional)**.
+    :type timeout: int
+
+    >>> from sigaa.session import SessionState
+    >>> state = SessionState()
+    >>> state.attach(api.get_session())
+    >>> state.mark_authenticated()
+    >>> state.is_fresh()
+    True
+    """
+
+    def __init__(self, timeout=SESSION_TIMEOUT):
+        self.__timeout = timeout
+        self.__lock = threading.Lock()
+        self.__authenticated = None
+        self.__last_activity = None
+
+    def attach(self, session):
+        """
+        Observe every response received by a session.
+
+        :param session: The session.
+        :type session: requests.Session
+        """
+        session.hooks['response'].append(self.observe)
+
+    def observe(self, r, *args, **kwargs):
+        """
+        Update the state from a response, used as a **requests** response hook.
+
+        The body of a streamed response isn't read, only its url is verified. The body of the other ones
+        is searched for the "session expired" message as bytes, only in its beginning, without decoding it.
+
+        :param r: A response received by the session.
+        :type r: requests.Response
+
+        :return: The same response.
+        :rtype: requests.Response
+        """
+        urls = [response.url for response in r.history] + [r.url]
+        if any(util.is_login_page(url) for url in urls):
+            self.mark_deauthenticated()
+        elif not kwargs.get('stream') and r.content.find(_EXPIRED_MARKER, 0, _EXPIRED_PREFIX_LENGTH) != -1:
+            self.mark_deauthenticated()
+        else:
+            with self.__lock:
+                if self.__authenticated:
+                    self.__last_activity = time.time()
+        return r
+
+    def mark_authenticated(self):
+        """
+        Record that the session was validated as authenticated now.
+        """
+        with self.__lock:
+            self.__authenticated = True
+            self.__last_activity = time.time()
+
+    def mark_deauthenticated(self):
+        """
+        Record that the session isn't authenticated.
+        """
+        with self.__lock:
+            self.__authenticated = False
+            self.__last_activity = time.time()
+
+    def is_authenticated(self):
+        """
+        Method that returns the known state: **True**, **False** or **None** when unknown.
+        """
+        return self.__authenticated
+
+    def is_fresh(self):
+        """
+        Verify if the known state can be trusted without asking the server.
+
+        A session known as not authenticated stays so until a new login, an authenticated one
+        is trusted until its idle time gets close to the expiry window of the server.
+
+        :return: **True** if the state can be trusted.
+        :rtype: **Boolean**
+        """
+        with self.__lock:
+            if self.__authenticated is None:
+                return False
+            if not self.__authenticated:
+                return True
+            return time.time() - self.__last_activity < self.__timeout - SAFETY_MARGIN
+
+    def get_last_activity(self):
+        """
+        Method that returns the timestamp of the last validation or activity of the session.
+        """
+        return self.__last_activity
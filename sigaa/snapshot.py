@@ -0,0 +1,212 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+import sigaa.util as util
+
+
+# <domain>-<version>.json.gz
+_FILE_PATTERN = re.compile(r'^(?P<domain>.+)-(?P<version>\d{6})\.json\.gz$')
+
+
+class Snapshot:
+    """
+    The users directory of a domain at the time of a crawl, kept by a :class:`SnapshotStore`.
+
+    :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+    :type domain: String
+    :param version: The number of the snapshot, counting from 1 for each domain.
+    :type version: int
+    :param users: List of users infos. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    :type users: list
+    :param prefixes: The hash of the result of each truncated search of the crawl, see :func:`result_hash` **(optional)**.
+    :type prefixes: dict
+    :param created_at: Timestamp of the snapshot, defaults to now **(optional)**.
+    :type created_at: float
+    """
+
+    def __init__(self, domain, version, users, prefixes=None, created_at=None):
+        self.domain = domain
+        self.version = version
+        self.users = sorted(set(users))
+        self.prefixes = dict(prefixes or {})
+        self.created_at = time.time() if created_at is None else created_at
+
+    def __len__(self):
+        return len(self.users)
+
+    def __repr__(self):
+        return 'Snapshot(%r, %d, %d users)' % (self.domain, self.version, len(self.users))
+
+
+class DirectoryDiff:
+    """
+    The changes of a users directory between two snapshots, see :func:`diff`.
+
+    :param added: Users infos of the users that joined.
+    :type added: list
+    :param removed: Users infos of the users that left.
+    :type removed: list
+    :param renamed: The (old, new) users infos of the users whose name changed, with the same username.
+    :type renamed: list
+    """
+
+    def __init__(self, added, removed, renamed):
+        self.added = added
+        self.removed = removed
+        self.renamed = renamed
+
+    def is_empty(self):
+        """
+        Method that returns **True** if nothing changed.
+        """
+        return not (self.added or self.removed or self.renamed)
+
+    def __repr__(self):
+        return 'DirectoryDiff(%d added, %d removed, %d renamed)' % (
+            len(self.added), len(self.removed), len(self.renamed))
+
+
+class SnapshotStore:
+    """
+    Class to keep versioned snapshots of the users directories, one gzip compressed JSON file
+    per snapshot in a folder, so the directory of a crawl can be compared with the previous one.
+
+    :param directory: Path of the folder of the snapshots, created if it doesn't exist.
+    :type directory: String
+
+    >>> from sigaa.api import API
+    >>> from sigaa.snapshot import SnapshotStore
+    >>> api = API()
+    >>> api.authenticate('macielti', 'PaSsWoRd')
+    True
+    >>> (snapshot, changes) = api.update_snapshot(SnapshotStore('snapshots'))
+    >>> snapshot.version
+    2
+    >>> changes.added
+    ['MARIA DAS DORES (dores)']
+    """
+
+    def __init__(self, directory):
+        self.__directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def versions(self, domain):
+        """
+        Method that returns the versions kept of a domain.
+
+        :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+        :type domain: String
+
+        :return: Sorted list of versions.
+        :rtype: list. Example: [1, 2, 3]
+        """
+        versions = []
+        for name in os.listdir(self.__directory):
+            match = _FILE_PATTERN.match(name)
+            if match is not None and match.group('domain') == domain:
+                versions.append(int(match.group('version')))
+        return sorted(versions)
+
+    def load(self, domain, version):
+        """
+        Load a snapshot.
+
+        :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+        :type domain: String
+        :param version: The version of the snapshot.
+        :type version: int
+
+        :return: The snapshot.
+        :rtype: :class:`Snapshot`
+
+        :raises FileNotFoundError: If there is no such version.
+        """
+        with gzip.open(self.__path(domain, version), 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return Snapshot(domain, version, data['users'], data['prefixes'], data['created_at'])
+
+    def latest(self, domain):
+        """
+        Load the last snapshot of a domain.
+
+        :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+        :type domain: String
+
+        :return: The snapshot, or **None** if there is no snapshot of the domain.
+        :rtype: :class:`Snapshot`
+        """
+        versions = self.versions(domain)
+        if not versions:
+            return None
+        return self.load(domain, versions[-1])
+
+    def save(self, domain, users, prefixes=None):
+        """
+        Save the users of a domain as its next version.
+
+        :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+        :type domain: String
+        :param users: List of users infos. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        :type users: list
+        :param prefixes: The hash of the result of each truncated search of the crawl **(optional)**.
+        :type prefixes: dict
+
+        :return: The saved snapshot.
+        :rtype: :class:`Snapshot`
+        """
+        versions = self.versions(domain)
+        snapshot = Snapshot(domain, versions[-1] + 1 if versions else 1, users, prefixes)
+        path = self.__path(domain, snapshot.version)
+        # written aside and renamed, a crash never leaves half a snapshot
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            json.dump({'users': snapshot.users, 'prefixes': snapshot.prefixes,
+                       'created_at': snapshot.created_at}, f)
+        os.replace(path + '.tmp', path)
+        return snapshot
+
+    def __path(self, domain, version):
+        return os.path.join(self.__directory, '%s-%06d.json.gz' % (domain, version))
+
+
+def diff(old_users, new_users):
+    """
+    Compare two lists of users infos by the username.
+
+    :param old_users: The previous users infos. Example: ['BRUNO MACIEL (macielti)', 'ANA MARIA (ana)']
+    :type old_users: list
+    :param new_users: The current users infos. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'ZE (ze1)']
+    :type new_users: list
+
+    :return: The users added, removed and renamed, sorted.
+    :rtype: :class:`DirectoryDiff`
+
+    >>> from sigaa.snapshot import diff
+    >>> changes = diff(['BRUNO MACIEL (macielti)', 'ANA MARIA (ana)'],
+    ...                ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'ZE (ze1)'])
+    >>> changes.added, changes.removed, changes.renamed
+    (['ZE (ze1)'], ['ANA MARIA (ana)'], [('BRUNO MACIEL (macielti)', 'BRUNO DO NASCIMENTO MACIEL (macielti)')])
+    """
+    old = dict((util.split_user(user)[1], user) for user in old_users)
+    new = dict((util.split_user(user)[1], user) for user in new_users)
+
+    added = sorted(new[username] for username in new.keys() - old.keys())
+    removed = sorted(old[username] for username in old.keys() - new.keys())
+    renamed = sorted((old[username], new[username]) for username in old.keys() & new.keys()
+                     if old[username] != new[username])
+    return DirectoryDiff(added, removed, renamed)
+
+
+def result_hash(users):
+    """
+    Return a short hash of a search result, the same for the same users in any order.
+
+    :param users: List of users infos. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    :type users: list
+
+    :return: The hash, in hexadecimal.
+    :rtype: String. Example: '3f786850e387550f'
+    """
+    return hashlib.sha1('\n'.join(sorted(users)).encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,195 @@
+import sqlite3
+import threading
+import time
+import sigaa.util as util
+
+
+# highest code point, used to turn a prefix search in to a range search over the indexes.
+_MAX_CHAR = '\U0010ffff'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    domain TEXT NOT NULL,
+    username TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (domain, username)
+);
+CREATE INDEX IF NOT EXISTS users_name_key ON users (domain, name_key);
+CREATE TABLE IF NOT EXISTS prefixes (
+    domain TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    complete INTEGER NOT NULL,
+    PRIMARY KEY (domain, prefix)
+);
+"""
+
+
+class UserStore:
+    """
+    Class to keep a local copy of the users directory of a platform in a SQLite file,
+    so the searches can be answered without going back to the server.
+
+    Every search result is saved with the time it was fetched, a result is **complete** when it
+    wasn't truncated by the server, only complete and fresh results are used to answer searches.
+
+    :param path: Path of the SQLite file, the same file can hold many domains. Example: 'users.db'
+    :type path: String
+    :param domain: The domain of the SIGAA platform of the university server. Example: 'sigaa.ufpi.br'
+    :type domain: String
+    :param max_age: Seconds that a search result is considered fresh **(optional)**.
+    :type max_age: int
+
+    >>> from sigaa.api import API
+    >>> from sigaa.store import UserStore
+    >>> api = API('sigaa.ufpi.br')
+    >>> api.authenticate('macielti', 'PaSsWoRd')
+    True
+    >>> api.use_store(UserStore('users.db', api.get_domain()))
+    >>> api.get_all_users() # fill the store
+    >>> api.search_user('macielti') # answered by the store
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    """
+
+    def __init__(self, path, domain, max_age=24 * 60 * 60):
+        self.__domain = domain
+        self.__max_age = max_age
+        self.__lock = threading.Lock()
+        # the store is fed by the crawler worker threads
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.executescript(_SCHEMA)
+
+    def get_domain(self):
+        """
+        Method that returns the domain of the stored users.
+        """
+        return self.__domain
+
+    def add(self, prefix, users, complete=True, fetched_at=None):
+        """
+        Save the result of a search.
+
+        :param prefix: The searched prefix. Example: 'mac'
+        :type prefix: String
+        :param users: List of users infos returned by the search. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+        :type users: list
+        :param complete: **False** if the result was truncated by the server **(optional)**.
+            The stored users that match a complete prefix but aren't in the result are removed.
+        :type complete: Boolean
+        :param fetched_at: Timestamp of the search, defaults to now **(optional)**.
+        :type fetched_at: float
+        """
+        prefix = prefix.lower()
+        rows = []
+        for user in users:
+            (name, username) = util.split_user(user)
+            rows.append((self.__domain, username.lower(), name.lower(), user))
+
+        with self.__lock, self.__connection:
+            if complete:
+                found = set(row[1] for row in rows)
+                removed = [(self.__domain, username) for username in self.__match(prefix)
+                           if username not in found]
+                self.__connection.executemany(
+                    "DELETE FROM users WHERE domain = ? AND username = ?", removed)
+            self.__connection.executemany(
+                "INSERT OR REPLACE INTO users (domain, username, name_key, label) VALUES (?, ?, ?, ?)", rows)
+            self.__connection.execute(
+                "INSERT OR REPLACE INTO prefixes (domain, prefix, fetched_at, complete) VALUES (?, ?, ?, ?)",
+                (self.__domain, prefix, time.time() if fetched_at is None else fetched_at, int(complete)))
+
+    def covers(self, query):
+        """
+        Verify if the store can answer a search, it's true when a fresh complete result
+        of the query or of one of its prefixes was stored.
+
+        :param query: Beginning of a username or fullname.
+        :type query: String
+
+        :return: **True** if the search can be answered by the store.
+        :rtype: **Boolean**
+        """
+        query = query.lower()
+        prefixes = [query[:i] for i in range(1, len(query) + 1)]
+        if not prefixes:
+            return False
+
+        with self.__lock:
+            row = self.__connection.execute(
+                "SELECT 1 FROM prefixes WHERE domain = ? AND complete = 1 AND fetched_at >= ? "
+                "AND prefix IN (%s) LIMIT 1" % ', '.join('?' * len(prefixes)),
+                [self.__domain, time.time() - self.__max_age] + prefixes).fetchone()
+        return row is not None
+
+    def search(self, query):
+        """
+        Search the stored users by the beginning of the username or fullname,
+        the same way that the platform does.
+
+        :param query: Beginning of a username or fullname.
+        :type query: String
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        query = query.lower()
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT label FROM users WHERE domain = ? AND username >= ? AND username < ? "
+                "UNION "
+                "SELECT label FROM users WHERE domain = ? AND name_key >= ? AND name_key < ?",
+                (self.__domain, query, query + _MAX_CHAR,
+                 self.__domain, query, query + _MAX_CHAR)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def get_users(self):
+        """
+        Method that returns all the stored users of the domain.
+
+        :return: List of users infos.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT label FROM users WHERE domain = ?", (self.__domain,)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def stale_prefixes(self, roots):
+        """
+        Method that returns the prefixes that need to be searched again: the stored ones older than
+        the ``max_age`` plus the ``roots`` that were never searched.
+
+        A prefix is left out when one of its prefixes is also stale, the search of the parent expands
+        to it again if it's still truncated, so no prefix is searched twice.
+
+        :param roots: The prefixes that cover the whole directory. Example: ['a', 'b', ...]
+        :type roots: list
+
+        :return: List of prefixes.
+        :rtype: list
+        """
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT prefix, fetched_at FROM prefixes WHERE domain = ?", (self.__domain,)).fetchall()
+
+        fetched = dict(rows)
+        deadline = time.time() - self.__max_age
+        stale = set(prefix for prefix, fetched_at in rows if fetched_at < deadline)
+        stale.update(root for root in roots if root not in fetched)
+        return sorted(prefix for prefix in stale
+                      if not any(prefix[:i] in stale for i in range(1, len(prefix))))
+
+    def close(self):
+        """
+        Close the SQLite file.
+        """
+        self.__connection.close()
+
+    def __match(self, prefix):
+        rows = self.__connection.execute(
+            "SELECT username FROM users WHERE domain = ? AND "
+            "((username >= ? AND username < ?) OR (name_key >= ? AND name_key < ?))",
+            (self.__domain, prefix, prefix + _MAX_CHAR, prefix, prefix + _MAX_CHAR)).fetchall()
+        return [row[0] for row in rows]
+
@@ -0,0 +1,133 @@
+import codecs
+import re
+import sigaa.parsers as parsers
+
+
+# the encodings always decoded by requests (urllib3), asked in every request of the sessions of the package.
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# bytes read from the response at a time.
+CHUNK_SIZE = 8 * 1024
+
+# the fields of the send message form (the attachment) left out of the form data when they are empty,
+# the other ones are always sent: the platform may rely on their presence, even when empty.
+OPTIONAL_FIELDS = ('form:nome', 'form:arquivo2')
+
+
+def negotiate_compression(session):
+    """
+    Ask the server to compress the responses of a session with gzip or deflate, done by :func:`sigaa.util.generate_session`.
+    The responses are decompressed by **requests** while they are read.
+
+    :param session: The session.
+    :type session: requests.Session
+    """
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+
+
+def compact_payload(payload, drop=()):
+    """
+    Remove the empty :data:`OPTIONAL_FIELDS` of a form data, the other empty fields are kept.
+
+    :param payload: The form data. Example: {'form': 'form', 'form:nome': '', ...}
+    :type payload: dict
+    :param drop: Fields removed even if they aren't empty, the ones that the request doesn't process,
+        like the subject and the text of an ajaxSingle search **(optional)**.
+    :type drop: tuple
+
+    :return: A new form data without the removed fields.
+    :rtype: dict. Example: {'form': 'form', ...}
+
+    >>> from sigaa.transport import compact_payload
+    >>> compact_payload({'form': 'form', 'form:nome': '', 'form:usuarioAuto': '', 'form:texto': 'Hi'},
+    ...                 drop=('form:texto',))
+    {'form': 'form', 'form:usuarioAuto': ''}
+    """
+    return dict((key, value) for key, value in payload.items()
+                if key not in drop and not (key in OPTIONAL_FIELDS and value == ''))
+
+
+class SuggestionParser:
+    """
+    Parser of the answer of the AJAX search of users (the suggestion table) fed with the bytes of the response
+    a chunk at a time, so the answer is never decoded as a whole text. The bytes are still read whole by **requests**
+    when the request isn't streamed, like the searches of :class:`sigaa.mailbox.MailBox`.
+
+    The users infos are searched only in the text between the tags, where the platform puts them. The parser
+    also tells if some strings (``markers``) were found anywhere in the response, like the ones verified
+    by :func:`sigaa.util.is_ajax_update` and :func:`sigaa.util.is_view_expired`.
+
+    :param markers: Strings searched in the whole response **(optional)**.
+    :type markers: tuple
+    :param encoding: The encoding of the response **(optional)**.
+    :type encoding: String
+
+    >>> from sigaa.transport import SuggestionParser, CHUNK_SIZE
+    >>> parser = SuggestionParser(markers=('Ajax-Update-Ids',))
+    >>> for chunk in r.iter_content(CHUNK_SIZE):
+    ...     parser.feed(chunk)
+    >>> parser.close()
+    ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    >>> parser.found('Ajax-Update-Ids')
+    True
+    """
+
+    def __init__(self, markers=(), encoding='utf-8'):
+        self.__decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.__markers = tuple(markers)
+        self.__found = set()
+        self.__overlap = max([len(marker) for marker in self.__markers] + [1]) - 1
+        self.__tail = ''
+        self.__text = ''
+        self.__users = set()
+
+    def feed(self, chunk):
+        """
+        Parse the next bytes of the response.
+
+        :param chunk: The bytes.
+        :type chunk: bytes
+        """
+        self.__parse(self.__decoder.decode(chunk))
+
+    def close(self):
+        """
+        Parse the end of the response.
+
+        :return: Sorted list of users infos without duplicates, the same of :func:`sigaa.util.extract_users`.
+        :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+        """
+        self.__parse(self.__decoder.decode(b'', final=True))
+        self.__users.update(parsers.iter_users(self.__text))
+        self.__text = ''
+        return sorted(self.__users)
+
+    def found(self, marker):
+        """
+        Method that returns **True** if the marker was in the response parsed until now.
+
+        :param marker: One of the ``markers``.
+        :type marker: String
+        """
+        return marker in self.__found
+
+    def __parse(self, text):
+        if not text:
+            return
+
+        # a marker may be split between two chunks
+        window = self.__tail + text
+        for marker in self.__markers:
+            if marker in window:
+                self.__found.add(marker)
+        self.__tail = window[-self.__overlap:] if self.__overlap else ''
+
+        # the text of each tag closed, the one still open waits for the next chunk
+        pieces = re.split(r'<[^>]*>', self.__text + text)
+        self.__text = pieces.pop()
+        if '<' in self.__text:
+            (before, self.__text) = self.__text.split('<', 1)
+            self.__text = '<' + self.__text
+            pieces.append(before)
+        for piece in pieces:
+            self.__users.update(parsers.iter_users(piece))
@@ -0,0 +1,155 @@
+import sys
+from array import array
+import sigaa.util as util
+
+
+class User:
+    """
+    Record of a user of the platform, parsed once from the user info ("NAME (username)") provided by the platform.
+
+    The username is interned and identifies the user: two records with the same username are equal
+    and have the same hash, so they can be used as keys of dicts and sets.
+
+    :param name: The fullname, **None** if unknown. Example: 'BRUNO DO NASCIMENTO MACIEL'
+    :type name: String
+    :param username: The username. Example: 'macielti'
+    :type username: String
+    :param label: The user info provided by the platform, built from the name and the username if not supplied **(optional)**.
+    :type label: String
+
+    >>> from sigaa.user import User
+    >>> user = User.parse('BRUNO DO NASCIMENTO MACIEL (macielti)')
+    >>> user.name, user.username
+    ('BRUNO DO NASCIMENTO MACIEL', 'macielti')
+    >>> user == User.parse('macielti')
+    True
+    """
+
+    __slots__ = ('name', 'username', 'label')
+
+    def __init__(self, name, username, label=None):
+        self.name = name
+        self.username = sys.intern(username)
+        if label is None:
+            label = username if name is None else '%s (%s)' % (name, username)
+        self.label = label
+
+    @classmethod
+    def parse(cls, user):
+        """
+        Parse a user info, or a bare username.
+
+        :param user: User info or username, a :class:`User` is returned as it is.
+            Example: "BRUNO DO NASCIMENTO MACIEL (macielti)" or "macielti"
+        :type user: String
+
+        :return: The record of the user, without the name if only the username was supplied.
+        :rtype: :class:`User`
+        """
+        if isinstance(user, User):
+            return user
+        (name, username) = util.split_user(user)
+        if username == user:
+            return cls(None, username, user)
+        return cls(name, username, user)
+
+    def __eq__(self, other):
+        if not isinstance(other, User):
+            return NotImplemented
+        return self.username == other.username
+
+    def __hash__(self):
+        return hash(self.username)
+
+    def __str__(self):
+        return self.label
+
+    def __repr__(self):
+        return 'User(%r, %r)' % (self.name, self.username)
+
+
+class UserTable:
+    """
+    Compact read-only column store of many users, for directories of hundreds of thousands of users.
+
+    The users infos are packed in a single string, sorted by username, and two arrays hold the position
+    of each one and of its username, instead of one string object per user. The :class:`User` records
+    are built only when they are read.
+
+    :param users: Users infos or :class:`User` records. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    :type users: list
+
+    >>> from sigaa.user import UserTable
+    >>> table = UserTable(api.get_all_users())
+    >>> table.find('macielti')
+    User('BRUNO DO NASCIMENTO MACIEL', 'macielti')
+    >>> 'BRUNO DO NASCIMENTO MACIEL (macielti)' in table
+    True
+    """
+
+    def __init__(self, users):
+        # by username, without building the records (and interning every username)
+        labels = {}
+        for user in users:
+            label = str(user)
+            labels[util.split_user(label)[1]] = label
+        usernames = sorted(labels)
+
+        offsets = [0]
+        username_offsets = []
+        for username in usernames:
+            label = labels[username]
+            if label == username:
+                username_offsets.append(offsets[-1])
+            else:
+                username_offsets.append(offsets[-1] + len(label) - len(username) - 1)
+            offsets.append(offsets[-1] + len(label))
+
+        self.__offsets = array('I', offsets)
+        self.__username_offsets = array('I', username_offsets)
+        self.__labels = ''.join(labels[username] for username in usernames)
+
+    def __len__(self):
+        return len(self.__username_offsets)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('user index out of range')
+        return User.parse(self.__labels[self.__offsets[i]:self.__offsets[i + 1]])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __contains__(self, user):
+        return self.find(User.parse(user).username) is not None
+
+    def find(self, username):
+        """
+        Find a user by the username, with a binary search.
+
+        :param username: The username. Example: 'macielti'
+        :type username: String
+
+        :return: The record of the user, or **None** if it isn't in the table.
+        :rtype: :class:`User`
+        """
+        (low, high) = (0, len(self))
+        while low < high:
+            middle = (low + high) // 2
+            if self.__username(middle) < username:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.__username(low) == username:
+            return self[low]
+        return None
+
+    def __username(self, i):
+        (start, end) = (self.__username_offsets[i], self.__offsets[i + 1])
+        if start > self.__offsets[i]:
+            # 'NAME (username)', without the closing parenthesis
+            end -= 1
+        return self.__labels[start:end]
@@ -1,13 +1,33 @@
 import requests
-import re
+import threading
+import sigaa.instrument as instrument
+import sigaa.parsers as parsers
+import sigaa.transport as transport
 
 
-def generate_session(domain):
+# semaphores shared by all the sessions of a same domain.
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+# number of chars (or bytes) of the login page searched for the platform name, it's in the title.
+_SIGAA_PREFIX_LENGTH = 16 * 1024
+
+
+@instrument.timed('util.generate_session')
+def generate_session(domain, session=None, domain_cache=None):
     """
     A function that recieve a domain string and return a **requests.Session()** object with cookies setted.
 
+    Only the beginning of the login page is read to verify the domain (see :func:`is_sigaa_page`).
+    When a ``domain_cache`` already knows that the domain is valid the login page isn't requested,
+    the session cookie is setted by the login.
+
     :param domain: The platform domain of the university server. Need to be the same as the domain inputed in the class instatiation.
     :type domain: String
+    :param session: A session to be used instead of a new one, useful to mount custom adapters **(optional)**.
+    :type session: **requests.session.Session()**
+    :param domain_cache: Keeps the result of the verification of the domains **(optional)**.
+    :type domain_cache: :class:`sigaa.bootstrap.DomainCache`
 
     :return: An unauthenticated session.
     :rtype: **requests.session.Session()**
@@ -18,17 +38,64 @@ def generate_session(domain):
     >>> session = API.generate_session("sigaa.ufpi.com")
     """
 
-    session = requests.Session()
+    if session is None:
+        session = requests.Session()
+    instrument.attach(session)
+    transport.negotiate_compression(session)
+    if domain_cache is not None:
+        valid = domain_cache.get(domain)
+        if valid:
+            return session
+        if valid is False:
+            raise NotValidDomain("Not valid sigaa platform domain.")
+
     r = session.get("https://%s/sigaa/verTelaLogin.do" %
                     domain, allow_redirects=True, stream=True)
 
-    # verify if the domain really apoint to a valid SIGAA platform.
-    if 'SIGAA' not in r.text:
+    # verify if the domain really apoint to a valid SIGAA platform, in the bytes: the encoding may be unknown.
+    valid = is_sigaa_page(r.iter_content(chunk_size=1024))
+    if domain_cache is not None:
+        domain_cache.put(domain, valid)
+    if not valid:
+        r.close()
         raise NotValidDomain("Not valid sigaa platform domain.")
+    # read the rest, without decoding it, so the connection goes back to the pool
+    r.content
 
     return session
 
 
+def is_sigaa_page(html_page, limit=_SIGAA_PREFIX_LENGTH):
+    """
+    Verify if a page is of the SIGAA platform, searching the name only in the beginning of the page.
+
+    :param html_page: HTML response text or bytes, or an iterable of pieces of it. Example: r.iter_content()
+    :type html_page: String
+    :param limit: Number of chars (or bytes) searched **(optional)**.
+    :type limit: int
+
+    :return: **True** if the platform name is in the first ``limit`` chars.
+    :rtype: **Boolean**
+    """
+    chunks = [html_page] if isinstance(html_page, (str, bytes)) else html_page
+
+    buffer = ''
+    read = 0
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            # the name is ascii, the same bytes in the encodings used by the platform
+            chunk = chunk.decode('latin-1')
+        # keep the end of the last chunk, the name may be splitted between two chunks
+        buffer = buffer[-4:] + chunk[:limit - read]
+        if 'SIGAA' in buffer:
+            return True
+        read += len(chunk)
+        if read >= limit:
+            break
+    return False
+
+
+@instrument.timed('util.get_j_id_and_jsp')
 def get_j_id_and_jsp(html_page):
     """
     This function recieve a html source code of a response and set the **j_id** and **j_id_jsp** parameters
@@ -36,17 +103,131 @@ def get_j_id_and_jsp(html_page):
 
     You are not expected to use this method but if you need, there is...
 
-    :param html_page: HTML response text.
+    The page is scanned incrementally and the scan stops as soon as the first **j_id** and the fourth **j_id_jsp**
+    are found, so the page can also be supplied as the chunks of a streamed response.
+
+    :param html_page: HTML response text or an iterable of pieces of it. Example: r.iter_content(decode_unicode=True)
     :type domain: String
-    """
 
-    # return the first ocurrence of the 'j_id'
-    j_id = list(re.findall(r"j_id\d{1,4}", html_page))[0]
-    j_id_jsp = list(re.findall(r"j_id_jsp_\d{4,}_\d+", html_page))[3]
+    :raises ViewStateNotFound: If the page doesn't have the parameters.
 
+    >>> r = session.get(url, stream=True)
+    >>> get_j_id_and_jsp(r.iter_content(chunk_size=8192, decode_unicode=True))
+    ('j_id1', 'j_id_jsp_1052251_1')
+    """
+    (j_id, j_id_jsp) = parsers.parse_view_state(html_page)
+    if j_id is None or j_id_jsp is None:
+        raise ViewStateNotFound("The page doesn't have the j_id (found: %s) and the j_id_jsp (found: %s)." % (
+            j_id, j_id_jsp))
     return (j_id, j_id_jsp)
 
 
+@instrument.timed('util.extract_users')
+def extract_users(html_page):
+    """
+    Extract the users infos of the response of the AJAX search of users.
+
+    :param html_page: HTML response text.
+    :type html_page: String
+
+    :return: Sorted list of users infos without duplicates.
+    :rtype: list. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)', ...]
+    """
+    return parsers.extract_users(html_page)
+
+
+def extract_domain(url):
+    """
+    Extract the domain, without the 'www.' prefix, of an url.
+
+    :param url: An url. Example: 'https://www.sigaa.ufpi.br/sigaa/abrirCaixaPostal.jsf'
+    :type url: String
+
+    :return: The domain. Example: 'sigaa.ufpi.br'
+    :rtype: String
+    """
+    return parsers.extract_domain(url)
+
+
+def is_login_failed(html_page):
+    """ Verify if the page is the answer of a login with a wrong username or password. """
+    return parsers.LOGIN_FAILED in html_page
+
+
+def is_session_expired(html_page):
+    """ Verify if the page says that the session is expired (or was never authenticated). """
+    return parsers.SESSION_EXPIRED in html_page
+
+
+def is_view_expired(html_page):
+    """ Verify if the page is the error of a rejected **javax.faces.ViewState** (a stale **j_id**). """
+    return any(marker in html_page for marker in parsers.VIEW_EXPIRED)
+
+
+def is_login_page(url):
+    """ Verify if the url is the login page, where the platform redirects the not authenticated sessions. """
+    return "verTelaLogin" in url
+
+
+def is_mailbox_page(html_page):
+    """ Verify if the page is the Mail Box portal. """
+    return parsers.MAILBOX in html_page
+
+
+def is_send_message_page(html_page):
+    """ Verify if the page is the one used to send messages. """
+    return parsers.SEND_MESSAGE in html_page
+
+
+def is_ajax_update(html_page):
+    """ Verify if the page is a successful AJAX partial update. """
+    return parsers.AJAX_UPDATE in html_page
+
+
+def is_user_added(html_page, user):
+    """ Verify if the user (user info or username) is in the recipients list of the AJAX answer of an add. """
+    return user.split(' ')[-1].strip('(').strip(')') in html_page
+
+
+def is_message_sent(html_page):
+    """ Verify if the page confirms that the message was sent. """
+    return parsers.MESSAGE_SENT in html_page
+
+
+def split_user(user):
+    """
+    Split the user info provided by the platform in to the fullname and the username.
+
+    :param user: User info. Example: "BRUNO DO NASCIMENTO MACIEL (macielti)"
+    :type user: String
+
+    :return: The fullname and the username.
+    :rtype: tuple. Example: ('BRUNO DO NASCIMENTO MACIEL', 'macielti')
+    """
+    username = user.split(' ')[-1].strip('(').strip(')')
+    return (user[:user.rfind(' (')], username)
+
+
+def get_host_semaphore(domain, limit):
+    """
+    Return the semaphore used to cap the number of concurrent requests against a domain.
+    The same semaphore is shared by every caller that ask for the same domain and limit.
+
+    :param domain: The platform domain of the university server.
+    :type domain: String
+    :param limit: Max number of concurrent requests.
+    :type limit: int
+
+    :return: A semaphore shared by the domain.
+    :rtype: **threading.BoundedSemaphore**
+    """
+    with _host_semaphores_lock:
+        key = (domain, limit)
+        if key not in _host_semaphores:
+            _host_semaphores[key] = threading.BoundedSemaphore(limit)
+        return _host_semaphores[key]
+
+
 class NotValidDomain(Exception):
     """
     Is raised when a not valid sigaa platform domain is suplied 
@@ -61,3 +242,31 @@ class NotValidDomain(Exception):
 
     def __init___(self, message):
         super(NotValidDomain, self).__init__(message)
+
+
+class NotAuthenticated(Exception):
+    """
+    Is raised when an operation that require the login data is executed
+    before a successful sigaa.api.API.authenticate().
+    """
+
+
+class ServerUnavailable(Exception):
+    """
+    Is raised when the server keeps failing (error status, timeout) a request that was tried again,
+    see :class:`sigaa.ratelimit.Throttle`.
+    """
+
+
+class ViewExpired(Exception):
+    """
+    Is raised when the server rejects the **javax.faces.ViewState** (the **j_id**) of a request,
+    the page need to be opened again to get a new one.
+    """
+
+
+class ViewStateNotFound(Exception):
+    """
+    Is raised when a page doesn't have the **j_id** and **j_id_jsp** parameters,
+    usually because it is an error page or the session is expired.
+    """
@@ -0,0 +1,414 @@
+"""
+A local stand-in for a SIGAA server, used by the offline tests and the benchmarks.
+
+It is a :class:`requests.adapters.BaseAdapter` that answers in process the requests
+of the endpoints used by sigaa-cli, keeping the state of every session (JSESSIONID)
+like the real server does.
+
+>>> from fake_sigaa import FakeSIGAA
+>>> from sigaa.api import API
+>>> server = FakeSIGAA(['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+>>> api = API(server.domain, session=server.session())
+>>> api.authenticate('macielti', 'passwd')
+True
+"""
+import asyncio
+import io
+import gzip
+import bisect
+import itertools
+import random
+import threading
+import time
+from http.client import HTTPMessage
+from urllib.parse import urlsplit, parse_qsl
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.structures import CaseInsensitiveDict
+from urllib3.response import HTTPResponse
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:  # optional dependency, only the tests of sigaa.aio need it
+    aiohttp = None
+
+
+LOGIN_PAGE = """<html><head><title>SIGAA - Sistema Integrado de Gest&atilde;o de Atividades Acad&ecirc;micas</title></head>
+<body><form name="loginForm" action="/sigaa/logar.do?dispatch=logOn" method="post">
+<input type="text" name="user.login"/><input type="password" name="user.senha"/></form></body></html>"""
+
+LOGIN_FAILED_PAGE = """<html><body><div class="erros">Usu&aacute;rio e/ou senha inv&aacute;lidos</div>
+Usuário e/ou senha inválidos</body></html>"""
+
+EXPIRED_PAGE = """<html><body><div class="erros">Sua sessão foi expirada. Por favor, realize o login novamente.</div>
+</body></html>"""
+
+ERROR_PAGE = """<html><body><h1>503 Service Unavailable</h1></body></html>"""
+
+VIEW_EXPIRED_PAGE = """<html><body><h2>Comportamento Inesperado!</h2>
+javax.faces.application.ViewExpiredException</body></html>"""
+
+PAGE = """<html><body>
+<form id="%(j_id)s" name="%(j_id)s" method="post">
+<input type="hidden" name="javax.faces.ViewState" id="javax.faces.ViewState" value="%(j_id)s" />
+<a id="j_id_jsp_1052251_1" href="#">Menu</a>
+<a id="j_id_jsp_1052251_2" href="#">Portal</a>
+<a id="j_id_jsp_1052251_3" href="#">Sair</a>
+<span id="j_id_jsp_%(jsp)s_1">%(content)s</span>
+</form></body></html>"""
+
+SUGGESTION = """<?xml version="1.0"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><head><meta name="Ajax-Update-Ids" content="form:suggestion" /></head>
+<body><table id="form:suggestion:suggest" cellspacing="0" cellpadding="0">%s</table></body></html>"""
+
+SUGGESTION_ENTRY = """<tr class="richfaces_suggestionEntry"><td class="rich-sb-cell-padding" nowrap="nowrap">
+<nobr>%s</nobr></td></tr>"""
+
+AJAX_UPDATE = """<?xml version="1.0"?>
+<html xmlns="http://www.w3.org/1999/xhtml"><head><meta name="Ajax-Update-Ids" content="form:destinatarios" /></head>
+<body><table id="form:destinatarios">%s</table></body></html>"""
+
+
+NAMES = ['ANA', 'ANTONIO', 'BRUNO', 'CARLOS', 'FRANCISCO', 'JOSE', 'MARIA', 'PAULO',
+         'DA', 'DE', 'DO', 'LIMA', 'MACIEL', 'NASCIMENTO', 'OLIVEIRA', 'SILVA', 'SOUSA']
+
+
+def generate_directory(size, seed=0):
+    """ Return a sorted list of ``size`` random users infos, the same for the same seed. """
+    generator = random.Random(seed)
+    directory = set()
+    while len(directory) < size:
+        name = ' '.join(generator.choice(NAMES) for _ in range(4))
+        username = ''.join(generator.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(8))
+        directory.add('%s (%s)' % (name, username))
+    return sorted(directory)
+
+
+class Redirect(str):
+    """ The answer of a route that redirects the browser to the url it holds. """
+
+
+class SessionState:
+    """ The state of a session kept in the backend. """
+
+    def __init__(self):
+        self.username = None
+        self.views = 0
+        self.j_id = None
+        self.suggestion = []
+        self.selected = None
+        self.recipients = []
+
+
+class FakeSIGAA(BaseAdapter):
+    """
+    :param directory: List of users infos. Example: ['BRUNO DO NASCIMENTO MACIEL (macielti)']
+    :type directory: list
+    :param password: The password of every user of the directory.
+    :type password: String
+    :param domain: The domain answered by the server.
+    :type domain: String
+    :param cap: Max number of users of a search result, like the suggestion box of the platform.
+    :type cap: int
+    :param latency: Seconds each request takes, or a callable called as ``latency(method, path)``.
+    :type latency: float
+    :param compress: If **True** the answers are compressed with gzip when the request accepts it.
+    :type compress: Boolean
+
+    :attr requests: List of (method, path) of every request answered.
+    :attr messages: List of (recipients, subject, message) of every message sent.
+    """
+
+    def __init__(self, directory, password='passwd', domain='sigaa.fake.br', cap=None, latency=0, compress=False):
+        super(FakeSIGAA, self).__init__()
+        self.latency = latency
+        self.compress = compress
+        self.directory = sorted(directory)
+        self.password = password
+        self.domain = domain
+        self.cap = cap
+        self.requests = []
+        self.messages = []
+        self.__sessions = {}
+        self.__ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.__failures = {}
+        self.__users = set(self.directory)
+        # sorted (key, user) of the usernames and of the fullnames, for the prefix searches
+        self.__keys = sorted([(user.split(' ')[-1].strip('(').strip(')').lower(), user) for user in self.directory] +
+                             [(user.lower(), user) for user in self.directory])
+        self.__usernames = dict((user.split(' ')[-1].strip('(').strip(')'), user) for user in self.directory)
+
+    def session(self):
+        """ Return a requests.Session() that send its requests to this server. """
+        session = requests.Session()
+        self.mount(session)
+        return session
+
+    def mount(self, session):
+        session.mount('https://%s/' % self.domain, self)
+        session.mount('https://www.%s/' % self.domain, self)
+
+    def expire(self):
+        """ Expire every session, like a restart of the server. """
+        with self.__lock:
+            self.__sessions.clear()
+
+    def fail(self, path, count=1, status=503):
+        """ Answer the next ``count`` requests of the path with an error page, like an overloaded server. """
+        with self.__lock:
+            self.__failures[path] = (count, status)
+
+    def close(self):
+        pass
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        url = urlsplit(request.url)
+        query = dict(parse_qsl(url.query))
+        body = request.body or ''
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        form = dict(parse_qsl(body, keep_blank_values=True))
+
+        with self.__lock:
+            self.requests.append((request.method, url.path))
+            cookies = {}
+            cookie = request.headers.get('Cookie')
+            if cookie:
+                cookies = dict(part.strip().split('=', 1) for part in cookie.split(';'))
+            session_id = cookies.get('JSESSIONID')
+            set_cookie = None
+            if session_id not in self.__sessions:
+                session_id = 'FAKE%06d' % next(self.__ids)
+                self.__sessions[session_id] = SessionState()
+                set_cookie = 'JSESSIONID=%s; Domain=.%s; Path=/' % (session_id, self.domain)
+            state = self.__sessions[session_id]
+
+            status = 200
+            (count, error) = self.__failures.get(url.path, (0, None))
+            if count:
+                self.__failures[url.path] = (count - 1, error)
+                (text, status) = (ERROR_PAGE, error)
+            else:
+                text = self.route(state, request.method, url.path, query, form)
+
+        latency = self.latency(request.method, url.path) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        return self.build_response(request, text, set_cookie, status)
+
+    def route(self, state, method, path, query, form):
+        if path == '/sigaa/verTelaLogin.do':
+            return LOGIN_PAGE
+
+        if path == '/sigaa/logar.do':
+            if query.get('dispatch') == 'logOff':
+                state.__init__()
+                return LOGIN_PAGE
+            username = form.get('user.login')
+            if username in self.__usernames and form.get('user.senha') == self.password:
+                state.username = username
+                return self.page(state, 'Portal do Discente')
+            return LOGIN_FAILED_PAGE
+
+        if state.username is None:
+            return EXPIRED_PAGE
+
+        if path == '/sigaa/verPortalDiscente.do':
+            return self.page(state, 'Portal do Discente')
+
+        if path == '/sigaa/abrirCaixaPostal.jsf':
+            return self.page(state, '2 Registro(s) Encontrado(s)')
+
+        if form.get('javax.faces.ViewState') != state.j_id:
+            return VIEW_EXPIRED_PAGE
+
+        if path == '/cxpostal/caixa_postal.jsf' and 'form:cmdMsg' in form:
+            state.recipients = []
+            return self.page(state, '<table><caption>Anexar Arquivos</caption></table>')
+
+        if path == '/cxpostal/envia_mensagem.jsf':
+            return self.compose(state, form)
+
+        return VIEW_EXPIRED_PAGE
+
+    def compose(self, state, form):
+        if 'form:suggestion' in form:
+            state.suggestion = self.search(form.get('inputvalue', ''))
+            return SUGGESTION % ''.join(SUGGESTION_ENTRY % user for user in state.suggestion)
+
+        if any(key.startswith('form:suggestion:') for key in form):
+            # the selection is a position in the last search, whatever the text of the field
+            index = form.get('form:suggestion_selection', '')
+            if index.isdigit() and int(index) < len(state.suggestion):
+                state.selected = state.suggestion[int(index)]
+            else:
+                state.selected = None
+            return AJAX_UPDATE % ''
+
+        if 'form:addDestinatario' in form:
+            if state.selected is not None:
+                state.recipients.append(state.selected)
+            state.selected = None
+            return AJAX_UPDATE % ''.join('<tr><td>%s</td></tr>' % user for user in state.recipients)
+
+        if 'form:btnBotaoCancelar' in form:
+            if not state.recipients:
+                return self.page(state, 'Informe pelo menos um destinatário.')
+            self.messages.append((list(state.recipients), form.get('form:assunto'), form.get('form:texto')))
+            state.recipients = []
+            return self.page(state, 'Mensagem enviada com sucesso')
+
+        return VIEW_EXPIRED_PAGE
+
+    def search(self, query):
+        query = query.strip().lower()
+        if not query:
+            return []
+        result = set()
+        i = bisect.bisect_left(self.__keys, (query,))
+        while i < len(self.__keys) and self.__keys[i][0].startswith(query):
+            result.add(self.__keys[i][1])
+            i += 1
+        return sorted(result)[:self.cap]
+
+    def page(self, state, content):
+        state.views += 1
+        state.j_id = 'j_id%d' % state.views
+        return PAGE % {'j_id': state.j_id, 'jsp': 1052251 + len(self.requests), 'content': content}
+
+    def build_response(self, request, text, set_cookie=None, status=200):
+        headers = HTTPMessage()
+        headers['Content-Type'] = 'text/html; charset=UTF-8'
+        if isinstance(text, Redirect):
+            headers['Location'] = text
+            (text, status) = ('', 302)
+        if set_cookie is not None:
+            headers['Set-Cookie'] = set_cookie
+        body = text.encode('utf-8')
+        if self.compress and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        raw = HTTPResponse(body=io.BytesIO(body), headers=dict(headers.items()), status=status,
+                           preload_content=False, decode_content=False,
+                           original_response=_OriginalResponse(headers))
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(raw.headers)
+        response.raw = raw
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = {200: 'OK', 302: 'Found'}.get(status, 'Error')
+        response.connection = self
+        extract_cookies_to_jar(response.cookies, request, raw)
+        return response
+
+
+class _OriginalResponse:
+    """ What requests.cookies reads of a http.client.HTTPResponse to extract the cookies. """
+
+    def __init__(self, msg):
+        self.msg = msg
+
+    def isclosed(self):
+        return True
+
+
+class LocalServer:
+    """
+    Serve a FakeSIGAA over HTTP on localhost with aiohttp, so the asyncio client is tested over real connections.
+    Each request is answered in a thread, the answers of a server with latency really overlap.
+
+    >>> async with LocalServer(FakeSIGAA(DIRECTORY, latency=0.01)) as local:
+    ...     async with AsyncAPI(local.server.domain, session=local.session()) as api:
+    ...         await api.authenticate('macielti', 'passwd')
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.port = None
+        self.__runner = None
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self.handle)
+        self.__runner = web.AppRunner(app)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = self.__runner.addresses[0][1]
+        return self
+
+    async def __aexit__(self, *args):
+        await self.__runner.cleanup()
+
+    def session(self):
+        """ Return an aiohttp.ClientSession() whose requests to the domain are sent to this server. """
+        return LocalSession(self.port)
+
+    async def handle(self, request):
+        # the client sends the original host, the answer is the one of the https url of the domain
+        url = 'https://%s%s' % (request.headers['X-Original-Host'], request.path_qs)
+        headers = {'Content-Type': request.headers.get('Content-Type', '')}
+        if 'Cookie' in request.headers:
+            headers['Cookie'] = request.headers['Cookie']
+        prepared = requests.Request(request.method, url, data=await request.read(), headers=headers).prepare()
+        r = await asyncio.get_running_loop().run_in_executor(None, self.server.send, prepared)
+
+        headers = {}
+        if 'Set-Cookie' in r.headers:
+            # the cookie of the domain, kept by the client for the local server
+            headers['Set-Cookie'] = r.headers['Set-Cookie'].split('; Domain=')[0] + '; Path=/'
+        return web.Response(body=r.content, status=r.status_code, headers=headers,
+                            content_type='text/html', charset='utf-8')
+
+
+class LocalSession:
+    """ An aiohttp.ClientSession that sends the requests of any https url to a LocalServer. """
+
+    def __init__(self, port):
+        self.port = port
+        self.session = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    @property
+    def closed(self):
+        return self.session.closed
+
+    def request(self, method, url, data=None, allow_redirects=True):
+        parts = urlsplit(url)
+        local = 'http://127.0.0.1:%d%s' % (self.port, parts.path + ('?' + parts.query if parts.query else ''))
+        return LocalRequest(self.session.request(method, local, data=data, allow_redirects=allow_redirects,
+                                                 headers={'X-Original-Host': parts.netloc}), url)
+
+    async def close(self):
+        await self.session.close()
+
+
+class LocalRequest:
+    """ The request of a LocalSession, its response has the original url. """
+
+    def __init__(self, request, url):
+        self.request = request
+        self.url = url
+
+    async def __aenter__(self):
+        response = await self.request.__aenter__()
+        return LocalResponse(response, self.url)
+
+    async def __aexit__(self, *args):
+        return await self.request.__aexit__(*args)
+
+
+class LocalResponse:
+
+    def __init__(self, response, url):
+        self.response = response
+        self.url = url
+
+    async def text(self):
+        return await self.response.text()
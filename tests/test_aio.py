@@ -0,0 +1,213 @@
+import unittest
+import asyncio
+import threading
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.aio import AsyncAPI, AsyncMailBox, AsyncSessionPool
+import sigaa.util as util
+from fake_sigaa import FakeSIGAA, LocalServer, aiohttp
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+class PeakSIGAA(FakeSIGAA):
+    """ A FakeSIGAA that counts the peak of requests being answered at the same time. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running = 0
+        self.peak = 0
+        self.__counter = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self.__counter:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self.__counter:
+                self.running -= 1
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp isn't installed")
+class TestAsyncAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY, latency=0.01)
+
+    def test_authenticate(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncAPI(self.server.domain, session=local.session()) as api:
+                    self.assertFalse(await api.is_authenticated())
+                    self.assertFalse(await api.authenticate('macielti', 'wrong'))
+                    self.assertTrue(await api.authenticate('macielti', self.server.password))
+                    self.assertTrue(await api.is_authenticated())
+                    self.assertTrue(await api.deauthenticate())
+        run(main())
+
+    def test_not_valid_domain(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                session = local.session()
+                with self.assertRaises(util.NotValidDomain):
+                    async with AsyncAPI(self.server.domain, session=session):
+                        pass
+                # the session isn't left open
+                self.assertTrue(session.closed)
+
+        self.server.fail('/sigaa/verTelaLogin.do', status=404)
+        run(main())
+
+    def test_search(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncAPI(self.server.domain, session=local.session()) as api:
+                    await api.authenticate('macielti', self.server.password)
+                    self.assertEqual(await api.search_user('macielti'), ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+                    return await api.search_users(['ana', 'ma', 'x'])
+        self.assertEqual(run(main()), [
+            ['ANA MARIA SOUSA (anamaria)'],
+            ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'],
+            [],
+        ])
+
+    def test_concurrent_operations(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncAPI(self.server.domain, session=local.session()) as api:
+                    await api.authenticate('macielti', self.server.password)
+                    # the operations share the page one at a time, they must not reject the view state of each other
+                    return await asyncio.gather(api.search_user('ana'), api.search_users(['dores', 'ma']),
+                                                api.search_user('macielti'))
+        self.assertEqual(run(main()), [
+            ['ANA MARIA SOUSA (anamaria)'],
+            [['MARIA DAS DORES (dores)'], ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)']],
+            ['BRUNO DO NASCIMENTO MACIEL (macielti)'],
+        ])
+
+    def test_compose_reused(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncAPI(self.server.domain, session=local.session()) as api:
+                    await api.authenticate('macielti', self.server.password)
+                    await api.search_user('ana')
+                    before = len(self.server.requests)
+                    await api.search_user('dores')
+                    # the send message page is kept, only the search is requested
+                    self.assertEqual(len(self.server.requests) - before, 1)
+                    await api.is_authenticated()
+                    before = len(self.server.requests)
+                    self.assertEqual(await api.search_user('ana'), ['ANA MARIA SOUSA (anamaria)'])
+                    # another page was opened, the send message page is opened again
+                    self.assertEqual(len(self.server.requests) - before, 3)
+        run(main())
+
+    def test_view_expired(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncAPI(self.server.domain, session=local.session()) as api:
+                    await api.authenticate('macielti', self.server.password)
+                    mail_box = AsyncMailBox(api.get_session(), api.get_domain())
+                    await mail_box.goto_mainbox_portal()
+                    await mail_box.goto_send_message()
+                    # another page of the session turns the view state of the mail box stale
+                    self.assertTrue(await api.is_authenticated())
+                    with self.assertRaises(util.ViewExpired):
+                        await mail_box.search('ana')
+        run(main())
+
+    def test_send_message(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncAPI(self.server.domain, session=local.session()) as api:
+                    await api.authenticate('macielti', self.server.password)
+                    self.assertFalse(await api.send_message(['NOBODY (nobody)'], 'Subject', 'Message'))
+                    return await api.send_message(['MARIA DAS DORES (dores)', 'anamaria'], 'Subject', 'Message')
+        self.assertTrue(run(main()))
+        self.assertEqual(self.server.messages, [(['MARIA DAS DORES (dores)', 'ANA MARIA SOUSA (anamaria)'], 'Subject', 'Message')])
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp isn't installed")
+class TestAsyncSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = PeakSIGAA(DIRECTORY, latency=0.02)
+
+    def test_search_users(self):
+        queries = ['ana', 'ma', 'x', 'dores', 'macielti', 'maria'] * 3
+
+        async def main():
+            async with LocalServer(self.server) as local:
+                factory = lambda domain: local.session()
+                async with AsyncSessionPool(self.server.domain, 'macielti', self.server.password, size=3,
+                                            session_factory=factory) as pool:
+                    self.assertEqual(pool.get_size(), 3)
+                    self.server.peak = 0
+                    return await pool.search_users(queries)
+
+        results = run(main())
+        self.assertEqual(results[:6], [
+            ['ANA MARIA SOUSA (anamaria)'],
+            ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'],
+            [],
+            ['MARIA DAS DORES (dores)'],
+            ['BRUNO DO NASCIMENTO MACIEL (macielti)'],
+            ['MARIA DAS DORES (dores)'],
+        ])
+        self.assertEqual(results, results[:6] * 3)
+        # the searches overlap, bounded by the number of sessions
+        self.assertGreater(self.server.peak, 1)
+        self.assertLessEqual(self.server.peak, 3)
+        requests = [path for (_, path) in self.server.requests]
+        # a logOn and a logOff per session
+        self.assertEqual(requests.count('/sigaa/logar.do'), 6)
+        # the send message page is opened once per session, the searches are a request each
+        self.assertEqual(requests.count('/cxpostal/caixa_postal.jsf'), 3)
+        self.assertEqual(requests.count('/cxpostal/envia_mensagem.jsf'), len(queries))
+
+    def test_not_authenticated(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                sessions = []
+
+                def factory(domain):
+                    sessions.append(local.session())
+                    return sessions[-1]
+
+                with self.assertRaises(util.NotAuthenticated):
+                    async with AsyncSessionPool(self.server.domain, 'macielti', 'wrong', size=2,
+                                                session_factory=factory):
+                        pass
+                self.assertEqual(len(sessions), 2)
+                self.assertTrue(all(session.closed for session in sessions))
+        run(main())
+
+    def test_send_message(self):
+        async def main():
+            async with LocalServer(self.server) as local:
+                async with AsyncSessionPool(self.server.domain, 'macielti', self.server.password, size=2,
+                                            session_factory=lambda domain: local.session()) as pool:
+                    return await asyncio.gather(pool.send_message(['anamaria'], 'A', 'Message'),
+                                                pool.send_message(['dores'], 'B', 'Message'))
+        self.assertEqual(run(main()), [True, True])
+        self.assertEqual(sorted(self.server.messages), [(['ANA MARIA SOUSA (anamaria)'], 'A', 'Message'),
+                                                        (['MARIA DAS DORES (dores)'], 'B', 'Message')])
+
+
+if __name__ == '__main__':
+    unittest.main()
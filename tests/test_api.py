@@ -1,6 +1,11 @@
 import unittest
 import requests
+import threading
 import re
+import io
+import contextlib
+import tempfile
+from unittest import mock
 
 import os
 import sys
@@ -11,6 +16,13 @@ from sigaa.api import MailBox
 import sigaa
 
 from creds import login
+from fake_sigaa import FakeSIGAA, Redirect
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
 
 class TestAPI(unittest.TestCase):
 
@@ -50,5 +62,187 @@ class TestAPI(unittest.TestCase):
         result = api.search_user('macielti')
         self.assertEqual(result , ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
 
+class TestAPIOffline(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        self.api = API(self.server.domain, session=self.server.session())
+
+    def portal_requests(self):
+        return self.server.requests.count(('GET', '/sigaa/verPortalDiscente.do'))
+
+    def test_is_authenticated_cached(self):
+        self.assertFalse(self.api.is_authenticated())
+        self.assertEqual(self.portal_requests(), 1)
+
+        self.assertTrue(self.api.authenticate('macielti', self.server.password))
+        self.assertTrue(self.api.is_authenticated())
+        self.assertTrue(self.api.is_authenticated())
+        self.assertEqual(self.portal_requests(), 1)
+
+        self.assertTrue(self.api.is_authenticated(force=True))
+        self.assertEqual(self.portal_requests(), 2)
+
+        self.assertTrue(self.api.deauthenticate())
+        self.assertFalse(self.api.is_authenticated())
+        self.assertEqual(self.portal_requests(), 2)
+
+    def test_is_authenticated_expired(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.server.expire()
+        # the expiration is detected from the response of any operation
+        self.assertEqual(self.api.search_user('ma'), [])
+        self.assertFalse(self.api.is_authenticated())
+        self.assertEqual(self.portal_requests(), 0)
+
+    def test_is_authenticated_redirected(self):
+        self.api.authenticate('macielti', self.server.password)
+        route = self.server.route
+
+        def redirect(state, method, path, query, form):
+            if path == '/sigaa/verPortalDiscente.do':
+                return Redirect('https://%s/sigaa/verTelaLogin.do' % self.server.domain)
+            return route(state, method, path, query, form)
+        self.server.route = redirect
+
+        # the platform sends the not authenticated sessions to the login page
+        self.assertFalse(self.api.is_authenticated(force=True))
+        self.assertFalse(self.api.get_session_state().is_authenticated())
+
+    def test_search_not_decoded(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.api.search_user('ma')
+        # the answer is parsed from the bytes, not even the session state decodes it
+        with mock.patch.object(requests.Response, 'text', new_callable=mock.PropertyMock) as text:
+            self.assertEqual(self.api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        self.assertFalse(text.called)
+
+    def test_is_authenticated_stale(self):
+        api = API(self.server.domain, session=self.server.session(), session_timeout=0)
+        api.authenticate('macielti', self.server.password)
+        self.assertTrue(api.is_authenticated())
+        self.assertEqual(self.portal_requests(), 1)
+
+    def test_lazy(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        api = API(self.server.domain, session=self.server.session(), lazy=True)
+        self.assertEqual(self.server.requests, [])
+        self.assertFalse(api.is_authenticated())
+        self.assertTrue(api.deauthenticate())
+        self.assertEqual(self.server.requests, [])
+
+        self.assertTrue(api.authenticate('macielti', self.server.password))
+        self.assertEqual(self.server.requests, [('GET', '/sigaa/verTelaLogin.do'), ('POST', '/sigaa/logar.do')])
+        self.assertEqual(api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+
+    def test_lazy_not_valid_domain(self):
+        self.server.fail('/sigaa/verTelaLogin.do', status=404)
+        api = API(self.server.domain, session=self.server.session(), lazy=True)
+        with self.assertRaises(sigaa.util.NotValidDomain):
+            api.authenticate('macielti', self.server.password)
+
+    def test_without_progress(self):
+        api = API(self.server.domain, session=self.server.session(), progress=False)
+        api.authenticate('macielti', self.server.password)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), contextlib.redirect_stdout(stderr):
+            self.assertEqual(api.get_all_users(), DIRECTORY)
+            self.assertFalse(api.send_message(['NOBODY (nobody)'], 'Subject', 'Message'))
+        self.assertEqual(stderr.getvalue(), '')
+
+    def test_get_all_users(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.assertEqual(self.api.get_all_users(workers=2), DIRECTORY)
+        self.assertEqual(self.api.get_crawl_report(), {1: 36})
+
+    def test_iter_users(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.assertEqual(sorted(self.api.iter_users(workers=2)), DIRECTORY)
+
+        for user in self.api.iter_users(workers=2):
+            break
+        # the spawned sessions were logged off
+        self.assertEqual(self.server.requests.count(('GET', '/sigaa/logar.do')), 4)
+
+    def searching(self, operation):
+        """ Run the operation while another thread searches with the same API object. """
+        errors = []
+        stop = threading.Event()
+
+        def search():
+            while not stop.is_set():
+                try:
+                    self.assertEqual(self.api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=search)
+        thread.start()
+        try:
+            return operation()
+        finally:
+            stop.set()
+            thread.join()
+            self.assertEqual(errors, [])
+
+    def test_iter_users_threads(self):
+        self.server.latency = 0.001
+        self.api.authenticate('macielti', self.server.password)
+        self.assertEqual(self.searching(lambda: sorted(self.api.iter_users())), DIRECTORY)
+
+    def test_send_bulk_message_threads(self):
+        self.server.latency = 0.001
+        self.api.authenticate('macielti', self.server.password)
+        with tempfile.TemporaryDirectory() as directory:
+            results = self.searching(lambda: self.api.send_bulk_message(
+                DIRECTORY, 'Subject', 'Message', os.path.join(directory, 'job.journal'), shard_size=1))
+        self.assertTrue(all(results.values()))
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_compose_reused(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.api.search_user('ma')
+        before = len(self.server.requests)
+        self.assertEqual(self.api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.api.search_user('ana'), ['ANA MARIA SOUSA (anamaria)'])
+        # only the searches
+        self.assertEqual(len(self.server.requests) - before, 2)
+
+        self.assertTrue(self.api.send_message(['MARIA DAS DORES (dores)'], 'Subject', 'Message'))
+        before = len(self.server.requests)
+        self.assertTrue(self.api.send_message(['ANA MARIA SOUSA (anamaria)'], 'Subject', 'Message'))
+        # the send message page, search, selection, add and send
+        self.assertEqual(len(self.server.requests) - before, 5)
+        self.assertEqual(self.server.messages, [(['MARIA DAS DORES (dores)'], 'Subject', 'Message'),
+                                                (['ANA MARIA SOUSA (anamaria)'], 'Subject', 'Message')])
+
+    def test_compose_view_expired(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.api.search_user('ma')
+        # another page makes the server drop the view state of the mail box
+        self.api.is_authenticated(force=True)
+        before = len(self.server.requests)
+        self.assertEqual(self.api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        # the rejected search, the two pages and the search again
+        self.assertEqual(len(self.server.requests) - before, 4)
+
+    def test_compose_threads(self):
+        self.api.authenticate('macielti', self.server.password)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.api.search_user('dores'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [['MARIA DAS DORES (dores)']] * 8)
+        self.assertEqual(self.server.requests.count(('GET', '/sigaa/abrirCaixaPostal.jsf')), 1)
+
+    def test_send_message(self):
+        self.api.authenticate('macielti', self.server.password)
+        self.assertFalse(self.api.send_message(['MARIA DAS DORES (dores)', 'NOBODY (nobody)'], 'Subject', 'Message'))
+        self.assertEqual(self.api.get_send_report(), {'MARIA DAS DORES (dores)': True, 'NOBODY (nobody)': False})
+        self.assertTrue(self.api.send_message(['MARIA DAS DORES (dores)', 'NOBODY (nobody)'], 'Subject', 'Message', strict=False))
+        self.assertEqual(self.server.messages, [(['MARIA DAS DORES (dores)'], 'Subject', 'Message')])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import tempfile
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.bootstrap import DomainCache, probe_domains, prewarm
+import sigaa.util as util
+from fake_sigaa import FakeSIGAA, LOGIN_PAGE
+
+
+DIRECTORY = [
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+LOGIN = ('GET', '/sigaa/verTelaLogin.do')
+
+
+class FakeOtherSite(FakeSIGAA):
+    """ A domain that isn't a SIGAA platform. """
+
+    def route(self, state, method, path, query, form):
+        return '<html><head><title>Other</title></head></html>'
+
+
+class FakeNoCharset(FakeSIGAA):
+    """ A platform that answers without the charset, the encoding of the responses is unknown. """
+
+    def build_response(self, request, text, set_cookie=None, status=200):
+        response = super(FakeNoCharset, self).build_response(request, text, set_cookie, status)
+        response.encoding = None
+        return response
+
+
+class TestBootstrap(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'domains.json')
+        self.cache = DomainCache(self.path)
+        self.server = FakeSIGAA(DIRECTORY)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_is_sigaa_page(self):
+        self.assertTrue(util.is_sigaa_page(LOGIN_PAGE))
+        chunks = (LOGIN_PAGE[i:i + 3] for i in range(0, len(LOGIN_PAGE), 3))
+        self.assertTrue(util.is_sigaa_page(chunks))
+        self.assertFalse(util.is_sigaa_page('x' * 100 + 'SIGAA', limit=100))
+        self.assertTrue(util.is_sigaa_page(LOGIN_PAGE.encode('utf-8')))
+        self.assertFalse(util.is_sigaa_page(b'x' * 100 + b'SIGAA', limit=100))
+
+    def test_unknown_encoding(self):
+        server = FakeNoCharset(DIRECTORY)
+        api = API(server.domain, server.session())
+        self.assertTrue(api.authenticate('macielti', server.password))
+
+    def test_domain_cache(self):
+        self.assertIsNone(self.cache.get(self.server.domain))
+        API(self.server.domain, self.server.session(), domain_cache=self.cache)
+        self.assertTrue(DomainCache(self.path).get(self.server.domain))
+
+        API(self.server.domain, self.server.session(), domain_cache=DomainCache(self.path))
+        self.assertEqual(self.server.requests.count(LOGIN), 1)
+
+        self.assertIsNone(DomainCache(self.path, max_age=-1).get(self.server.domain))
+
+    def test_probe_domains(self):
+        other = FakeOtherSite([], domain='other.fake')
+        servers = {self.server.domain: self.server, other.domain: other}
+        results = probe_domains([self.server.domain, other.domain], self.cache,
+                                lambda domain: servers[domain].session())
+        self.assertEqual(results, {self.server.domain: True, other.domain: False})
+
+        with self.assertRaises(util.NotValidDomain):
+            API(other.domain, other.session(), domain_cache=self.cache)
+        self.assertEqual(other.requests, [LOGIN])
+
+    def test_prewarm(self):
+        self.cache.put(self.server.domain, True)
+        apis = prewarm(self.server.domain, 4, 'macielti', self.server.password, self.cache,
+                       lambda domain: self.server.session())
+        self.assertEqual(len(apis), 4)
+        self.assertEqual(self.server.requests.count(LOGIN), 0)
+        self.assertEqual([api.search_user('dores') for api in apis], [['MARIA DAS DORES (dores)']] * 4)
+
+    def test_prewarm_not_authenticated(self):
+        with self.assertRaises(util.NotAuthenticated):
+            prewarm(self.server.domain, 2, 'macielti', 'wrong', session_factory=lambda domain: self.server.session())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.bulk import BulkSender
+from sigaa.user import User
+from fake_sigaa import FakeSIGAA
+
+
+DIRECTORY = ['USER NUMBER %02d (user%02d)' % (i, i) for i in range(25)]
+
+
+class TestBulkSender(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.directory.name, 'job.journal')
+        self.server = FakeSIGAA(DIRECTORY)
+        self.api = API(self.server.domain, session=self.server.session())
+        self.api.authenticate('user00', self.server.password)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_shards(self):
+        sender = BulkSender([self.api], self.journal, shard_size=10)
+        self.assertEqual([len(shard) for shard in sender.get_shards(DIRECTORY)], [10, 10, 5])
+
+    def test_send(self):
+        sender = BulkSender([self.api, self.api.spawn(), self.api.spawn()], self.journal, shard_size=10)
+        results = sender.send(DIRECTORY + ['NOBODY (nobody)'], 'Subject', 'Message')
+        self.assertEqual(results, dict([(user, True) for user in DIRECTORY] + [('NOBODY (nobody)', False)]))
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(sorted(user for recipients, _, _ in self.server.messages for user in recipients), DIRECTORY)
+
+    def test_send_records(self):
+        sender = BulkSender([self.api], self.journal, shard_size=10)
+        records = [User.parse(user) for user in DIRECTORY]
+        results = sender.send(iter(records), 'Subject', 'Message')
+        self.assertEqual(results, dict((user, True) for user in records))
+        self.assertEqual(len(self.server.messages), 3)
+
+        # the journal of the records resumes the same job
+        BulkSender([self.api], self.journal, shard_size=10).send(DIRECTORY, 'Subject', 'Message')
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_resume(self):
+        sender = BulkSender([self.api], self.journal, shard_size=10)
+        shards = sender.get_shards(DIRECTORY)
+
+        # the second shard fails, like a crash in the middle of the job
+        original_add = self.server.compose
+        def compose(state, form):
+            if form.get('form:usuarioAuto') in shards[1]:
+                raise RuntimeError('crash')
+            return original_add(state, form)
+        self.server.compose = compose
+
+        with self.assertRaises(RuntimeError):
+            sender.send(DIRECTORY, 'Subject', 'Message')
+        self.assertEqual(len(self.server.messages), 2)
+
+        self.server.compose = original_add
+        results = BulkSender([self.api], self.journal, shard_size=10).send(DIRECTORY, 'Subject', 'Message')
+        self.assertTrue(all(results.values()))
+        self.assertEqual([recipients for recipients, _, _ in self.server.messages], [shards[0], shards[2], shards[1]])
+
+        # a finished job sends nothing
+        BulkSender([self.api], self.journal, shard_size=10).send(DIRECTORY, 'Subject', 'Message')
+        self.assertEqual(len(self.server.messages), 3)
+
+
+class TestAPIBulk(unittest.TestCase):
+
+    def test_send_bulk_message(self):
+        server = FakeSIGAA(DIRECTORY)
+        api = API(server.domain, session=server.session())
+        api.authenticate('user00', server.password)
+        with tempfile.TemporaryDirectory() as directory:
+            results = api.send_bulk_message(DIRECTORY, 'Subject', 'Message',
+                                            os.path.join(directory, 'job.journal'), shard_size=5, workers=2)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(len(server.messages), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
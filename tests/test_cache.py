@@ -0,0 +1,121 @@
+import unittest
+import tempfile
+import time
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.cache import SearchCache
+from fake_sigaa import FakeSIGAA
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+SEARCH = ('POST', '/cxpostal/envia_mensagem.jsf')
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'searches.db')
+        self.cache = SearchCache(self.path, memory_entries=2)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get('sigaa.ufpi.br', 'ma'))
+        self.cache.put('sigaa.ufpi.br', 'ma', ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.cache.get('sigaa.ufpi.br', 'ma'), ['MARIA DAS DORES (dores)'])
+        self.assertIsNone(self.cache.get('sigaa.ufma.br', 'ma'))
+        self.assertEqual(self.cache.get_stats(), {'hits': 1, 'memory_hits': 1, 'misses': 2, 'stores': 1, 'evictions': 0})
+
+    def test_disk(self):
+        self.cache.put('sigaa.ufpi.br', 'ma', ['MARIA DAS DORES (dores)'])
+        self.cache.close()
+
+        self.cache = SearchCache(self.path)
+        self.assertEqual(self.cache.get('sigaa.ufpi.br', 'ma'), ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.cache.get_stats()['memory_hits'], 0)
+        self.assertEqual(self.cache.get('sigaa.ufpi.br', 'ma'), ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.cache.get_stats()['memory_hits'], 1)
+
+    def test_ttl(self):
+        self.cache.close()
+        self.cache = SearchCache(self.path, ttl=0.05)
+        self.cache.put('sigaa.ufpi.br', 'ma', ['MARIA DAS DORES (dores)'])
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('sigaa.ufpi.br', 'ma'))
+
+    def test_lru(self):
+        self.cache.close()
+        self.cache = SearchCache(self.path, max_entries=2, memory_entries=0)
+        self.cache.put('sigaa.ufpi.br', 'a', [])
+        time.sleep(0.01)
+        self.cache.put('sigaa.ufpi.br', 'b', [])
+        time.sleep(0.01)
+        self.cache.get('sigaa.ufpi.br', 'a')
+        time.sleep(0.01)
+        self.cache.put('sigaa.ufpi.br', 'c', [])
+
+        self.assertEqual(self.cache.get('sigaa.ufpi.br', 'a'), [])
+        self.assertIsNone(self.cache.get('sigaa.ufpi.br', 'b'))
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+
+    def test_lru_memory_hits(self):
+        self.cache.close()
+        self.cache = SearchCache(self.path, max_entries=2, memory_entries=2)
+        self.cache.put('sigaa.ufpi.br', 'a', [])
+        time.sleep(0.01)
+        self.cache.put('sigaa.ufpi.br', 'b', [])
+        time.sleep(0.01)
+        # answered by the memory, its use still counts for the file
+        self.cache.get('sigaa.ufpi.br', 'a')
+        self.assertEqual(self.cache.get_stats()['memory_hits'], 1)
+        time.sleep(0.01)
+        self.cache.put('sigaa.ufpi.br', 'c', [])
+        self.cache.put('sigaa.ufpi.br', 'c', [])
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+        self.cache.close()
+
+        self.cache = SearchCache(self.path, max_entries=2)
+        self.assertEqual(self.cache.get('sigaa.ufpi.br', 'a'), [])
+        self.assertIsNone(self.cache.get('sigaa.ufpi.br', 'b'))
+
+
+class TestSearchCacheAPI(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        self.api = API(self.server.domain, session=self.server.session())
+        self.api.use_cache(SearchCache())
+        self.api.authenticate('macielti', self.server.password)
+
+    def test_search_user(self):
+        self.assertEqual(self.api.search_user('ma'), ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+        self.assertEqual(self.api.search_user('ma'), ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+        self.assertEqual(self.server.requests.count(SEARCH), 1)
+
+    def test_expired_not_cached(self):
+        self.server.expire()
+        self.assertEqual(self.api.search_user('ma'), [])
+        self.assertEqual(self.api.get_cache().get_stats()['stores'], 0)
+
+    def test_send_message(self):
+        self.assertTrue(self.api.send_message(['dores'], 'Subject', 'Message'))
+        self.assertTrue(self.api.send_message(['dores'], 'Subject', 'Message'))
+        # search, selection, add and send each time: the selection needs the search in the server, never cached
+        self.assertEqual(self.server.requests.count(SEARCH), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
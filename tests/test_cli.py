@@ -0,0 +1,169 @@
+import unittest
+import io
+import json
+import tempfile
+import requests
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa import cli
+from fake_sigaa import FakeSIGAA, generate_directory
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+
+class FakeDown(FakeSIGAA):
+    """ A platform whose requests to ``down`` (a path) never get an answer. """
+
+    down = None
+
+    def send(self, request, **kwargs):
+        if self.down is not None and request.url.split('?')[0].endswith(self.down):
+            raise requests.ConnectionError("The server didn't answer.")
+        return super(FakeDown, self).send(request, **kwargs)
+
+
+class TestCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+
+    def session(self, domain):
+        self.assertEqual(domain, self.server.domain)
+        return self.server.session()
+
+    def run_command(self, argv, stdin=''):
+        stdout = io.StringIO()
+        argv = argv + ['--domain', self.server.domain, '--username', 'macielti', '--password', self.server.password]
+        status = cli.run(argv, io.StringIO(stdin), stdout, self.session)
+        return (status, [json.loads(line) for line in stdout.getvalue().splitlines()])
+
+    def test_search(self):
+        (status, lines) = self.run_command(['search', '--workers', '2'], 'dores\n\nana\nnobody\n')
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(lines, key=lambda line: line['query']), [
+            {'query': 'ana', 'users': ['ANA MARIA SOUSA (anamaria)']},
+            {'query': 'dores', 'users': ['MARIA DAS DORES (dores)']},
+            {'query': 'nobody', 'users': []},
+        ])
+
+    def test_search_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            queries = os.path.join(directory, 'queries.txt')
+            with open(queries, 'w') as f:
+                f.write('macielti\n')
+            (status, lines) = self.run_command(['search', queries, '-'], 'dores\n')
+        self.assertEqual(status, 0)
+        self.assertEqual([line['query'] for line in lines], ['macielti', 'dores'])
+
+    def test_crawl_users(self):
+        self.server = FakeSIGAA(generate_directory(150) + DIRECTORY, cap=20)
+        (status, lines) = self.run_command(['crawl-users', '--workers', '2', '--cap', '20'])
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(line['user'] for line in lines), self.server.directory)
+        self.assertIn({'user': DIRECTORY[1], 'name': 'BRUNO DO NASCIMENTO MACIEL', 'username': 'macielti'}, lines)
+
+    def test_crawl_users_processes(self):
+        self.server = FakeSIGAA(generate_directory(150) + DIRECTORY, cap=20)
+        (status, lines) = self.run_command(['crawl-users', '--workers', '2', '--cap', '20', '--processes', '2'])
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(line['user'] for line in lines), self.server.directory)
+
+    def test_send(self):
+        (status, lines) = self.run_command(['send', '--subject', 'Subject', '--message', 'Message', '--shard-size', '1',
+                                            '--workers', '2'], '\n'.join(DIRECTORY) + '\n')
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(lines, key=lambda line: line['recipient']),
+                         [{'recipient': user, 'sent': True} for user in DIRECTORY])
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_send_failure(self):
+        (status, lines) = self.run_command(['send', '--subject', 'Subject', '--message', 'Message'],
+                                           'MARIA DAS DORES (dores)\nNOBODY (nobody)\n')
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [{'recipient': 'MARIA DAS DORES (dores)', 'sent': True},
+                                 {'recipient': 'NOBODY (nobody)', 'sent': False}])
+
+    def test_status(self):
+        (status, lines) = self.run_command(['status'])
+        self.assertEqual(status, 0)
+        self.assertEqual(lines[0]['domain'], self.server.domain)
+        self.assertTrue(lines[0]['valid'])
+        self.assertTrue(lines[0]['authenticated'])
+
+    def test_status_wrong_password(self):
+        stdout = io.StringIO()
+        status = cli.run(['status', '--domain', self.server.domain, '--username', 'macielti', '--password', 'wrong'],
+                         io.StringIO(), stdout, self.session)
+        self.assertEqual(status, 1)
+        self.assertFalse(json.loads(stdout.getvalue())['authenticated'])
+
+    def test_status_connection_error(self):
+        self.server = FakeDown(DIRECTORY)
+        self.server.down = '/sigaa/verTelaLogin.do'
+        (status, lines) = self.run_command(['status'])
+        self.assertEqual(status, 1)
+        self.assertEqual(lines[0]['domain'], self.server.domain)
+        self.assertEqual(lines[0]['error'], "The server didn't answer.")
+
+    def test_crawl_users_connection_error(self):
+        self.server = FakeDown(DIRECTORY)
+        self.server.down = '/sigaa/logar.do'
+        (status, lines) = self.run_command(['crawl-users'])
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [{'domain': self.server.domain, 'error': "The server didn't answer."}])
+
+        # the server stops answering in the middle of the crawl
+        self.server = FakeDown(DIRECTORY)
+        self.server.down = '/cxpostal/envia_mensagem.jsf'
+        (status, lines) = self.run_command(['crawl-users'])
+        self.assertEqual(status, 1)
+        self.assertEqual(lines[-1]['error'], "The server didn't answer.")
+
+    def test_crawl_users_not_valid_domain(self):
+        self.server.fail('/sigaa/verTelaLogin.do', status=404)
+        (status, lines) = self.run_command(['crawl-users'])
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [{'domain': self.server.domain, 'error': 'Not valid sigaa platform domain.'}])
+
+    def test_send_errors(self):
+        self.server.fail('/sigaa/verTelaLogin.do', status=404)
+        (status, lines) = self.run_command(['send', '--subject', 'Subject', '--message', 'Message'], 'dores\n')
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [{'domain': self.server.domain, 'error': 'Not valid sigaa platform domain.'}])
+
+        self.server = FakeDown(DIRECTORY)
+        self.server.down = '/sigaa/logar.do'
+        (status, lines) = self.run_command(['send', '--subject', 'Subject', '--message', 'Message'], 'dores\n')
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [{'domain': self.server.domain, 'error': "The server didn't answer."}])
+
+        # the server stops answering in the middle of the sending, the recipients of the shard aren't sent
+        self.server = FakeDown(DIRECTORY)
+        self.server.down = '/cxpostal/envia_mensagem.jsf'
+        (status, lines) = self.run_command(['send', '--subject', 'Subject', '--message', 'Message'], 'dores\n')
+        self.assertEqual(status, 1)
+        self.assertEqual(lines, [{'recipient': 'dores', 'sent': False},
+                                 {'domain': self.server.domain, 'error': "The server didn't answer."}])
+
+    def test_run_parallel(self):
+        def operation(item):
+            if item == 3:
+                raise ValueError('three')
+            return item * 2
+
+        results = sorted(cli.run_parallel(operation, iter(range(10)), 4), key=lambda result: result[0])
+        self.assertEqual([result[1] for result in results if result[0] != 3], [i * 2 for i in range(10) if i != 3])
+        self.assertIsInstance(results[3][2], ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import threading
+import time
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.crawler import DirectoryCrawler, CHARS
+from fake_sigaa import generate_directory
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'CARLOS ALBERTO LIMA (carlos2)',
+    'MARIA DAS DORES (mdores)',
+    'ZE RAMALHO (ze1)',
+]
+
+
+class FakeMailBox:
+    """ Answer the searches from a list, like the AJAX search of the platform. """
+
+    def __init__(self, directory=DIRECTORY, delay=0, cap=None):
+        self.directory = directory
+        self.delay = delay
+        self.cap = cap
+        self.queries = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def search(self, query):
+        with self.lock:
+            self.queries.append(query)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        query = query.lower()
+        result = [user for user in self.directory
+                  if user.lower().startswith(query)
+                  or user.split(' ')[-1].strip('(').strip(')').startswith(query)]
+        with self.lock:
+            self.running -= 1
+        return sorted(set(result))[:self.cap]
+
+
+class TestDirectoryCrawler(unittest.TestCase):
+
+    def test_crawl(self):
+        mail_box = FakeMailBox()
+        result = DirectoryCrawler([mail_box], 'sigaa.ufpi.br').crawl()
+        self.assertEqual(result, sorted(DIRECTORY))
+        self.assertEqual(sorted(mail_box.queries), sorted(CHARS))
+
+    def test_crawl_workers(self):
+        mail_boxes = [FakeMailBox(delay=0.01) for _ in range(4)]
+        result = DirectoryCrawler(mail_boxes, 'sigaa.ufpi.br').crawl()
+        self.assertEqual(result, DirectoryCrawler([FakeMailBox()], 'sigaa.ufpi.br').crawl())
+
+        queries = [query for mail_box in mail_boxes for query in mail_box.queries]
+        self.assertEqual(sorted(queries), sorted(CHARS))
+        self.assertTrue(all(mail_box.queries for mail_box in mail_boxes))
+
+    def test_crawl_max_per_host(self):
+        shared = FakeMailBox(delay=0.01)
+        result = DirectoryCrawler([shared] * 4, 'sigaa.ufpi.br', max_per_host=2).crawl()
+        self.assertEqual(result, sorted(DIRECTORY))
+        self.assertLessEqual(shared.max_running, 2)
+
+    def test_crawl_expansion(self):
+        directory = generate_directory(500)
+        mail_boxes = [FakeMailBox(directory, cap=20) for _ in range(4)]
+        crawler = DirectoryCrawler(mail_boxes, 'sigaa.ufpi.br', cap=20)
+        result = crawler.crawl()
+        self.assertEqual(result, directory)
+
+        queries = [query for mail_box in mail_boxes for query in mail_box.queries]
+        self.assertEqual(sum(crawler.requests_per_depth.values()), len(queries))
+        self.assertEqual(crawler.requests_per_depth[1], len(CHARS))
+        self.assertIn(2, crawler.requests_per_depth)
+
+    def test_crawl_without_expansion(self):
+        directory = generate_directory(500)
+        crawler = DirectoryCrawler([FakeMailBox(directory, cap=20)], 'sigaa.ufpi.br', cap=None)
+        self.assertLess(len(crawler.crawl()), len(directory))
+        self.assertEqual(crawler.requests_per_depth, {1: len(CHARS)})
+
+    def test_crawl_expand_filter(self):
+        directory = generate_directory(500)
+        truncated = []
+        crawler = DirectoryCrawler([FakeMailBox(directory, cap=20)], 'sigaa.ufpi.br', cap=20,
+                                   expand=lambda prefix, users: truncated.append(prefix) or prefix != 'a')
+        result = crawler.crawl()
+        self.assertIn('a', truncated)
+        self.assertFalse([prefix for prefix in truncated if prefix.startswith('a') and prefix != 'a'])
+        self.assertLess(len(result), len(directory))
+
+    def test_iter_crawl(self):
+        directory = generate_directory(500)
+        crawler = DirectoryCrawler([FakeMailBox(directory, cap=20) for _ in range(4)], 'sigaa.ufpi.br', cap=20)
+        users = list(crawler.iter_crawl())
+        self.assertEqual(len(users), len(set(users)))
+        self.assertEqual(sorted(users), directory)
+
+    def test_iter_crawl_close(self):
+        mail_box = FakeMailBox(delay=0.01)
+        users = DirectoryCrawler([mail_box], 'sigaa.ufpi.br').iter_crawl()
+        self.assertIn(next(users), DIRECTORY)
+        users.close()
+        queries = len(mail_box.queries)
+        time.sleep(0.05)
+        self.assertEqual(len(mail_box.queries), queries)
+        self.assertLess(queries, len(CHARS))
+
+    def test_crawl_error(self):
+        class BrokenMailBox(FakeMailBox):
+            def search(self, query):
+                raise RuntimeError(query)
+
+        with self.assertRaises(RuntimeError):
+            DirectoryCrawler([BrokenMailBox()], 'sigaa.ufpi.br').crawl()
+
+
+if __name__ == '__main__':
+    unittest.main()
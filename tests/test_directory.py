@@ -0,0 +1,46 @@
+import unittest
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.directory import UserDirectory
+
+
+USERS = [
+    'MARIA DAS DORES (dores)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+]
+
+
+class TestUserDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = UserDirectory(USERS)
+
+    def test_search(self):
+        self.assertEqual(len(self.directory), 3)
+        self.assertEqual(self.directory.search('macielti'), ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(self.directory.search('MA'), ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+        self.assertEqual(self.directory.search('ana'), ['ANA MARIA SOUSA (anamaria)'])
+        self.assertEqual(self.directory.search('ma', limit=1), ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(self.directory.search('x'), [])
+        self.assertEqual(self.directory.search_username('ma'), ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(self.directory.search_name('ma'), ['MARIA DAS DORES (dores)'])
+
+    def test_vice_versa(self):
+        self.assertEqual(self.directory.get_username('Bruno do Nascimento Maciel'), 'macielti')
+        self.assertEqual(self.directory.get_name('macielti'), 'BRUNO DO NASCIMENTO MACIEL')
+        self.assertIsNone(self.directory.get_username('BRUNO'))
+        self.assertIsNone(self.directory.get_name('maciel'))
+
+    def test_contains(self):
+        self.assertIn('MARIA DAS DORES (dores)', self.directory)
+        self.assertNotIn('MARIA (dores)', self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.crawler import DirectoryCrawler
+from sigaa.engine import ProcessCrawler, new_executor, parse_batch, SEPARATOR
+from sigaa.mailbox import MailBox
+import sigaa.util as util
+from fake_sigaa import FakeSIGAA, generate_directory, SUGGESTION, SUGGESTION_ENTRY, VIEW_EXPIRED_PAGE
+
+
+class TestProcessCrawler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = new_executor(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        self.directory = generate_directory(150)
+        self.server = FakeSIGAA(self.directory, cap=20, compress=True)
+        self.api = API(self.server.domain, session=self.server.session(), progress=False)
+        self.api.authenticate(self.directory[0].split(' ')[-1].strip('()'), self.server.password)
+
+    def mail_boxes(self, count):
+        mail_boxes = []
+        for api in [self.api] + [self.api.spawn() for _ in range(count - 1)]:
+            mail_box = MailBox(api.get_session(), api.get_domain())
+            mail_box.goto_mainbox_portal()
+            mail_box.goto_send_message()
+            mail_boxes.append(mail_box)
+        return mail_boxes
+
+    def test_parse_batch(self):
+        users = ['MARIA DAS DORES (dores)', 'BRUNO DO NASCIMENTO MACIEL (macielti)']
+        answer = (SUGGESTION % ''.join(SUGGESTION_ENTRY % user for user in users)).encode('utf-8')
+        result = parse_batch([('ma', answer, 'utf-8'), ('x', b'', 'utf-8'),
+                              ('ze', VIEW_EXPIRED_PAGE.encode('utf-8'), 'utf-8')])
+        self.assertEqual(result, [('ma', SEPARATOR.join(sorted(users)), 'macielti' + SEPARATOR + 'dores', False),
+                                  ('x', '', '', False),
+                                  ('ze', '', '', True)])
+
+    def test_crawl(self):
+        mail_boxes = self.mail_boxes(2)
+        crawler = ProcessCrawler(mail_boxes, self.server.domain, cap=20, batch_size=4, executor=self.executor)
+        searched = []
+        self.assertEqual(crawler.crawl(progress=lambda prefix, users, children: searched.append(prefix)),
+                         self.directory)
+
+        serial = DirectoryCrawler(mail_boxes, self.server.domain, cap=20)
+        self.assertEqual(serial.crawl(), self.directory)
+        self.assertEqual(crawler.requests_per_depth, serial.requests_per_depth)
+        self.assertEqual(len(searched), sum(serial.requests_per_depth.values()))
+
+    def test_crawl_expand_filter(self):
+        mail_boxes = self.mail_boxes(1)
+
+        def expand(prefix, users):
+            return len(prefix) < 2
+
+        crawler = ProcessCrawler(mail_boxes, self.server.domain, cap=20, expand=expand, executor=self.executor)
+        result = crawler.crawl()
+        self.assertEqual(max(crawler.requests_per_depth), 2)
+        self.assertEqual(result, DirectoryCrawler(mail_boxes, self.server.domain, cap=20, expand=expand).crawl())
+
+    def test_view_expired(self):
+        [mail_box] = self.mail_boxes(1)
+        # the page opened again in the same session turns the view state of the mail box stale
+        MailBox(self.api.get_session(), self.api.get_domain()).goto_mainbox_portal()
+        crawler = ProcessCrawler([mail_box], self.server.domain, cap=20, executor=self.executor)
+        with self.assertRaises(util.ViewExpired):
+            crawler.crawl()
+
+    def test_api(self):
+        self.assertEqual(self.api.get_all_users(workers=2, cap=20, processes=2), self.directory)
+        report = self.api.get_crawl_report()
+        self.assertEqual(self.api.get_all_users(workers=2, cap=20), self.directory)
+        self.assertEqual(self.api.get_crawl_report(), report)
+
+        for user in self.api.iter_users(workers=2, cap=20, processes=1):
+            self.assertIn(user, self.directory)
+            break
+        self.assertTrue(self.api.is_authenticated())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import subprocess
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+
+# max time, in seconds, importing the package modules, without their dependencies (like requests).
+IMPORT_BUDGET = 0.25
+
+
+def import_times(statement):
+    """
+    Run the statement in a new interpreter with ``python -X importtime`` and
+    return the self and the cumulative time, in seconds, of each module imported.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=path,
+                             stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        (own, cumulative, module) = line[len('import time:'):].split('|')
+        times[module.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+class TestImport(unittest.TestCase):
+
+    def test_api(self):
+        times = import_times('import sigaa.api')
+        self.assertIn('sigaa.api', times)
+        # tqdm is imported only when a progress bar is shown
+        self.assertFalse([module for module in times if module.split('.')[0] == 'tqdm'])
+        own = sum(own for module, (own, _) in times.items() if module.split('.')[0] == 'sigaa')
+        self.assertLess(own, IMPORT_BUDGET)
+
+    def test_cli(self):
+        times = import_times('import sigaa.cli')
+        # the subcommands import the package modules they use
+        self.assertFalse([module for module in times if module.split('.')[0] in ('requests', 'tqdm')])
+        self.assertNotIn('sigaa.api', times)
+        self.assertLess(times['sigaa.cli'][1], IMPORT_BUDGET)
+
+    def test_package(self):
+        times = import_times('import sigaa')
+        self.assertEqual([module for module in times if module.split('.')[0] == 'sigaa'], ['sigaa'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import json
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.ratelimit import Throttle
+import sigaa.instrument as instrument
+from fake_sigaa import FakeSIGAA
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        self.events = []
+        self.instrumentation = instrument.enable(instrument.Instrumentation(self.events.append))
+
+    def tearDown(self):
+        instrument.disable()
+
+    def test_requests(self):
+        api = API(self.server.domain, session=self.server.session())
+        api.authenticate('macielti', self.server.password)
+        api.search_user('ma')
+
+        requests = dict(((entry['method'], entry['path']), entry)
+                        for entry in self.instrumentation.get_summary()['requests'])
+        self.assertEqual(sum(entry['count'] for entry in requests.values()), len(self.server.requests))
+        search = requests[('POST', '/cxpostal/envia_mensagem.jsf')]
+        self.assertEqual(search['count'], 1)
+        self.assertGreater(search['bytes_sent'], 0)
+        self.assertGreater(search['bytes_received'], 0)
+        self.assertEqual(search['errors'], 0)
+        self.assertEqual(len([event for event in self.events if event['type'] == 'request']),
+                         len(self.server.requests))
+
+    def test_operations(self):
+        api = API(self.server.domain, session=self.server.session())
+        api.authenticate('macielti', self.server.password)
+        api.search_user('ma')
+
+        operations = dict((entry['operation'], entry) for entry in self.instrumentation.get_summary()['operations'])
+        for operation in ['util.generate_session', 'api.authenticate', 'api.search_user', 'mailbox.goto_mainbox_portal',
+                          'mailbox.goto_send_message', 'mailbox.search', 'util.get_j_id_and_jsp']:
+            self.assertIn(operation, operations)
+        self.assertEqual(operations['mailbox.search']['count'], 1)
+        self.assertGreaterEqual(operations['api.search_user']['seconds'], operations['mailbox.search']['seconds'])
+
+        # the bytes of the search are counted in the operations that called it
+        search = [entry for entry in self.instrumentation.get_summary()['requests']
+                  if entry['path'] == '/cxpostal/envia_mensagem.jsf'][0]
+        self.assertEqual(operations['mailbox.search']['bytes_sent'], search['bytes_sent'])
+        self.assertEqual(operations['mailbox.search']['bytes_received'], search['bytes_received'])
+        self.assertGreater(operations['api.search_user']['bytes_received'], search['bytes_received'])
+
+    def test_retries(self):
+        api = API(self.server.domain, session=self.server.session())
+        api.use_throttle(Throttle(backoff=0.001))
+        api.authenticate('macielti', self.server.password)
+        self.server.fail('/cxpostal/envia_mensagem.jsf')
+        api.search_user('dores')
+
+        self.assertEqual(self.instrumentation.get_summary()['retries'], {'throttle.run': 1})
+
+    def test_exports(self):
+        api = API(self.server.domain, session=self.server.session())
+        api.authenticate('macielti', self.server.password)
+
+        summary = json.loads(self.instrumentation.to_json())
+        self.assertEqual(summary, self.instrumentation.get_summary())
+
+        text = self.instrumentation.to_prometheus()
+        self.assertIn('# TYPE sigaa_requests_total counter\n', text)
+        self.assertIn('sigaa_requests_total{method="POST",path="/sigaa/logar.do"} 1\n', text)
+        self.assertIn('sigaa_operations_total{operation="api.authenticate"} 1\n', text)
+
+    def test_disabled(self):
+        instrument.disable()
+        api = API(self.server.domain, session=self.server.session())
+        api.authenticate('macielti', self.server.password)
+
+        self.assertIsNone(instrument.get_instrumentation())
+        self.assertEqual(self.events, [])
+        self.assertEqual(self.instrumentation.get_summary(), {'requests': [], 'operations': [], 'retries': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,6 +11,13 @@ import sigaa
 from sigaa.api import API
 from sigaa.api import MailBox
 from creds import login
+from fake_sigaa import FakeSIGAA
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
 
 class TestAPI(unittest.TestCase):
     
@@ -39,5 +46,43 @@ class TestAPI(unittest.TestCase):
         self.assertIn('BRUNO DO NASCIMENTO MACIEL (macielti)', result)
 
 
+class TestMailBoxOffline(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        api = API(self.server.domain, session=self.server.session())
+        api.authenticate('macielti', self.server.password)
+        self.mail_box = MailBox(api.get_session(), api.get_domain())
+        self.mail_box.goto_mainbox_portal()
+        self.mail_box.goto_send_message()
+
+    def test_search(self):
+        self.assertEqual(self.mail_box.search('ma'), ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+
+    def test_add_user_recipients(self):
+        before = len(self.server.requests)
+        result = self.mail_box.add_user_recipients(['MARIA DAS DORES (dores)', 'NOBODY (nobody)', 'anamaria', 'nobody'])
+        self.assertEqual(result, {
+            'MARIA DAS DORES (dores)': True,
+            'NOBODY (nobody)': False,
+            'anamaria': True,
+            'nobody': False,
+        })
+        # search, selection and add for each user, a user not found costs only the search
+        self.assertEqual(len(self.server.requests) - before, 3 + 1 + 3 + 1)
+
+        self.assertTrue(self.mail_box.send_message('Subject', 'Message'))
+        self.assertEqual(self.server.messages, [(['MARIA DAS DORES (dores)', 'ANA MARIA SOUSA (anamaria)'], 'Subject', 'Message')])
+
+    def test_add_user_recipients_selection(self):
+        # the last search of the page returns other users first, the selection must not pick them
+        self.mail_box.search('ma')
+        result = self.mail_box.add_user_recipients(['MARIA DAS DORES (dores)', 'BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(result, {'MARIA DAS DORES (dores)': True, 'BRUNO DO NASCIMENTO MACIEL (macielti)': True})
+        self.assertTrue(self.mail_box.send_message('Subject', 'Message'))
+        self.assertEqual(self.server.messages, [(['MARIA DAS DORES (dores)', 'BRUNO DO NASCIMENTO MACIEL (macielti)'],
+                                                 'Subject', 'Message')])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import unittest
+import contextlib
+import io
+import time
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.multi import MultiDomainClient, merge_results
+import sigaa.util as util
+from fake_sigaa import FakeSIGAA
+
+
+class TestMultiDomainClient(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = {
+            'sigaa.ufpi.fake': FakeSIGAA(['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'],
+                                         domain='sigaa.ufpi.fake'),
+            'sigaa.ufma.fake': FakeSIGAA(['MARIA JOSE LIMA (mjlima)'], domain='sigaa.ufma.fake'),
+        }
+        self.client = MultiDomainClient({
+            'sigaa.ufpi.fake': ('macielti', 'passwd'),
+            'sigaa.ufma.fake': ('mjlima', 'passwd'),
+        }, session_factory=lambda domain: self.servers[domain].session())
+
+    def test_search_user(self):
+        results = self.client.search_user('maria')
+        self.assertEqual(results, {
+            'sigaa.ufpi.fake': ['MARIA DAS DORES (dores)'],
+            'sigaa.ufma.fake': ['MARIA JOSE LIMA (mjlima)'],
+        })
+        self.assertEqual(merge_results(results), [
+            ('MARIA DAS DORES (dores)', 'sigaa.ufpi.fake'),
+            ('MARIA JOSE LIMA (mjlima)', 'sigaa.ufma.fake'),
+        ])
+        self.assertEqual(self.client.get_errors(), {})
+
+    def test_get_all_users(self):
+        results = self.client.get_all_users(workers=2)
+        self.assertEqual(results['sigaa.ufpi.fake'], self.servers['sigaa.ufpi.fake'].directory)
+        self.assertEqual(results['sigaa.ufma.fake'], self.servers['sigaa.ufma.fake'].directory)
+
+    def test_no_progress_bars(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.client.run(lambda api: api.get_all_users())
+        self.assertEqual(stderr.getvalue(), '')
+
+    def test_send_message(self):
+        results = self.client.send_message({'sigaa.ufma.fake': ['MARIA JOSE LIMA (mjlima)']}, 'Subject', 'Message')
+        self.assertEqual(results, {'sigaa.ufma.fake': True})
+        self.assertEqual(self.servers['sigaa.ufma.fake'].messages, [(['MARIA JOSE LIMA (mjlima)'], 'Subject', 'Message')])
+        self.assertEqual(self.servers['sigaa.ufpi.fake'].requests, [])
+
+    def test_not_authenticated(self):
+        self.servers['sigaa.ufma.fake'].password = 'other'
+        self.assertEqual(self.client.authenticate(), {'sigaa.ufpi.fake': True, 'sigaa.ufma.fake': False})
+        self.assertIsInstance(self.client.get_errors()['sigaa.ufma.fake'], util.NotAuthenticated)
+
+    def test_slow_domain(self):
+        self.client.authenticate()
+        self.servers['sigaa.ufma.fake'].latency = 0.5
+        start = time.monotonic()
+        results = list(self.client.iter_run(lambda api: api.search_user('maria'), timeout=0.2))
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(results, [('sigaa.ufpi.fake', ['MARIA DAS DORES (dores)'])])
+        self.assertIsInstance(self.client.get_errors()['sigaa.ufma.fake'], TimeoutError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import random
+import re
+import time
+import unittest
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+import sigaa.parsers as parsers
+import sigaa.util as util
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'corpus')
+
+# the pattern used before the backwards matching of the names.
+USER_PATTERN = re.compile(r"(?:\w+\s)+\(.+?\)")
+
+
+def load_corpus():
+    with open(os.path.join(CORPUS, 'expected.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    for name in sorted(expected):
+        with open(os.path.join(CORPUS, name), 'r', encoding='utf-8') as f:
+            yield (name, f.read(), expected[name])
+
+
+class TestParsers(unittest.TestCase):
+
+    def test_corpus_users(self):
+        for (name, page, expected) in load_corpus():
+            with self.subTest(page=name):
+                self.assertEqual(parsers.extract_users(page), expected['users'])
+                self.assertEqual(util.extract_users(page), expected['users'])
+
+    def test_corpus_view_state(self):
+        for (name, page, expected) in load_corpus():
+            with self.subTest(page=name):
+                view_state = parsers.parse_view_state(page)
+                if expected['view_state'] is None:
+                    self.assertTrue(None in view_state)
+                    with self.assertRaises(util.ViewStateNotFound):
+                        util.get_j_id_and_jsp(page)
+                else:
+                    self.assertEqual(list(view_state), expected['view_state'])
+                    chunks = [page[i:i + 100] for i in range(0, len(page), 100)]
+                    self.assertEqual(list(parsers.parse_view_state(chunks)), expected['view_state'])
+
+    def test_corpus_flags(self):
+        for (name, page, expected) in load_corpus():
+            with self.subTest(page=name):
+                self.assertEqual(parsers.parse_flags(page)._asdict(), expected['flags'])
+                result = parsers.parse_search(page)
+                self.assertEqual(result.users, expected['users'])
+                self.assertEqual(result.ajax_update, expected['flags']['ajax_update'])
+                self.assertEqual(result.view_expired, expected['flags']['view_expired'])
+
+    def test_same_as_pattern(self):
+        alphabet = ['a', 'B', 'Ç', '_', '1', ' ', ' ', '  ', '\n', '\t', '(', ')', '<', '>', '-', "'"]
+        generator = random.Random(24)
+        for _ in range(5000):
+            text = ''.join(generator.choice(alphabet) for _ in range(generator.randint(0, 40)))
+            self.assertEqual(list(parsers.iter_users(text)), USER_PATTERN.findall(text), repr(text))
+
+    def test_long_text_without_users(self):
+        # the pattern takes minutes on this text, tried again from each word
+        start = time.perf_counter()
+        self.assertEqual(parsers.extract_users('palavra ' * 50000 + '('), [])
+        users = parsers.extract_users('palavra ' * 50000 + '(macielti)')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(len(users), 1)
+        self.assertTrue(users[0].endswith('palavra (macielti)'))
+
+    def test_extract_domain(self):
+        self.assertEqual(parsers.extract_domain('https://www.sigaa.ufpi.br/sigaa/abrirCaixaPostal.jsf'), 'sigaa.ufpi.br')
+        self.assertEqual(parsers.extract_domain('sigaa.ufma.br:8443/sigaa'), 'sigaa.ufma.br')
+        self.assertEqual(util.extract_domain('http://user@sigaa.ufrn.br?x=1'), 'sigaa.ufrn.br')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import threading
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.pool import SessionPool
+import sigaa.util as util
+from fake_sigaa import FakeSIGAA
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+
+class TestSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        self.pool = SessionPool(self.server.domain, 'macielti', self.server.password,
+                                size=3, session_factory=lambda domain: self.server.session())
+
+    def logins(self):
+        return self.server.requests.count(('POST', '/sigaa/logar.do'))
+
+    def test_search_user(self):
+        self.assertEqual(self.pool.search_user('ma'), ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+        self.assertEqual(self.pool.search_user('ana'), ['ANA MARIA SOUSA (anamaria)'])
+        self.assertEqual(self.pool.get_size(), 1)
+        self.assertEqual(self.logins(), 1)
+
+    def test_concurrent_leases(self):
+        results = []
+        barrier = threading.Barrier(3)
+
+        def work():
+            with self.pool.lease() as session:
+                barrier.wait()
+                results.append(session.mail_box.search('dores'))
+
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [['MARIA DAS DORES (dores)']] * 3)
+        self.assertEqual(self.pool.get_size(), 3)
+
+    def test_expired_session(self):
+        self.pool.search_user('ma')
+        self.server.expire()
+        self.assertEqual(self.pool.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.logins(), 2)
+
+    def test_always_expired_session(self):
+        def search(mail_box):
+            # the server drops the session during every operation
+            self.server.expire()
+            return mail_box.search('ma')
+
+        with self.assertRaises(util.NotAuthenticated):
+            self.pool.run(search)
+        self.assertEqual(self.logins(), 2)
+
+    def test_view_expired(self):
+        self.pool.search_user('ma')
+        with self.pool.lease() as session:
+            # another page makes the server drop the view state of the mail box
+            session.api.is_authenticated(force=True)
+        self.assertEqual(self.pool.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.logins(), 1)
+
+    def test_send_message(self):
+        self.pool.search_user('ma')
+        self.server.expire()
+        self.assertTrue(self.pool.send_message(['MARIA DAS DORES (dores)'], 'Subject', 'Message'))
+        self.assertTrue(self.pool.send_message(['ANA MARIA SOUSA (anamaria)'], 'Subject', 'Message'))
+        self.assertEqual(self.server.messages, [
+            (['MARIA DAS DORES (dores)'], 'Subject', 'Message'),
+            (['ANA MARIA SOUSA (anamaria)'], 'Subject', 'Message'),
+        ])
+
+    def test_close(self):
+        self.pool.search_user('ma')
+        self.pool.close()
+        self.assertEqual(self.pool.get_size(), 0)
+        self.assertIn(('GET', '/sigaa/logar.do'), self.server.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
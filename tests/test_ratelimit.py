@@ -0,0 +1,140 @@
+import unittest
+import time
+import requests
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.mailbox import MailBox
+from sigaa.ratelimit import TokenBucket, AIMDController, Throttle, get_throttle
+import sigaa.util as util
+from fake_sigaa import FakeSIGAA
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'MARIA DAS DORES (dores)',
+]
+
+SEARCH = '/cxpostal/envia_mensagem.jsf'
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        bucket = TokenBucket(100, burst=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_burst(self):
+        bucket = TokenBucket(1, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+class TestAIMDController(unittest.TestCase):
+
+    def test_increase(self):
+        controller = AIMDController(initial=2, maximum=3)
+        for _ in range(10):
+            controller.acquire()
+            controller.release(0.1, True)
+        self.assertEqual(controller.get_limit(), 3)
+
+    def test_decrease(self):
+        controller = AIMDController(initial=8, target_latency=1.0)
+        controller.acquire()
+        controller.release(0.1, False)
+        self.assertEqual(controller.get_limit(), 4)
+        # a burst of failures counts as one
+        controller.acquire()
+        controller.release(5.0, True)
+        self.assertEqual(controller.get_limit(), 4)
+
+
+class TestThrottle(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeSIGAA(DIRECTORY)
+        self.api = API(self.server.domain, session=self.server.session())
+        self.api.use_throttle(Throttle(retries=2, backoff=0.001))
+        self.api.authenticate('macielti', self.server.password)
+
+    def test_search_retry(self):
+        self.server.fail(SEARCH, count=2)
+        self.assertEqual(self.api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        self.assertEqual(self.server.requests.count(('POST', SEARCH)), 3)
+
+    def test_search_unavailable(self):
+        self.server.fail(SEARCH, count=3)
+        self.assertRaises(util.ServerUnavailable, self.api.search_user, 'dores')
+
+    def test_send_not_retried(self):
+        # the failed selection isn't sent again by the throttle, the mail box searches and adds again
+        self.server.fail(SEARCH, count=1)
+        self.assertTrue(self.api.send_message(['MARIA DAS DORES (dores)'], 'Subject', 'Message'))
+        # selection (failed), search, selection, add, send
+        self.assertEqual(self.server.requests.count(('POST', SEARCH)), 5)
+
+    def test_error_page(self):
+        mail_box = MailBox(self.api.get_session(), self.api.get_domain(), self.api.get_throttle())
+        mail_box.goto_mainbox_portal()
+        mail_box.goto_send_message()
+        limit = self.api.get_throttle().get_controller().get_limit()
+        self.assertGreater(limit, 1)
+
+        # the page opened again turns the view state stale, the error page comes with the status 200
+        MailBox(self.api.get_session(), self.api.get_domain()).goto_mainbox_portal()
+        with self.assertRaises(util.ViewExpired):
+            mail_box.search('dores')
+        # a failure for the limit, but not sent again
+        self.assertEqual(self.api.get_throttle().get_controller().get_limit(), limit / 2)
+        self.assertEqual(self.server.requests.count(('POST', SEARCH)), 1)
+
+    def test_slot_released(self):
+        throttle = Throttle(retries=0)
+
+        def truncated():
+            raise requests.exceptions.ChunkedEncodingError("Connection broken.")
+        for _ in range(3):
+            # the limit is 1, a slot not given back would block the next request forever
+            self.assertRaises(requests.exceptions.ChunkedEncodingError, throttle.run, truncated)
+
+        def unexpected():
+            raise ValueError("unexpected")
+        self.assertRaises(ValueError, throttle.run, unexpected)
+        self.assertRaises(util.ServerUnavailable, throttle.run, truncated, True)
+
+        r = requests.Response()
+        r.status_code = 200
+        r._content = b''
+        self.assertIs(throttle.run(lambda: r), r)
+
+    def test_too_many_requests(self):
+        for _ in range(3):
+            self.api.search_user('dores')
+        limit = self.api.get_throttle().get_controller().get_limit()
+        self.server.fail(SEARCH, count=1, status=429)
+        # a failure for the limit, and the search is tried again
+        self.assertEqual(self.api.search_user('dores'), ['MARIA DAS DORES (dores)'])
+        self.assertLess(self.api.get_throttle().get_controller().get_limit(), limit)
+
+    def test_spawn(self):
+        self.assertIs(self.api.spawn().get_throttle(), self.api.get_throttle())
+
+    def test_get_throttle(self):
+        self.assertIs(get_throttle('sigaa.shared.br', rate=5), get_throttle('sigaa.shared.br'))
+        self.assertIs(get_throttle('sigaa.shared.br', rate=5), get_throttle('sigaa.shared.br'))
+        self.assertRaises(ValueError, get_throttle, 'sigaa.shared.br', rate=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
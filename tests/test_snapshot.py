@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.snapshot import SnapshotStore, diff, result_hash
+from fake_sigaa import FakeSIGAA, generate_directory
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.snapshots = SnapshotStore(self.temp.name)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_store(self):
+        self.assertIsNone(self.snapshots.latest('sigaa.fake.br'))
+        self.snapshots.save('sigaa.fake.br', ['ZE (ze1)', 'ANA (ana)'], {'a': '1234'})
+        self.snapshots.save('sigaa.fake.br', ['ANA (ana)'])
+        self.snapshots.save('sigaa.other.br', ['BRUNO (bruno)'])
+
+        self.assertEqual(self.snapshots.versions('sigaa.fake.br'), [1, 2])
+        first = self.snapshots.load('sigaa.fake.br', 1)
+        self.assertEqual(first.users, ['ANA (ana)', 'ZE (ze1)'])
+        self.assertEqual(first.prefixes, {'a': '1234'})
+        self.assertEqual(self.snapshots.latest('sigaa.fake.br').users, ['ANA (ana)'])
+        self.assertEqual(self.snapshots.latest('sigaa.other.br').version, 1)
+
+    def test_diff(self):
+        changes = diff(['BRUNO MACIEL (macielti)', 'ANA MARIA (ana)', 'ZE (ze1)'],
+                       ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'ZE (ze1)', 'MARIA (maria)'])
+        self.assertEqual(changes.added, ['MARIA (maria)'])
+        self.assertEqual(changes.removed, ['ANA MARIA (ana)'])
+        self.assertEqual(changes.renamed, [('BRUNO MACIEL (macielti)', 'BRUNO DO NASCIMENTO MACIEL (macielti)')])
+        self.assertFalse(changes.is_empty())
+        self.assertTrue(diff(['ZE (ze1)'], ['ZE (ze1)']).is_empty())
+
+    def test_result_hash(self):
+        self.assertEqual(result_hash(['A (a)', 'B (b)']), result_hash(['B (b)', 'A (a)']))
+        self.assertNotEqual(result_hash(['A (a)']), result_hash(['A (a)', 'B (b)']))
+
+    def update(self, directory, full=False):
+        server = FakeSIGAA(directory, cap=20)
+        api = API(server.domain, session=server.session())
+        api.authenticate(directory[-1].split(' ')[-1].strip('()'), server.password)
+        result = api.update_snapshot(self.snapshots, cap=20, full=full)
+        return result + (sum(api.get_crawl_report().values()),)
+
+    def test_update_snapshot(self):
+        directory = generate_directory(150)
+        (snapshot, changes, first_searches) = self.update(directory)
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(snapshot.users, directory)
+        self.assertEqual(changes.added, directory)
+        self.assertTrue(snapshot.prefixes)
+
+        (snapshot, changes, searches) = self.update(directory)
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(snapshot.users, directory)
+        self.assertTrue(changes.is_empty())
+        self.assertEqual(searches, 36)
+        self.assertLess(searches, first_searches)
+
+        (name, username) = directory[1].rsplit(' ', 1)
+        renamed = 'ZE NOVO %s' % username
+        changed = sorted(directory[2:] + ['XAVIER QUEIROZ (qxavier)', renamed])
+        (snapshot, changes, searches) = self.update(changed)
+        self.assertEqual(snapshot.version, 3)
+        self.assertEqual(snapshot.users, changed)
+        self.assertEqual(changes.added, ['XAVIER QUEIROZ (qxavier)'])
+        self.assertEqual(changes.removed, [directory[0]])
+        self.assertEqual(changes.renamed, [(directory[1], renamed)])
+        self.assertLess(searches, first_searches, (searches, first_searches))
+
+    def test_update_snapshot_full(self):
+        directory = generate_directory(150)
+        (_, _, first_searches) = self.update(directory)
+        (snapshot, changes, searches) = self.update(directory, full=True)
+        self.assertEqual(snapshot.users, directory)
+        self.assertTrue(changes.is_empty())
+        self.assertEqual(searches, first_searches)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import tempfile
+import time
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.store import UserStore
+from fake_sigaa import FakeSIGAA, generate_directory
+
+
+class TestUserStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'users.db')
+        self.store = UserStore(self.path, 'sigaa.ufpi.br')
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_search(self):
+        self.store.add('m', ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+        self.store.add('b', ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(self.store.search('macielti'), ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(self.store.search('BRUNO DO'), ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertEqual(self.store.search('ma'), ['BRUNO DO NASCIMENTO MACIEL (macielti)', 'MARIA DAS DORES (dores)'])
+        self.assertEqual(self.store.search('x'), [])
+        self.assertEqual(len(self.store.get_users()), 2)
+
+    def test_covers(self):
+        self.store.add('m', ['MARIA DAS DORES (dores)'], complete=False)
+        self.assertFalse(self.store.covers('macielti'))
+        self.store.add('mac', ['BRUNO DO NASCIMENTO MACIEL (macielti)'])
+        self.assertTrue(self.store.covers('macielti'))
+        self.assertFalse(self.store.covers('ma'))
+        self.assertFalse(self.store.covers(''))
+
+    def test_complete_result_removes_users(self):
+        self.store.add('z', ['ZE RAMALHO (ze1)', 'ZECA PAGODINHO (zeca)'])
+        self.store.add('ze', ['ZE RAMALHO (ze1)'])
+        self.assertEqual(self.store.get_users(), ['ZE RAMALHO (ze1)'])
+
+    def test_domains(self):
+        self.store.add('z', ['ZE RAMALHO (ze1)'])
+        other = UserStore(self.path, 'sigaa.ufma.br')
+        self.assertEqual(other.get_users(), [])
+        self.assertFalse(other.covers('z'))
+        other.close()
+
+    def test_stale_prefixes(self):
+        self.store.add('a', [], fetched_at=time.time() - 2 * 24 * 60 * 60)
+        self.store.add('b', [])
+        self.store.add('ba', [], fetched_at=0)
+        self.store.add('ab', [], fetched_at=0)
+        self.assertEqual(self.store.stale_prefixes(['a', 'b', 'c']), ['a', 'ba', 'c'])
+        self.assertFalse(self.store.covers('a'))
+
+        # persisted on disk
+        self.store.close()
+        self.store = UserStore(self.path, 'sigaa.ufpi.br')
+        self.assertTrue(self.store.covers('b'))
+
+    def test_refresh_users(self):
+        directory = generate_directory(150)
+        server = FakeSIGAA(directory, cap=20)
+        api = API(server.domain, session=server.session(), progress=False)
+        api.authenticate(directory[0].split(' ')[-1].strip('()'), server.password)
+        api.use_store(self.store)
+        self.assertEqual(api.get_all_users(cap=20), directory)
+        crawl = api.get_crawl_report()
+
+        # everything stale: the children of the stale prefixes are searched only by the expansion
+        stale = UserStore(self.path, 'sigaa.ufpi.br', max_age=0)
+        api.use_store(stale)
+        self.assertEqual(api.refresh_users(cap=20), directory)
+        refresh = api.get_crawl_report()
+        stale.close()
+        self.assertEqual(sorted(refresh), sorted(crawl))
+        for depth in crawl:
+            self.assertLessEqual(refresh[depth], crawl[depth])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.api import API
+from sigaa.mailbox import MailBox
+from sigaa.transport import SuggestionParser, compact_payload
+import sigaa.util as util
+import sigaa.instrument as instrument
+from fake_sigaa import FakeSIGAA, SUGGESTION, SUGGESTION_ENTRY, VIEW_EXPIRED_PAGE
+
+
+DIRECTORY = [
+    'ANA MARIA SOUSA (anamaria)',
+    'BRUNO DO NASCIMENTO MACIEL (macielti)',
+    'JOSÉ DA CONCEIÇÃO (jconceicao)',
+    'MARIA DAS DORES (dores)',
+]
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_compact_payload(self):
+        payload = {'form': 'form', 'form:nome': '', 'form:arquivo2': '', 'form:assunto': 'Subject',
+                   'form:texto': 'Message', 'form:usuarioAuto': '', 'form:suggestion_selection': ''}
+        # only the empty attachment fields are removed, the other empty fields are still sent
+        self.assertEqual(compact_payload(payload), {'form': 'form', 'form:assunto': 'Subject', 'form:texto': 'Message',
+                                                    'form:usuarioAuto': '', 'form:suggestion_selection': ''})
+        self.assertEqual(compact_payload(payload, drop=('form:assunto', 'form:texto')),
+                         {'form': 'form', 'form:usuarioAuto': '', 'form:suggestion_selection': ''})
+        self.assertEqual(compact_payload({'form:nome': 'file.txt'}), {'form:nome': 'file.txt'})
+
+    def test_suggestion_parser(self):
+        page = (SUGGESTION % ''.join(SUGGESTION_ENTRY % user for user in DIRECTORY)).encode('utf-8')
+        for size in [1, 2, 7, len(page)]:
+            parser = SuggestionParser(markers=('Ajax-Update-Ids', 'ViewExpiredException'))
+            for i in range(0, len(page), size):
+                parser.feed(page[i:i + size])
+            self.assertEqual(parser.close(), util.extract_users(page.decode('utf-8')))
+            self.assertTrue(parser.found('Ajax-Update-Ids'))
+            self.assertFalse(parser.found('ViewExpiredException'))
+
+    def test_suggestion_parser_view_expired(self):
+        parser = SuggestionParser(markers=('ViewExpiredException',))
+        page = VIEW_EXPIRED_PAGE.encode('utf-8')
+        for i in range(0, len(page), 3):
+            parser.feed(page[i:i + 3])
+        self.assertEqual(parser.close(), [])
+        self.assertTrue(parser.found('ViewExpiredException'))
+
+    def test_compression(self):
+        server = FakeSIGAA(DIRECTORY, compress=True)
+        instrumentation = instrument.enable()
+        try:
+            api = API(server.domain, session=server.session())
+            api.authenticate('macielti', server.password)
+            self.assertEqual(api.search_user('j'), ['JOSÉ DA CONCEIÇÃO (jconceicao)'])
+            self.assertEqual(api.search_user('ma'), [DIRECTORY[1], DIRECTORY[3]])
+        finally:
+            instrument.disable()
+
+        # the login page is streamed, its size isn't known
+        for entry in instrumentation.get_summary()['requests']:
+            if entry['method'] == 'POST':
+                self.assertLess(entry['bytes_received'], entry['bytes_decoded'])
+
+    def test_minimal_payload(self):
+        server = FakeSIGAA(DIRECTORY)
+        api = API(server.domain, session=server.session())
+        api.authenticate('macielti', server.password)
+        bodies = []
+        api.get_session().hooks['response'].append(lambda r, *args, **kwargs: bodies.append(r.request.body))
+
+        sent = []
+        for minimal in [True, False]:
+            mail_box = MailBox(api.get_session(), api.get_domain(), minimal=minimal)
+            mail_box.goto_mainbox_portal()
+            mail_box.goto_send_message()
+            del bodies[:]
+            self.assertEqual(mail_box.search('dores', 'Subject', 'Message'), ['MARIA DAS DORES (dores)'])
+            sent.append(bodies[0])
+
+        self.assertNotIn('form%3Aassunto', sent[0])
+        self.assertNotIn('form%3Anome', sent[0])
+        # the empty fields outside of the allow-list are still sent
+        self.assertIn('form%3Asuggestion_selection=', sent[0])
+        self.assertIn('form%3Aassunto=Subject', sent[1])
+        self.assertLess(len(sent[0]), len(sent[1]))
+
+    def test_minimal_send_message(self):
+        server = FakeSIGAA(DIRECTORY)
+        api = API(server.domain, session=server.session())
+        api.authenticate('macielti', server.password)
+        self.assertTrue(api.send_message(['MARIA DAS DORES (dores)'], 'Subject', 'Message'))
+        self.assertEqual(server.messages, [(['MARIA DAS DORES (dores)'], 'Subject', 'Message')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import os
+import sys
+path = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.append(path)
+
+from sigaa.user import User, UserTable
+from fake_sigaa import generate_directory
+
+
+class TestUser(unittest.TestCase):
+
+    def test_parse(self):
+        user = User.parse('BRUNO DO NASCIMENTO MACIEL (macielti)')
+        self.assertEqual((user.name, user.username, user.label),
+                         ('BRUNO DO NASCIMENTO MACIEL', 'macielti', 'BRUNO DO NASCIMENTO MACIEL (macielti)'))
+        self.assertEqual(str(user), 'BRUNO DO NASCIMENTO MACIEL (macielti)')
+        self.assertIs(User.parse(user), user)
+
+    def test_parse_username(self):
+        user = User.parse('macielti')
+        self.assertEqual((user.name, user.username, user.label), (None, 'macielti', 'macielti'))
+
+    def test_identity(self):
+        users = {User.parse('BRUNO DO NASCIMENTO MACIEL (macielti)'): True}
+        self.assertIn(User.parse('macielti'), users)
+        self.assertNotEqual(User.parse('macielti'), User.parse('dores'))
+        self.assertIs(User.parse('x (%s)' % 'maciel' 'ti').username, User.parse('macielti').username)
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            User.parse('macielti').email = 'macielti@ufpi.edu.br'
+
+
+class TestUserTable(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = generate_directory(300) + ['dores']
+        self.table = UserTable(self.directory)
+
+    def test_iter(self):
+        self.assertEqual(len(self.table), len(self.directory))
+        self.assertEqual(sorted(user.label for user in self.table), sorted(self.directory))
+        self.assertEqual(self.table[-1], self.table[len(self.table) - 1])
+
+    def test_find(self):
+        for label in self.directory:
+            user = User.parse(label)
+            self.assertEqual(self.table.find(user.username).label, label)
+            self.assertIn(label, self.table)
+        self.assertIsNone(self.table.find('nobody'))
+        self.assertNotIn('NOBODY (nobody)', self.table)
+
+
+if __name__ == '__main__':
+    unittest.main()
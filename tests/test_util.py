@@ -8,6 +8,7 @@ path = os.path.join(os.path.dirname(__file__), os.pardir)
 sys.path.append(path)
 
 import sigaa.util as util
+from fake_sigaa import PAGE, VIEW_EXPIRED_PAGE
 
 
 class TestUtil(unittest.TestCase):
@@ -22,5 +23,35 @@ class TestUtil(unittest.TestCase):
         with self.assertRaises(util.NotValidDomain):
             util.generate_session("google.com")
 
+class TestUtilOffline(unittest.TestCase):
+
+    def test_get_j_id_and_jsp(self):
+        page = PAGE % {'j_id': 'j_id12', 'jsp': 1234567, 'content': 'j_id99 j_id_jsp_7654321_9'}
+        self.assertEqual(util.get_j_id_and_jsp(page), ('j_id12', 'j_id_jsp_1234567_1'))
+
+        # the same result for any split of the page in chunks
+        for size in range(1, 40):
+            chunks = (page[i:i + size] for i in range(0, len(page), size))
+            self.assertEqual(util.get_j_id_and_jsp(chunks), ('j_id12', 'j_id_jsp_1234567_1'))
+
+    def test_is_view_expired(self):
+        self.assertTrue(util.is_view_expired(VIEW_EXPIRED_PAGE))
+        self.assertFalse(util.is_view_expired(PAGE % {'j_id': 'j_id1', 'jsp': 1234567, 'content': ''}))
+
+    def test_get_j_id_and_jsp_stops_early(self):
+        page = PAGE % {'j_id': 'j_id1', 'jsp': 1234567, 'content': ''}
+
+        def chunks():
+            yield page
+            raise AssertionError('read after the parameters were found')
+
+        self.assertEqual(util.get_j_id_and_jsp(chunks()), ('j_id1', 'j_id_jsp_1234567_1'))
+
+    def test_get_j_id_and_jsp_not_found(self):
+        with self.assertRaises(util.ViewStateNotFound):
+            util.get_j_id_and_jsp('<html>Sua sessão foi expirada. </html>')
+        with self.assertRaises(util.ViewStateNotFound):
+            util.get_j_id_and_jsp(iter(['j_id1 j_id_jsp_1234_1', ' j_id_jsp_1234_2']))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file